@@ -0,0 +1,199 @@
+"""Asyncio Minecraft Server module.
+
+Async counterparts of MinecraftServer and ServerManager, so a single event loop
+can drive many servers at once. mcwrapper is run with asyncio subprocesses, and
+file I/O that can't be made non-blocking runs on the default executor.
+"""
+from typing import AsyncIterator, Dict, List, Optional
+from pathlib import Path
+import asyncio
+import os
+import shutil
+
+import streamlit as st
+
+from enums import ServerStatus
+from server import MinecraftServer, ServerManager
+
+logger = st.logger.get_logger(__name__)
+
+
+class AsyncMinecraftServer:
+    """Asyncio interface to a Minecraft server.
+
+    Paths, settings and parsing are shared with the blocking MinecraftServer,
+    which is available as ``server``.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.server = MinecraftServer(name=name)
+
+    async def _mcwrapper(self, *args: str, ok_codes: tuple = (0,)) -> str:
+        """Run mcwrapper for server, returning its combined output."""
+        logger.debug(f"Running mcwrapper command: {' '.join(args)}")
+        process = await asyncio.create_subprocess_exec(
+            "mcwrapper", *args,
+            cwd=self.server.server_directory,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+        )
+        output, _ = await process.communicate()
+        if process.returncode not in ok_codes:
+            raise RuntimeError(f"mcwrapper {' '.join(args)} exited with {process.returncode}: {output.decode()}")
+        return output.decode()
+
+    async def status(self) -> ServerStatus:
+        output = await self._mcwrapper("status", ok_codes=(0, 5))
+        return MinecraftServer.parse_status(output)
+
+    async def start(self):
+        """Start the server."""
+        logger.info(f"Starting server {self.name}...")
+        await asyncio.to_thread(self.server.release_port)
+        command_input = self.server.server_path / "command_input"
+        if command_input.exists():
+            logger.info("Removing command input...")
+            command_input.unlink()
+        await self._mcwrapper("start")
+
+    async def stop(self):
+        """Stop the server."""
+        logger.info(f"Stopping server {self.name}...")
+        await self._mcwrapper("stop")
+
+    async def restart(self):
+        """Restart the server."""
+        logger.info(f"Restarting server {self.name}...")
+        await self._mcwrapper("restart")
+
+    async def run_command(self, command: str):
+        """Run a server command."""
+        logger.info(f"Running command on {self.name}: {command}")
+        await self._mcwrapper("command", command)
+
+    async def port_number(self) -> int:
+        """Port number of the server."""
+        return await asyncio.to_thread(lambda: self.server.port_number)
+
+    async def log_tail(self, lines: int = 100) -> str:
+        """Last lines of the log file."""
+        return await asyncio.to_thread(self.server.read_log_tail, lines)
+
+    async def log_size(self) -> int:
+        return await asyncio.to_thread(lambda: self.server.log_size)
+
+    async def follow_log(self, offset: Optional[int] = None, interval: float = 0.25) -> AsyncIterator[str]:
+        """Yield lines as they are written to the log, starting from offset (default: the end)."""
+        if offset is None:
+            offset = await self.log_size()
+        while True:
+            lines, offset = await asyncio.to_thread(self._read_lines, offset)
+            for line in lines:
+                yield line
+            if not lines:
+                await asyncio.sleep(interval)
+
+    def _read_lines(self, offset: int):
+        """Complete lines written to the log after offset, and the offset after them.
+
+        The log is read from the start again if it has been rotated.
+        """
+        try:
+            with open(self.server.log_file, "rb") as f:
+                if f.seek(0, os.SEEK_END) < offset:
+                    offset = 0
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return [], offset
+        complete = data[:data.rfind(b"\n") + 1]
+        lines = complete.decode(errors="replace").splitlines()
+        return lines, offset + len(complete)
+
+    async def wait_for_log_line(self, text: str, offset: int = 0, timeout: float = 30) -> str:
+        """Wait for a line containing text to be written to the log after offset."""
+        async def find():
+            async for line in self.follow_log(offset=offset, interval=0.05):
+                if text in line:
+                    return line
+        try:
+            return await asyncio.wait_for(find(), timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"Timed out waiting for log line: {text}") from None
+
+    async def query(self, command: str, text: str, timeout: float = 5) -> str:
+        """Run a server command and return the first log line containing text written after it."""
+        offset = await self.log_size()
+        await self.run_command(command)
+        return await self.wait_for_log_line(text, offset=offset, timeout=timeout)
+
+    async def online_backup(self, timeout: float = 60) -> Path:
+        """Backup the world without stopping the server.
+
+        See MinecraftServer.online_backup. Snapshotting and compression run on the
+        default executor so the event loop is free while they run.
+        """
+        logger.info(f"Taking online backup of {self.name}...")
+        server = self.server
+        created, staging_path, snapshot_path = await asyncio.to_thread(server._start_backup)
+
+        try:
+            if await self.status() == ServerStatus.RUNNING:
+                offset = await self.log_size()
+                await self.run_command("save-off")
+                try:
+                    await self.run_command("save-all flush")
+                    await self.wait_for_log_line("Saved the game", offset=offset, timeout=timeout)
+                    await asyncio.to_thread(server._snapshot_world, snapshot_path)
+                finally:
+                    await self.run_command("save-on")
+            else:
+                await asyncio.to_thread(server._snapshot_world, snapshot_path)
+        except BaseException:
+            shutil.rmtree(staging_path, ignore_errors=True)
+            raise
+
+        return await asyncio.to_thread(server._finish_backup, created, staging_path, snapshot_path)
+
+    async def backups(self) -> list:
+        """List of available backups, and the size in Mb."""
+        return await asyncio.to_thread(lambda: self.server.backups)
+
+
+class AsyncServerManager:
+    """Asyncio interface to all Minecraft servers."""
+
+    def __init__(self):
+        self.manager = ServerManager()
+        self._servers: Dict[str, AsyncMinecraftServer] = {}
+
+    async def servers(self) -> List[str]:
+        """List of available servers."""
+        return await asyncio.to_thread(lambda: self.manager.servers)
+
+    def get_server(self, name: str) -> AsyncMinecraftServer:
+        """Get an AsyncMinecraftServer instance by name."""
+        if name not in self._servers:
+            self._servers[name] = AsyncMinecraftServer(name)
+        return self._servers[name]
+
+    async def statuses(self) -> Dict[str, ServerStatus]:
+        """Status of every server, checked concurrently."""
+        names = await self.servers()
+        statuses = await asyncio.gather(*(self.get_server(name).status() for name in names))
+        return dict(zip(names, statuses))
+
+    async def run_command_all(self, command: str):
+        """Run a command on every running server."""
+        statuses = await self.statuses()
+        await asyncio.gather(*(
+            self.get_server(name).run_command(command)
+            for name, status in statuses.items() if status == ServerStatus.RUNNING
+        ))
+
+    async def backup_all(self) -> Dict[str, Path]:
+        """Take an online backup of every server concurrently."""
+        names = await self.servers()
+        archives = await asyncio.gather(*(self.get_server(name).online_backup() for name in names))
+        return dict(zip(names, archives))
@@ -0,0 +1,399 @@
+"""Module for taking world backups."""
+from typing import BinaryIO, Callable, Iterable, Iterator, List, Optional, Set, Tuple
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from pathlib import Path
+import fnmatch
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+import zlib
+
+import sh
+import streamlit as st
+
+logger = st.logger.get_logger(__name__)
+
+
+# Flags that make cp share data blocks with the source (copy-on-write), and fail
+# rather than quietly copying the data where the filesystem can't (such as ext4).
+# Hardlinks are not safe here, because the server rewrites region files in place
+# as soon as saving is switched back on.
+CLONE_FLAGS = {
+    "darwin": ["-cR"],
+    "linux": ["-R", "--reflink=always"],
+}
+
+# Devices a copy-on-write clone failed on, which get a full copy straight away.
+_full_copy_devices: Set[int] = set()
+
+DEFAULT_CODEC = "zip-deflate"
+
+# Default compression level for each codec.
+DEFAULT_LEVELS = {
+    "zip-deflate": 6,
+    "zstd": 3,
+    "lz4": 0,
+}
+
+# Valid compression levels for each codec.
+LEVEL_RANGES = {
+    "zip-deflate": (0, 9),
+    "zstd": (1, 22),
+    "lz4": (0, 16),
+}
+
+# Suffix added to archive members that are compressed with a codec zip does not support.
+MEMBER_SUFFIXES = {
+    "zstd": ".zst",
+    "lz4": ".lz4",
+}
+
+
+def snapshot_tree(source: Path, destination: Path) -> bool:
+    """Copy a directory tree as quickly as the filesystem allows.
+
+    Returns True for a copy-on-write clone, which takes moments whatever the
+    size of the tree. Otherwise every file is copied in full, and an online
+    backup keeps world saving off for as long as that takes.
+    """
+    flags = CLONE_FLAGS.get(sys.platform)
+    device = os.stat(source).st_dev
+    if flags and device not in _full_copy_devices:
+        try:
+            sh.cp(*flags, str(source), str(destination))
+            return True
+        except sh.ErrorReturnCode as e:
+            logger.warning(f"Copy-on-write snapshot of {source} failed: {e.stderr.decode(errors='replace').strip().splitlines()[0]}")
+            _full_copy_devices.add(device)
+            shutil.rmtree(destination, ignore_errors=True)
+
+    logger.info(f"Taking a full copy of {source}, the filesystem doesn't support copy-on-write clones")
+    shutil.copytree(source, destination)
+    return False
+
+
+def _deflate_compressor(level: int) -> Callable[[bytes], bytes]:
+    def compress(data: bytes) -> bytes:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        return compressor.compress(data) + compressor.flush()
+    return compress
+
+
+def _zstd_compressor(level: int) -> Callable[[bytes], bytes]:
+    import zstandard
+    compressor = zstandard.ZstdCompressor(level=level)
+    return compressor.compress
+
+
+def _lz4_compressor(level: int) -> Callable[[bytes], bytes]:
+    import lz4.frame
+    def compress(data: bytes) -> bytes:
+        return lz4.frame.compress(data, compression_level=level)
+    return compress
+
+
+COMPRESSORS = {
+    "zip-deflate": _deflate_compressor,
+    "zstd": _zstd_compressor,
+    "lz4": _lz4_compressor,
+}
+
+
+def _zstd_copy(source: BinaryIO, destination: BinaryIO) -> None:
+    import zstandard
+    zstandard.ZstdDecompressor().copy_stream(source, destination)
+
+
+def _lz4_copy(source: BinaryIO, destination: BinaryIO) -> None:
+    import lz4.frame
+    with lz4.frame.open(source, "rb") as f:
+        shutil.copyfileobj(f, destination)
+
+
+# Functions that decompress archive members with a codec suffix.
+DECOMPRESSORS = {
+    ".zst": _zstd_copy,
+    ".lz4": _lz4_copy,
+}
+
+# World directory patterns for each dimension.
+DIMENSION_PATTERNS = {
+    "overworld": ["region/*", "entities/*", "poi/*"],
+    "nether": ["DIM-1/*"],
+    "end": ["DIM1/*"],
+}
+
+# Directory holding each dimension's region folders, relative to the world directory.
+DIMENSION_DIRECTORIES = {
+    "overworld": "",
+    "nether": "DIM-1/",
+    "end": "DIM1/",
+}
+
+
+def area_patterns(x1: int, z1: int, x2: int, z2: int, dimension: str = "overworld") -> List[str]:
+    """World directory patterns for the region files covering an area, in block coordinates."""
+    prefix = DIMENSION_DIRECTORIES[dimension]
+    def generator():
+        for region_x in range(min(x1, x2) >> 9, (max(x1, x2) >> 9) + 1):
+            for region_z in range(min(z1, z2) >> 9, (max(z1, z2) >> 9) + 1):
+                for folder in ("region", "entities", "poi"):
+                    yield f"{prefix}{folder}/r.{region_x}.{region_z}.mca"
+    return list(generator())
+
+
+def available_codecs() -> List[str]:
+    """Codecs that can be used with the installed packages."""
+    def generator():
+        for codec, factory in COMPRESSORS.items():
+            try:
+                factory(DEFAULT_LEVELS[codec])
+            except ImportError:
+                continue
+            yield codec
+    return list(generator())
+
+
+@dataclass
+class BackupStats:
+    """Statistics for a written backup archive."""
+    codec: str
+    level: int
+    files: int
+    raw_bytes: int
+    archive_bytes: int
+    seconds: float
+
+    @property
+    def ratio(self) -> float:
+        """Compression ratio (raw size / archive size)."""
+        return self.raw_bytes / self.archive_bytes if self.archive_bytes else 0.0
+
+    @property
+    def throughput(self) -> float:
+        """Throughput in Mb of raw data per second."""
+        return self.raw_bytes / 1024 / 1024 / self.seconds if self.seconds else 0.0
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self))
+
+    @classmethod
+    def from_json(cls, data: str) -> "BackupStats":
+        return cls(**json.loads(data))
+
+
+class BackupWriter:
+    """Write a directory to a zip archive, compressing files in parallel.
+
+    Files are compressed on a thread pool (the compression libraries release the
+    GIL) and written to the archive in order as they complete. With the
+    ``zip-deflate`` codec the archive is a standard zip file. The ``zstd`` and
+    ``lz4`` codecs store each compressed file as an uncompressed zip member with a
+    ``.zst`` or ``.lz4`` suffix, so the archive can still be listed and read
+    member by member.
+    """
+
+    def __init__(self, codec: str = DEFAULT_CODEC, level: Optional[int] = None, workers: Optional[int] = None):
+        if codec not in COMPRESSORS:
+            raise ValueError(f"Unknown backup codec: {codec}")
+        self.codec = codec
+        self.level = DEFAULT_LEVELS[codec] if level is None else level
+        self.workers = workers or os.cpu_count() or 1
+        try:
+            self.compress = COMPRESSORS[codec](self.level)
+        except ImportError as e:
+            raise RuntimeError(f"The {codec} codec requires the '{e.name}' package to be installed.") from e
+
+    @staticmethod
+    def _source_files(source: Path) -> Iterator[Tuple[Path, str]]:
+        """Files in the source directory and their archive names."""
+        for path in sorted(source.rglob("*")):
+            if path.is_file():
+                yield path, str(Path(source.name) / path.relative_to(source))
+
+    def _compress_file(self, path: Path) -> Tuple[int, int, bytes]:
+        """Read and compress a file, returning its size, CRC and compressed data."""
+        data = path.read_bytes()
+        return len(data), zlib.crc32(data), self.compress(data)
+
+    def _compressed_files(self, source: Path) -> Iterator[Tuple[Path, str, Tuple[int, int, bytes]]]:
+        """Compress files in parallel, yielding results in order.
+
+        Only a bounded number of files are in flight at once to limit memory use.
+        """
+        pending: deque[Tuple[Path, str, Future]] = deque()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for path, arcname in self._source_files(source):
+                pending.append((path, arcname, executor.submit(self._compress_file, path)))
+                if len(pending) >= self.workers * 2:
+                    path, arcname, future = pending.popleft()
+                    yield path, arcname, future.result()
+            while pending:
+                path, arcname, future = pending.popleft()
+                yield path, arcname, future.result()
+
+    @staticmethod
+    def _add_member(zf: zipfile.ZipFile, zinfo: zipfile.ZipInfo, data: bytes) -> None:
+        """Add already compressed data to a zip file.
+
+        zipfile has no API for adding data that was compressed elsewhere, so the
+        local header and data are written directly and the entry is registered for
+        the central directory that is written when the file is closed.
+        """
+        zinfo.header_offset = zf.fp.tell()
+        zf.fp.write(zinfo.FileHeader())
+        zf.fp.write(data)
+        zf.filelist.append(zinfo)
+        zf.NameToInfo[zinfo.filename] = zinfo
+        zf.start_dir = zf.fp.tell()
+
+    def write(self, source: Path, archive: Path) -> BackupStats:
+        """Write the contents of a directory to an archive.
+
+        Archive members are stored relative to the parent of the source directory,
+        so a snapshot of ``world`` is stored under ``world/``.
+        """
+        logger.info(f"Writing {self.codec} backup archive: {archive}")
+        started = time.monotonic()
+        files = raw_bytes = 0
+        suffix = MEMBER_SUFFIXES.get(self.codec, "")
+        partial = archive.with_suffix(".partial")
+
+        with zipfile.ZipFile(partial, "w") as zf:
+            for path, arcname, (size, crc, data) in self._compressed_files(source):
+                zinfo = zipfile.ZipInfo.from_file(path, arcname=arcname + suffix)
+                zinfo.compress_size = len(data)
+                if suffix:
+                    zinfo.compress_type = zipfile.ZIP_STORED
+                    zinfo.file_size = len(data)
+                    zinfo.CRC = zlib.crc32(data)
+                else:
+                    zinfo.compress_type = zipfile.ZIP_DEFLATED
+                    zinfo.file_size = size
+                    zinfo.CRC = crc
+                self._add_member(zf, zinfo, data)
+                files += 1
+                raw_bytes += size
+
+            # The archive size is only known once the central directory is written,
+            # so it is left out of the stats stored in the archive comment.
+            stats = BackupStats(
+                codec=self.codec,
+                level=self.level,
+                files=files,
+                raw_bytes=raw_bytes,
+                archive_bytes=0,
+                seconds=round(time.monotonic() - started, 3),
+            )
+            zf.comment = stats.to_json().encode()
+
+        stats.archive_bytes = partial.stat().st_size
+        partial.rename(archive)
+        logger.info(
+            f"Backup written: {stats.files} files, {stats.ratio:.2f}x ratio, {stats.throughput:.1f} Mb/s"
+        )
+        return stats
+
+
+def read_backup_stats(archive: Path) -> Optional[BackupStats]:
+    """Read the statistics stored in an archive written by BackupWriter."""
+    try:
+        with zipfile.ZipFile(archive) as zf:
+            comment = zf.comment
+    except (OSError, zipfile.BadZipFile):
+        return None
+    try:
+        stats = BackupStats.from_json(comment.decode())
+    except (ValueError, TypeError):
+        return None
+    stats.archive_bytes = archive.stat().st_size
+    return stats
+
+
+class BackupReader:
+    """Random access reader for backup archives.
+
+    Members are read individually through the zip central directory, so
+    restoring a few files never decompresses the rest of the archive. Member
+    names are relative to the world directory, e.g. ``region/r.0.0.mca``.
+    """
+
+    def __init__(self, archive: Path):
+        self.archive = Path(archive)
+
+    @staticmethod
+    def _world_name(member: str) -> str:
+        """Member name relative to the world directory, without any codec suffix."""
+        name = member.split("/", 1)[1] if "/" in member else member
+        root, ext = os.path.splitext(name)
+        return root if ext in DECOMPRESSORS else name
+
+    @property
+    def members(self) -> List[str]:
+        """Files in the backup, relative to the world directory."""
+        with zipfile.ZipFile(self.archive) as zf:
+            return [self._world_name(i.filename) for i in zf.infolist() if not i.is_dir()]
+
+    def extract(self, patterns: Iterable[str], destination: Path, clear: Iterable[str] = ()) -> List[Path]:
+        """Extract files matching any of the patterns into a world directory.
+
+        Files are extracted into a temporary directory next to the world first,
+        and only moved into place once every one has been written, so a failed
+        restore leaves the world as it was. Directories in clear (relative to the
+        world directory) are swapped for their restored contents, so files created
+        since the backup don't survive the restore. Members that would be written
+        outside the world directory are refused.
+        """
+        patterns = list(patterns)
+        destination = Path(destination)
+        root = destination.resolve()
+        clear = [directory for directory in clear if (destination / directory).resolve().is_relative_to(root)]
+        with zipfile.ZipFile(self.archive) as zf:
+            members = []
+            for info in zf.infolist():
+                name = self._world_name(info.filename)
+                if info.is_dir() or not any(fnmatch.fnmatch(name, p) for p in patterns):
+                    continue
+                if not (destination / name).resolve().is_relative_to(root):
+                    raise ValueError(f"Backup member {info.filename} is outside the world directory")
+                members.append((info, name))
+
+            destination.mkdir(parents=True, exist_ok=True)
+            work = Path(tempfile.mkdtemp(prefix=f".{destination.name}-restore-", dir=destination.parent))
+            staged, replaced = work / "new", work / "old"
+            try:
+                for info, name in members:
+                    target = staged / name
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    copy = DECOMPRESSORS.get(os.path.splitext(info.filename)[1], shutil.copyfileobj)
+                    with zf.open(info) as source, open(target, "wb") as f:
+                        copy(source, f)
+
+                # Everything is extracted, swap it in with renames on the same filesystem
+                for directory in clear:
+                    path = destination / directory
+                    if path.is_dir():
+                        logger.info(f"Clearing {path} before restoring")
+                        (replaced / directory).parent.mkdir(parents=True, exist_ok=True)
+                        os.replace(path, replaced / directory)
+                    if (staged / directory).is_dir():
+                        path.parent.mkdir(parents=True, exist_ok=True)
+                        os.replace(staged / directory, path)
+                restored = []
+                for _, name in members:
+                    target = destination / name
+                    if (staged / name).exists():
+                        target.parent.mkdir(parents=True, exist_ok=True)
+                        os.replace(staged / name, target)
+                    restored.append(target)
+            finally:
+                shutil.rmtree(work, ignore_errors=True)
+
+        logger.info(f"Restored {len(restored)} files from {self.archive.name}")
+        return restored
@@ -0,0 +1,193 @@
+"""Module for the backup catalogue."""
+from typing import Dict, List, Optional
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from pathlib import Path
+import json
+import os
+import threading
+
+import streamlit as st
+
+from backup import read_backup_stats
+
+logger = st.logger.get_logger(__name__)
+
+
+@dataclass
+class BackupEntry:
+    """Metadata for a backup archive."""
+    name: str
+    created: str
+    archive_bytes: int
+    world_bytes: Optional[int] = None
+    version: Optional[str] = None
+    codec: Optional[str] = None
+    level: Optional[int] = None
+    files: Optional[int] = None
+    seconds: Optional[float] = None
+
+    @property
+    def created_time(self) -> datetime:
+        return datetime.fromisoformat(self.created)
+
+    @property
+    def size_mb(self) -> float:
+        return round(self.archive_bytes / 1024 / 1024, 2)
+
+    @property
+    def ratio(self) -> Optional[float]:
+        """Compression ratio (world size / archive size)."""
+        if self.world_bytes is None or not self.archive_bytes:
+            return None
+        return self.world_bytes / self.archive_bytes
+
+    @property
+    def throughput(self) -> Optional[float]:
+        """Compression throughput in Mb per second."""
+        if self.world_bytes is None or not self.seconds:
+            return None
+        return self.world_bytes / 1024 / 1024 / self.seconds
+
+
+@dataclass
+class RetentionPolicy:
+    """Grandfather-father-son retention policy.
+
+    The newest ``keep_last`` backups are always kept. On top of that the newest
+    backup of each of the last ``daily`` days, ``weekly`` weeks and ``monthly``
+    months is kept. Everything else is expired.
+    """
+    keep_last: int = 3
+    daily: int = 7
+    weekly: int = 4
+    monthly: int = 12
+
+    def expired(self, entries: List[BackupEntry]) -> List[BackupEntry]:
+        """Entries that are not kept by the policy."""
+        newest_first = sorted(entries, key=lambda e: e.created, reverse=True)
+        keep = {e.name for e in newest_first[:self.keep_last]}
+
+        periods = [
+            (self.daily, lambda t: t.strftime("%Y-%m-%d")),
+            (self.weekly, lambda t: t.strftime("%G-W%V")),
+            (self.monthly, lambda t: t.strftime("%Y-%m")),
+        ]
+        for count, period_of in periods:
+            seen = set()
+            for entry in newest_first:
+                period = period_of(entry.created_time)
+                if period in seen:
+                    continue
+                if len(seen) >= count:
+                    break
+                seen.add(period)
+                keep.add(entry.name)
+
+        return [e for e in newest_first if e.name not in keep]
+
+
+class BackupCatalogue:
+    """Persisted index of backup archives in a backup directory."""
+
+    index_filename = "catalogue.json"
+
+    # Serialises updates to the index within the process.
+    _lock = threading.Lock()
+
+    def __init__(self, backup_path: Path):
+        self.backup_path = Path(backup_path)
+
+    @property
+    def index_path(self) -> Path:
+        return self.backup_path / self.index_filename
+
+    def _load(self) -> Dict[str, BackupEntry]:
+        try:
+            with open(self.index_path, "r") as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+        return {name: BackupEntry(**entry) for name, entry in data.get("backups", {}).items()}
+
+    def _save(self, entries: Dict[str, BackupEntry]) -> None:
+        self.backup_path.mkdir(parents=True, exist_ok=True)
+        partial = self.index_path.with_suffix(".partial")
+        with open(partial, "w") as f:
+            json.dump({"backups": {name: asdict(e) for name, e in entries.items()}}, f, indent=2)
+        os.replace(partial, self.index_path)
+
+    @property
+    def entries(self) -> List[BackupEntry]:
+        """Catalogued backups, oldest first."""
+        return sorted(self._load().values(), key=lambda e: e.created)
+
+    @property
+    def total_bytes(self) -> int:
+        """Total size of all catalogued backups in bytes."""
+        return sum(e.archive_bytes for e in self._load().values())
+
+    def add(self, entry: BackupEntry) -> None:
+        """Add or replace a backup in the catalogue."""
+        logger.info(f"Cataloguing backup: {entry.name}")
+        with self._lock:
+            entries = self._load()
+            entries[entry.name] = entry
+            self._save(entries)
+
+    def _entry_for_file(self, archive: Path) -> BackupEntry:
+        """Catalogue entry for an archive that was not added when it was written."""
+        stat = archive.stat()
+        entry = BackupEntry(
+            name=archive.name,
+            created=datetime.fromtimestamp(stat.st_mtime).isoformat(timespec="seconds"),
+            archive_bytes=stat.st_size,
+        )
+        stats = read_backup_stats(archive)
+        if stats:
+            entry.world_bytes = stats.raw_bytes
+            entry.codec = stats.codec
+            entry.level = stats.level
+            entry.files = stats.files
+            entry.seconds = stats.seconds
+        return entry
+
+    def sync(self) -> None:
+        """Bring the catalogue in line with the archives in the backup directory.
+
+        Only archives that are new to the catalogue are inspected, so this is cheap
+        to run when nothing has changed.
+        """
+        if not self.backup_path.exists():
+            return
+        with self._lock:
+            entries = self._load()
+            names = {e.name for e in os.scandir(self.backup_path) if e.name.endswith(".zip") and e.is_file()}
+            changed = False
+            for name in names - entries.keys():
+                entries[name] = self._entry_for_file(self.backup_path / name)
+                changed = True
+            for name in entries.keys() - names:
+                del entries[name]
+                changed = True
+            if changed:
+                self._save(entries)
+
+    def prune(self, policy: RetentionPolicy) -> List[str]:
+        """Delete backups that are expired by the retention policy."""
+        with self._lock:
+            entries = self._load()
+            expired = policy.expired(list(entries.values()))
+            for entry in expired:
+                logger.info(f"Removing expired backup: {entry.name}")
+                (self.backup_path / entry.name).unlink(missing_ok=True)
+                del entries[entry.name]
+            if expired:
+                self._save(entries)
+        return [e.name for e in expired]
+
+    def prune_in_background(self, policy: RetentionPolicy) -> threading.Thread:
+        """Apply the retention policy on a background thread."""
+        thread = threading.Thread(target=self.prune, args=(policy,), name="backup-retention", daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,318 @@
+"""Client module for the fleet daemon.
+
+RemoteServerManager and RemoteServer mirror the parts of ServerManager and
+MinecraftServer used by the control, Logs and Data pages, so pages can run
+against the daemon or directly against the servers. Pages that edit server
+files use DaemonControlledServerManager, which works on local servers but
+starts, stops and backs them up through the daemon. Also usable from the command line:
+
+    python app/client.py list
+    python app/client.py start <server>
+    python app/client.py command <server> "time set day"
+"""
+from typing import TYPE_CHECKING, List, Optional, Tuple, Union
+from datetime import datetime
+from pathlib import Path
+from urllib.error import HTTPError, URLError
+from urllib.parse import quote, urlencode
+from urllib.request import Request, urlopen
+import argparse
+import base64
+import json
+import sys
+
+import streamlit as st
+
+from enums import ServerStatus
+from log_reader import MinecraftLogReader
+from log_window import LogWindow
+from metrics import MetricsRing
+from server import MinecraftServer, ServerManager
+import config
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = st.logger.get_logger(__name__)
+
+
+class DaemonClient:
+    """HTTP/JSON client for the fleet daemon."""
+
+    def __init__(self, host: str = config.DAEMON_HOST, port: int = config.DAEMON_PORT, timeout: float = 120):
+        self.url = f"http://{host}:{port}"
+        self.timeout = timeout
+
+    def request(self, method: str, path: str, data: Optional[dict] = None) -> dict:
+        body = json.dumps(data).encode() if data is not None else None
+        request = Request(self.url + path, data=body, method=method, headers={"Content-Type": "application/json"})
+        try:
+            with urlopen(request, timeout=self.timeout) as response:
+                return json.load(response)
+        except HTTPError as e:
+            try:
+                message = json.load(e).get("error", str(e))
+            except ValueError:
+                message = str(e)
+            raise RuntimeError(message) from e
+
+    def get(self, path: str) -> dict:
+        return self.request("GET", path)
+
+    def post(self, path: str, data: Optional[dict] = None) -> dict:
+        return self.request("POST", path, data or {})
+
+
+class RemoteLogWindow:
+    """Paged access to a log file through the fleet daemon, see LogWindow."""
+
+    def __init__(self, client: DaemonClient, path: str):
+        self.client = client
+        self.path = path
+        self.line_count = client.get(path)["line_count"]
+
+    page_count = LogWindow.page_count
+
+    def line_at_time(self, time: str) -> int:
+        """First line logged at or after a time of day (HH:MM:SS)."""
+        return self.client.get(f"{self.path}?{urlencode({'time': time})}")["line"]
+
+    def page(self, number: int, page_size: int = 100) -> List[Tuple[int, str]]:
+        """Lines on a page, numbered from 0."""
+        lines = self.client.get(f"{self.path}/page?{urlencode({'number': number, 'size': page_size})}")["lines"]
+        return [(line_number, text) for line_number, text in lines]
+
+
+class RemoteLogReader:
+    """Log files of a server read through the fleet daemon, see MinecraftLogReader."""
+
+    expression = MinecraftLogReader.expression
+
+    def __init__(self, client: DaemonClient, path: str):
+        self.client = client
+        self.path = f"{path}/logs"
+
+    @property
+    def log_files(self) -> List[Path]:
+        """Log files, newest (latest.log) first."""
+        return [Path(name) for name in self.client.get(f"{self.path}/files")["files"]]
+
+    @property
+    def players(self) -> List[str]:
+        """Players seen in the logs."""
+        return self.client.get(f"{self.path}/players")["players"]
+
+    def search(self, text: str = "", player: Optional[str] = None, limit: int = 100) -> List[dict]:
+        """Newest log lines containing every word in text, optionally about a player."""
+        query = {"text": text, "limit": limit, **({"player": player} if player else {})}
+        lines = self.client.get(f"{self.path}/search?{urlencode(query)}")["lines"]
+        return [{**line, "timestamp": datetime.fromisoformat(line["timestamp"])} for line in lines]
+
+    def window(self, name: str = "latest.log") -> RemoteLogWindow:
+        """Paged view of a log file."""
+        return RemoteLogWindow(self.client, f"{self.path}/files/{quote(name)}")
+
+    def get_events_by_time(self, interval: str = "1min") -> "pd.DataFrame":
+        """Number of log lines per interval."""
+        import pandas as pd
+        events = self.client.get(f"{self.path}/events?{urlencode({'interval': interval})}")["events"]
+        df = pd.DataFrame(events, columns=["event time", "event count"])
+        df["event time"] = pd.to_datetime(df["event time"])
+        return df
+
+
+class RemoteMetrics:
+    """Performance metrics of a server read through the fleet daemon, see MetricsRing."""
+
+    def __init__(self, client: DaemonClient, path: str):
+        self.client = client
+        self.path = f"{path}/metrics"
+
+    def to_pandas(self, since: Optional[float] = None) -> "pd.DataFrame":
+        """Samples as a pandas DataFrame indexed by time."""
+        query = f"?{urlencode({'since': since})}" if since is not None else ""
+        return MetricsRing.frame(base64.b64decode(self.client.get(self.path + query)["records"]))
+
+
+class RemoteServer:
+    """A Minecraft server controlled through the fleet daemon."""
+
+    def __init__(self, name: str, client: DaemonClient):
+        self.name = name
+        self.client = client
+        self.log_reader = RemoteLogReader(client, self._path)
+        self.metrics = RemoteMetrics(client, self._path)
+
+    @property
+    def _path(self) -> str:
+        return f"/servers/{self.name}"
+
+    @property
+    def status(self) -> ServerStatus:
+        return ServerStatus(self.client.get(self._path)["status"])
+
+    @property
+    def port_number(self) -> int:
+        return self.client.get(self._path)["port"]
+
+    def start(self):
+        """Start the server."""
+        self.client.post(f"{self._path}/start")
+
+    def stop(self):
+        """Stop the server."""
+        self.client.post(f"{self._path}/stop")
+
+    def restart(self):
+        """Restart the server."""
+        self.client.post(f"{self._path}/restart")
+
+    def run_command(self, command: str):
+        """Run a server command."""
+        logger.info(f"Running command: {command}")
+        self.client.post(f"{self._path}/command", {"command": command})
+
+    # Game rule and weather commands are built the same way as for local servers
+    set_game_rule = MinecraftServer.set_game_rule
+    set_weather = MinecraftServer.set_weather
+    set_weather_cycle = MinecraftServer.set_weather_cycle
+
+    def log_tail(self, lines: int = 100, delay: float = 0) -> str:
+        """Tail the log file."""
+        return self.client.get(f"{self._path}/logs/tail?lines={lines}")["lines"]
+
+    @property
+    def backups(self) -> List[Tuple[str, float]]:
+        """List of available backups, and the size in Mb."""
+        return [(b["name"], b["size_mb"]) for b in self.client.get(f"{self._path}/backups")["backups"]]
+
+    def online_backup(self) -> str:
+        """Backup the world without stopping the server."""
+        return self.client.post(f"{self._path}/backups")["name"]
+
+
+class RemoteServerManager:
+    """Server manager backed by the fleet daemon."""
+
+    def __init__(self, client: Optional[DaemonClient] = None):
+        self.client = client or DaemonClient()
+
+    @property
+    def servers(self) -> List[str]:
+        """List of available servers."""
+        return [s["name"] for s in self.client.get("/servers")["servers"]]
+
+    def get_server(self, name: str) -> RemoteServer:
+        """Get a RemoteServer instance by name."""
+        return RemoteServer(name, self.client)
+
+    get_ui_server_list = ServerManager.get_ui_server_list
+
+
+class DaemonControlledServer(MinecraftServer):
+    """A local server whose status, start, stop, restart and backups go through the fleet daemon.
+
+    Pages that edit server files (version, properties, backups, world) need a
+    local server, but the daemon should still see every start and stop so its
+    status, idle suspension and metrics stay in step.
+    """
+
+    def __init__(self, name: str, client: DaemonClient):
+        super().__init__(name)
+        self.remote = RemoteServer(name, client)
+
+    @property
+    def status(self) -> ServerStatus:
+        return self.remote.status
+
+    def start(self):
+        """Start the server."""
+        self.remote.start()
+
+    def stop(self):
+        """Stop the server."""
+        self.remote.stop()
+
+    def restart(self):
+        """Restart the server."""
+        self.remote.restart()
+
+    def online_backup(self, timeout: float = 60) -> Path:
+        """Backup the world without stopping the server."""
+        return self.backup_path / self.remote.online_backup()
+
+
+class DaemonControlledServerManager(ServerManager):
+    """Local server manager whose servers are started, stopped and backed up by the fleet daemon."""
+
+    def __init__(self, client: Optional[DaemonClient] = None):
+        super().__init__()
+        self.client = client or DaemonClient()
+
+    def get_server(self, name: str) -> DaemonControlledServer:
+        """Get a DaemonControlledServer instance by name."""
+        return DaemonControlledServer(name, self.client)
+
+
+def get_server_manager() -> Union[ServerManager, RemoteServerManager]:
+    """Server manager for the pages: the daemon if it is enabled, otherwise local.
+
+    Without the daemon, the app process collects metrics for every server.
+    """
+    if config.USE_DAEMON:
+        return RemoteServerManager()
+    manager = ServerManager()
+    manager.collect_metrics()
+    return manager
+
+
+def get_local_server_manager() -> Union[ServerManager, DaemonControlledServerManager]:
+    """Server manager for the pages that edit server files, which need local servers.
+
+    When the daemon is enabled the servers are still started, stopped and
+    backed up through it.
+    """
+    if config.USE_DAEMON:
+        return DaemonControlledServerManager()
+    manager = ServerManager()
+    manager.collect_metrics()
+    return manager
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Control Minecraft servers through the fleet daemon.")
+    subparsers = parser.add_subparsers(dest="action", required=True)
+    subparsers.add_parser("list", help="List servers and their status.")
+    for action in ("start", "stop", "restart", "backup"):
+        subparsers.add_parser(action, help=f"{action.capitalize()} a server.").add_argument("server")
+    tail = subparsers.add_parser("tail", help="Show the end of a server log.")
+    tail.add_argument("server")
+    tail.add_argument("--lines", type=int, default=20)
+    command = subparsers.add_parser("command", help="Run a server command.")
+    command.add_argument("server")
+    command.add_argument("command")
+    args = parser.parse_args()
+
+    client = DaemonClient()
+    try:
+        if args.action == "list":
+            for server in client.get("/servers")["servers"]:
+                print(f"{server['name']:<20} {server['status']:<8} {server['port'] or ''}")
+            return
+
+        server = RemoteServer(args.server, client)
+        if args.action == "tail":
+            print(server.log_tail(lines=args.lines))
+        elif args.action == "command":
+            server.run_command(args.command)
+        elif args.action == "backup":
+            print(f"Backup written: {server.online_backup()}")
+        else:
+            getattr(server, args.action)()
+            print(f"{args.server}: {server.status.value}")
+    except (URLError, RuntimeError) as e:
+        sys.exit(f"Error: {e}")
+
+
+if __name__ == "__main__":
+    main()
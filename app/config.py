@@ -1,5 +1,22 @@
+from pathlib import Path
+
 from decouple import config
 
 
+# Directory holding the servers, templates and downloads directories. Paths are anchored here
+# instead of the working directory, which other threads may not share
+DATA_DIRECTORY = config("DATA_DIRECTORY", default=str(Path(__file__).resolve().parent.parent))
+
 JAVA_HOME = config("JAVA_HOME", default="/usr/local/Cellar/openjdk/20.0.1/libexec/openjdk.jdk/Contents/Home")
-JAVA_BIN = f"{JAVA_HOME}/bin/java"
\ No newline at end of file
+JAVA_BIN = f"{JAVA_HOME}/bin/java"
+
+# Number of servers expected to run at once when sharing memory between them (0 for all servers)
+MAX_CONCURRENT_SERVERS = config("MAX_CONCURRENT_SERVERS", default=0, cast=int)
+
+# Memory to leave for the operating system, in Mb (0 to pick automatically)
+RESERVED_MEMORY_MB = config("RESERVED_MEMORY_MB", default=0, cast=int)
+
+# Local fleet daemon (see daemon.py). When USE_DAEMON is set the pages talk to the daemon
+USE_DAEMON = config("USE_DAEMON", default=False, cast=bool)
+DAEMON_HOST = config("DAEMON_HOST", default="127.0.0.1")
+DAEMON_PORT = config("DAEMON_PORT", default=8600, cast=int)
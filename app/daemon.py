@@ -0,0 +1,437 @@
+"""Fleet daemon module.
+
+A long-running process that owns the state of all Minecraft servers and serves
+it over a local HTTP/JSON API, so every Streamlit session and CLI call shares
+one set of status polls and log followers instead of repeating the work. The
+daemon also suspends idle servers and wakes them on demand (see idle.py).
+
+Run with:
+
+    python app/daemon.py
+
+Endpoints:
+
+    GET  /servers                        status and port of every server
+    GET  /servers/<name>                 status and port of a server
+    POST /servers/<name>/start           start a server
+    POST /servers/<name>/stop            stop a server
+    POST /servers/<name>/restart         restart a server
+    POST /servers/<name>/command         run a command, body: {"command": "..."}
+    GET  /servers/<name>/logs/tail       last lines of the log, ?lines=100
+    GET  /servers/<name>/logs/stream     websocket streaming new log lines
+    GET  /servers/<name>/logs/files      log file names, newest first
+    GET  /servers/<name>/logs/files/<file>
+                                         line count of a log file, ?time=HH:MM:SS adds the line logged then
+    GET  /servers/<name>/logs/files/<file>/page
+                                         page of lines from a log file, ?number=0&size=100
+    GET  /servers/<name>/logs/search     indexed log search, ?text=...&player=...&limit=100
+    GET  /servers/<name>/logs/players    players seen in the logs
+    GET  /servers/<name>/logs/events     log lines per interval, ?interval=1min
+    GET  /servers/<name>/metrics         raw metrics records (base64), ?since=<unix time>
+    GET  /servers/<name>/backups         list backups
+    POST /servers/<name>/backups         take an online backup
+
+Metrics are collected by the daemon for every running server.
+"""
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+import asyncio
+import base64
+import hashlib
+import json
+import re
+import struct
+import time
+
+import streamlit as st
+
+from async_server import AsyncServerManager
+from enums import ServerStatus
+from idle import IdleManager
+from log_window import LogWindow
+from metrics import MetricsCollector
+import config
+
+logger = st.logger.get_logger(__name__)
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+# Seconds log event counts are reused for before parsing the logs again
+EVENTS_MAX_AGE = 60
+
+
+class HTTPError(Exception):
+    """Error returned to the client as a JSON response."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class LogBroadcaster:
+    """Follow a server log once and fan new lines out to any number of subscribers."""
+
+    def __init__(self, server):
+        self.server = server
+        self.subscribers: Set[asyncio.Queue] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=1000)
+        self.subscribers.add(queue)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._follow())
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self.subscribers.discard(queue)
+        if not self.subscribers and self._task:
+            self._task.cancel()
+
+    async def _follow(self):
+        async for line in self.server.follow_log():
+            for queue in list(self.subscribers):
+                if queue.full():
+                    # Drop lines for slow viewers rather than holding up everyone else
+                    continue
+                queue.put_nowait(line)
+
+
+class FleetDaemon:
+    """HTTP/JSON API over all Minecraft servers."""
+
+    def __init__(self, host: str = config.DAEMON_HOST, port: int = config.DAEMON_PORT, poll_interval: float = 5):
+        self.host = host
+        self.port = port
+        self.poll_interval = poll_interval
+        self.manager = AsyncServerManager()
+        self.statuses: Dict[str, ServerStatus] = {}
+        self.ports: Dict[str, Optional[int]] = {}
+        self.polled = 0.0
+        self.broadcasters: Dict[str, LogBroadcaster] = {}
+        self.collectors: Dict[str, MetricsCollector] = {}
+        self.events: Dict[Tuple[str, str], Tuple[float, tuple, List[list]]] = {}
+        self.idle = IdleManager(self.manager)
+        self.routes = [
+            ("GET", re.compile(r"^/servers$"), self.list_servers),
+            ("GET", re.compile(r"^/servers/([^/]+)$"), self.get_server),
+            ("POST", re.compile(r"^/servers/([^/]+)/(start|stop|restart)$"), self.control_server),
+            ("POST", re.compile(r"^/servers/([^/]+)/command$"), self.run_command),
+            ("GET", re.compile(r"^/servers/([^/]+)/logs/tail$"), self.log_tail),
+            ("GET", re.compile(r"^/servers/([^/]+)/logs/files$"), self.log_files),
+            ("GET", re.compile(r"^/servers/([^/]+)/logs/files/([^/]+)$"), self.log_file),
+            ("GET", re.compile(r"^/servers/([^/]+)/logs/files/([^/]+)/page$"), self.log_page),
+            ("GET", re.compile(r"^/servers/([^/]+)/logs/search$"), self.search_logs),
+            ("GET", re.compile(r"^/servers/([^/]+)/logs/players$"), self.log_players),
+            ("GET", re.compile(r"^/servers/([^/]+)/logs/events$"), self.log_events),
+            ("GET", re.compile(r"^/servers/([^/]+)/metrics$"), self.metrics),
+            ("GET", re.compile(r"^/servers/([^/]+)/backups$"), self.list_backups),
+            ("POST", re.compile(r"^/servers/([^/]+)/backups$"), self.create_backup),
+        ]
+
+    # Polling
+
+    async def _refresh_server(self, name: str) -> None:
+        server = self.manager.get_server(name)
+        try:
+            self.statuses[name] = await server.status()
+            self.ports[name] = await server.port_number()
+        except Exception as e:
+            logger.warning(f"Unable to refresh server {name}: {e}")
+            self.statuses[name] = ServerStatus.UNKNOWN
+            self.ports.setdefault(name, None)
+        self._collect_metrics(name)
+
+    def _collect_metrics(self, name: str) -> None:
+        """Run a metrics collector for a server, which samples it while it is running."""
+        if name not in self.collectors:
+            self.collectors[name] = MetricsCollector(self.manager.get_server(name).server)
+        self.collectors[name].start()
+
+    async def refresh(self, name: Optional[str] = None) -> None:
+        """Refresh cached status (and port) of one or all servers."""
+        names = [name] if name else await self.manager.servers()
+        await asyncio.gather(*(self._refresh_server(server_name) for server_name in names))
+        if name is None:
+            for removed in set(self.statuses) - set(names):
+                self.statuses.pop(removed, None)
+                self.ports.pop(removed, None)
+                collector = self.collectors.pop(removed, None)
+                if collector:
+                    collector.stop()
+            self.polled = time.time()
+
+    async def poll(self) -> None:
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.poll_interval)
+
+    async def _check_server(self, name: str) -> None:
+        if name not in self.statuses:
+            # Servers created since the last poll are picked up straight away
+            if name not in await self.manager.servers():
+                raise HTTPError(404, f"Unknown server: {name}")
+            await self.refresh(name)
+
+    def _server_info(self, name: str) -> dict:
+        return {"name": name, "status": self.statuses[name].value, "port": self.ports.get(name)}
+
+    # Handlers
+
+    async def list_servers(self, query: dict, body: dict):
+        return {"servers": [self._server_info(name) for name in sorted(self.statuses)], "polled": self.polled}
+
+    async def get_server(self, query: dict, body: dict, name: str):
+        await self._check_server(name)
+        return self._server_info(name)
+
+    async def control_server(self, query: dict, body: dict, name: str, action: str):
+        await self._check_server(name)
+        if action != "stop":
+            await self.idle.release(name)
+        await getattr(self.manager.get_server(name), action)()
+        await self.refresh(name)
+        return self._server_info(name)
+
+    async def run_command(self, query: dict, body: dict, name: str):
+        await self._check_server(name)
+        command = body.get("command")
+        if not command:
+            raise HTTPError(400, "Missing command")
+        await self.manager.get_server(name).run_command(command)
+        return {"ok": True}
+
+    async def log_tail(self, query: dict, body: dict, name: str):
+        await self._check_server(name)
+        lines = int(query.get("lines", ["100"])[0])
+        return {"lines": await self.manager.get_server(name).log_tail(lines)}
+
+    async def _log_reader(self, name: str):
+        await self._check_server(name)
+        return self.manager.get_server(name).server.log_reader
+
+    async def _window(self, name: str, file: str) -> LogWindow:
+        reader = await self._log_reader(name)
+        files = await asyncio.to_thread(lambda: [log_file.name for log_file in reader.log_files])
+        if file not in files:
+            raise HTTPError(404, f"Unknown log file: {file}")
+        return await asyncio.to_thread(reader.window, file)
+
+    async def log_files(self, query: dict, body: dict, name: str):
+        reader = await self._log_reader(name)
+        return {"files": [log_file.name for log_file in await asyncio.to_thread(lambda: reader.log_files)]}
+
+    async def log_file(self, query: dict, body: dict, name: str, file: str):
+        window = await self._window(name, file)
+        data = {"name": file, "line_count": window.line_count}
+        if "time" in query:
+            if not re.fullmatch(r"\d\d:\d\d:\d\d", query["time"][0]):
+                raise HTTPError(400, "Time must be HH:MM:SS")
+            data["line"] = await asyncio.to_thread(window.line_at_time, query["time"][0])
+        return data
+
+    async def log_page(self, query: dict, body: dict, name: str, file: str):
+        window = await self._window(name, file)
+        number = int(query.get("number", ["0"])[0])
+        size = int(query.get("size", ["100"])[0])
+        return {"lines": await asyncio.to_thread(window.page, number, size)}
+
+    async def search_logs(self, query: dict, body: dict, name: str):
+        reader = await self._log_reader(name)
+        text = query.get("text", [""])[0]
+        player = query.get("player", [None])[0]
+        limit = int(query.get("limit", ["100"])[0])
+        lines = await asyncio.to_thread(reader.search, text, player, limit)
+        return {"lines": [
+            {**line, "filename": str(line["filename"]), "timestamp": line["timestamp"].isoformat()} for line in lines
+        ]}
+
+    async def log_players(self, query: dict, body: dict, name: str):
+        reader = await self._log_reader(name)
+        return {"players": await asyncio.to_thread(lambda: reader.players)}
+
+    async def log_events(self, query: dict, body: dict, name: str):
+        reader = await self._log_reader(name)
+        interval = query.get("interval", ["1min"])[0]
+
+        def events() -> List[list]:
+            # Parsing every log is slow, so counts are shared until the logs change and they are a minute old
+            signature = tuple((log_file.name, log_file.stat().st_size) for log_file in reader.log_files)
+            cached = self.events.get((name, interval))
+            if cached and (cached[1] == signature or time.time() - cached[0] < EVENTS_MAX_AGE):
+                return cached[2]
+            df = reader.get_events_by_time(interval=interval)
+            records = [[t.isoformat(), int(count)] for t, count in zip(df["event time"], df["event count"])]
+            self.events[(name, interval)] = (time.time(), signature, records)
+            return records
+
+        return {"events": await asyncio.to_thread(events)}
+
+    async def metrics(self, query: dict, body: dict, name: str):
+        await self._check_server(name)
+        since = float(query["since"][0]) if "since" in query else None
+        data = await asyncio.to_thread(self.manager.get_server(name).server.metrics.read_bytes, since)
+        return {"records": base64.b64encode(data).decode()}
+
+    async def list_backups(self, query: dict, body: dict, name: str):
+        await self._check_server(name)
+        backups = await self.manager.get_server(name).backups()
+        return {"backups": [{"name": n, "size_mb": size} for n, size in backups]}
+
+    async def create_backup(self, query: dict, body: dict, name: str):
+        await self._check_server(name)
+        archive = await self.manager.get_server(name).online_backup()
+        return {"name": archive.name}
+
+    # HTTP
+
+    @staticmethod
+    async def _read_request(reader: asyncio.StreamReader) -> Tuple[str, str, Dict[str, str], bytes]:
+        request_line = (await reader.readline()).decode().strip()
+        if not request_line:
+            raise ConnectionError("Empty request")
+        method, target, _ = request_line.split(" ", 2)
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode().strip()
+            if not line:
+                break
+            key, value = line.split(":", 1)
+            headers[key.strip().lower()] = value.strip()
+        body = await reader.readexactly(int(headers.get("content-length", 0)))
+        return method, target, headers, body
+
+    @staticmethod
+    def _write_response(writer: asyncio.StreamWriter, status: int, data: dict) -> None:
+        payload = json.dumps(data).encode()
+        reason = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}.get(status, "Error")
+        writer.write(
+            f"HTTP/1.1 {status} {reason}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Connection: close\r\n\r\n".encode() + payload
+        )
+
+    async def _dispatch(self, method: str, path: str, query: dict, body: dict):
+        path_matched = False
+        for route_method, expression, handler in self.routes:
+            match = expression.match(path)
+            if not match:
+                continue
+            path_matched = True
+            if route_method == method:
+                return await handler(query, body, *(unquote(group) for group in match.groups()))
+        if path_matched:
+            raise HTTPError(405, f"Method not allowed: {method}")
+        raise HTTPError(404, f"Not found: {path}")
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            method, target, headers, raw_body = await self._read_request(reader)
+            url = urlsplit(target)
+            stream = re.match(r"^/servers/([^/]+)/logs/stream$", url.path)
+            if stream and headers.get("upgrade", "").lower() == "websocket":
+                await self.stream_log(reader, writer, headers, stream.group(1))
+                return
+            try:
+                body = json.loads(raw_body) if raw_body else {}
+                self._write_response(writer, 200, await self._dispatch(method, url.path, parse_qs(url.query), body))
+            except HTTPError as e:
+                self._write_response(writer, e.status, {"error": e.message})
+            except Exception as e:
+                logger.exception(f"Error handling {method} {target}")
+                self._write_response(writer, 500, {"error": str(e)})
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    # Websocket
+
+    @staticmethod
+    def _websocket_frame(text: str) -> bytes:
+        """A single unmasked websocket text frame."""
+        payload = text.encode()
+        if len(payload) < 126:
+            header = struct.pack(">BB", 0x81, len(payload))
+        elif len(payload) < 65536:
+            header = struct.pack(">BBH", 0x81, 126, len(payload))
+        else:
+            header = struct.pack(">BBQ", 0x81, 127, len(payload))
+        return header + payload
+
+    @staticmethod
+    async def _wait_for_close(reader: asyncio.StreamReader) -> None:
+        """Read (and discard) client frames until the client closes the connection."""
+        try:
+            while True:
+                first, second = await reader.readexactly(2)
+                length = second & 0x7F
+                if length == 126:
+                    length, = struct.unpack(">H", await reader.readexactly(2))
+                elif length == 127:
+                    length, = struct.unpack(">Q", await reader.readexactly(8))
+                await reader.readexactly(length + (4 if second & 0x80 else 0))
+                if first & 0x0F == 0x8:
+                    return
+        except (asyncio.IncompleteReadError, ConnectionError):
+            return
+
+    async def stream_log(self, reader, writer, headers: dict, name: str) -> None:
+        """Stream new log lines of a server to a websocket client."""
+        if name not in self.statuses:
+            self._write_response(writer, 404, {"error": f"Unknown server: {name}"})
+            await writer.drain()
+            return
+        key = headers.get("sec-websocket-key")
+        if not key:
+            self._write_response(writer, 400, {"error": "Missing Sec-WebSocket-Key header"})
+            await writer.drain()
+            return
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest())
+        writer.write(
+            b"HTTP/1.1 101 Switching Protocols\r\n"
+            b"Upgrade: websocket\r\n"
+            b"Connection: Upgrade\r\n"
+            b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n"
+        )
+        await writer.drain()
+
+        if name not in self.broadcasters:
+            self.broadcasters[name] = LogBroadcaster(self.manager.get_server(name))
+        broadcaster = self.broadcasters[name]
+        queue = broadcaster.subscribe()
+        closed = asyncio.create_task(self._wait_for_close(reader))
+        try:
+            while not closed.done():
+                line = asyncio.create_task(queue.get())
+                done, _ = await asyncio.wait({line, closed}, return_when=asyncio.FIRST_COMPLETED)
+                if line not in done:
+                    line.cancel()
+                    break
+                writer.write(self._websocket_frame(line.result()))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            closed.cancel()
+            broadcaster.unsubscribe(queue)
+
+    async def serve(self) -> None:
+        await self.refresh()
+        asyncio.create_task(self.poll())
+        asyncio.create_task(self.idle.run())
+        server = await asyncio.start_server(self.handle, self.host, self.port)
+        logger.info(f"Fleet daemon listening on http://{self.host}:{self.port}")
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    asyncio.run(FleetDaemon().serve())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,31 @@
-"""Module for downloading Minecraft server files."""
+"""Module for downloading Minecraft server files.
+
+requests, requests_cache and bs4 are imported when a downloader is first used,
+as is installing the requests cache.
+"""
 from typing import Union
 from pathlib import Path
-import requests
+import functools
+
+from instrumentation import timed
+import config
 
-from bs4 import BeautifulSoup
-import requests_cache
 
-requests_cache.install_cache('mc_server_download_cache')
+@functools.lru_cache(maxsize=None)
+def install_cache():
+    """Install the requests cache for download pages (once per process)."""
+    import requests_cache
+    requests_cache.install_cache('mc_server_download_cache')
 
 
 class MinecraftServerDownloader:
 
-    downloads_directory: Path = Path(__file__).parent.parent / Path("downloads").resolve()
+    downloads_directory: Path = Path(config.DATA_DIRECTORY) / "downloads"
 
     def __init__(self, version: str):
         super().__init__()
         self.version = version
+        install_cache()
 
         # Create downloads directory if it doesn't exist
         if not self.downloads_directory.exists():
@@ -27,8 +37,12 @@ class MinecraftServerDownloader:
         return f"https://mcversions.net/download/{self.version}"
 
     @property
+    @timed("fetch download page")
     def download_url(self) -> str:
         """The download URL for the server file."""
+        import requests
+        from bs4 import BeautifulSoup
+
         response = requests.get(self.download_page)
         soup = BeautifulSoup(response.text, "html.parser")
 
@@ -49,8 +63,11 @@ class MinecraftServerDownloader:
         """Full path to the server file."""
         return self.downloads_directory / self.server_filename
 
+    @timed("download server jar")
     def download_server(self) -> Path:
         """Download a Minecraft server file and return the path to the downloaded file."""
+        import requests
+
         response = requests.get(self.download_url)
         server_file: Path = self.server_file_full_path
         with open(server_file, "wb") as f:
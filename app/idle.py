@@ -0,0 +1,280 @@
+"""Module for suspending idle servers and waking them on demand.
+
+Servers with an idle time set (``idle_minutes`` in manager.json) are stopped
+once nobody has been online for that long. A lightweight wake listener then
+holds the server's port: it answers status pings from the multiplayer screen,
+and when a player tries to join it tells them the server is starting, gives the
+port back and starts the real server.
+
+Idle servers are managed by the fleet daemon.
+"""
+from typing import Callable, Dict, Optional, Set
+import asyncio
+import json
+import re
+import struct
+import time
+
+import streamlit as st
+
+from async_server import AsyncMinecraftServer, AsyncServerManager
+from enums import ServerStatus
+
+logger = st.logger.get_logger(__name__)
+
+JOIN_EXPRESSION = re.compile(r"\]: (\S+) joined the game$")
+LEAVE_EXPRESSION = re.compile(r"\]: (\S+) left the game$")
+LIST_PLAYERS_EXPRESSION = re.compile(r"players online: ?(.*)$")
+
+SLEEPING_MOTD = "Sleeping, join to wake the server up"
+WAKING_MESSAGE = "The server is starting up, try again in a minute."
+
+
+async def read_varint(reader: asyncio.StreamReader) -> int:
+    """Read a protocol VarInt from a stream."""
+    value = 0
+    for position in range(5):
+        byte = (await reader.readexactly(1))[0]
+        value |= (byte & 0x7F) << (7 * position)
+        if not byte & 0x80:
+            return value
+    raise ValueError("VarInt is too long")
+
+
+def pack_varint(value: int) -> bytes:
+    data = bytearray()
+    value &= 0xFFFFFFFF
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            data.append(byte | 0x80)
+        else:
+            data.append(byte)
+            return bytes(data)
+
+
+def pack_string(text: str) -> bytes:
+    data = text.encode()
+    return pack_varint(len(data)) + data
+
+
+def pack_packet(packet_id: int, payload: bytes = b"") -> bytes:
+    body = pack_varint(packet_id) + payload
+    return pack_varint(len(body)) + body
+
+
+async def read_packet(reader: asyncio.StreamReader) -> bytes:
+    """Read a packet, returning its id and data as bytes."""
+    length = await read_varint(reader)
+    if length > 32767:
+        raise ValueError("Packet is too long")
+    return await reader.readexactly(length)
+
+
+def unpack_varint(data: bytes, offset: int = 0):
+    """VarInt at offset in data, and the offset after it."""
+    value = 0
+    for position in range(5):
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << (7 * position)
+        if not byte & 0x80:
+            return value, offset
+    raise ValueError("VarInt is too long")
+
+
+class WakeListener:
+    """Holds a suspended server's port, answering pings and waking the server on login."""
+
+    def __init__(self, port: int, version: Optional[str], on_login: Callable[[], None]):
+        self.port = port
+        self.version = version
+        self.on_login = on_login
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def listening(self) -> bool:
+        return self._server is not None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self.handle, port=self.port, reuse_address=True)
+        logger.info(f"Wake listener holding port {self.port}")
+
+    async def close(self) -> None:
+        if self._server is None:
+            return
+        self._server.close()
+        await self._server.wait_closed()
+        self._server = None
+        logger.info(f"Wake listener released port {self.port}")
+
+    def status_response(self, protocol: int) -> dict:
+        return {
+            # Echo the client's protocol so it shows the server as compatible
+            "version": {"name": self.version or "Sleeping", "protocol": protocol},
+            "players": {"max": 0, "online": 0},
+            "description": {"text": SLEEPING_MOTD},
+        }
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            handshake = await asyncio.wait_for(read_packet(reader), 5)
+            packet_id, offset = unpack_varint(handshake)
+            if packet_id != 0x00:
+                return
+            protocol, offset = unpack_varint(handshake, offset)
+            address_length, offset = unpack_varint(handshake, offset)
+            offset += address_length + 2  # Server address and port
+            next_state, _ = unpack_varint(handshake, offset)
+
+            if next_state == 1:
+                await asyncio.wait_for(read_packet(reader), 5)  # Status request
+                writer.write(pack_packet(0x00, pack_string(json.dumps(self.status_response(protocol)))))
+                await writer.drain()
+                ping = await asyncio.wait_for(read_packet(reader), 5)
+                writer.write(pack_varint(len(ping)) + ping)  # Pong echoes the ping payload
+                await writer.drain()
+            elif next_state in (2, 3):
+                writer.write(pack_packet(0x00, pack_string(json.dumps({"text": WAKING_MESSAGE}))))
+                await writer.drain()
+                self.on_login()
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError, ValueError, IndexError, struct.error):
+            pass
+        finally:
+            writer.close()
+
+
+class IdleManager:
+    """Suspend servers nobody is playing on, and wake them when someone joins."""
+
+    def __init__(self, manager: AsyncServerManager, interval: float = 30):
+        self.manager = manager
+        self.interval = interval
+        self.players: Dict[str, Set[str]] = {}
+        self.empty_since: Dict[str, float] = {}
+        self.followers: Dict[str, asyncio.Task] = {}
+        self.listeners: Dict[str, WakeListener] = {}
+        self._waking: Set[asyncio.Task] = set()
+
+    async def _follow_players(self, server: AsyncMinecraftServer) -> None:
+        """Keep track of who is online from join and leave lines in the log."""
+        players = self.players.setdefault(server.name, set())
+        offset = await server.log_size()
+        try:
+            line = await server.query("list", "players online")
+            match = LIST_PLAYERS_EXPRESSION.search(line)
+            players.clear()
+            if match and match.group(1).strip():
+                players.update(name.strip() for name in match.group(1).split(","))
+        except TimeoutError:
+            logger.warning(f"Unable to list players on {server.name}")
+
+        async for line in server.follow_log(offset=offset):
+            if match := JOIN_EXPRESSION.search(line):
+                players.add(match.group(1))
+            elif match := LEAVE_EXPRESSION.search(line):
+                players.discard(match.group(1))
+            elif "Done (" in line:
+                players.clear()
+
+    def _stop_following(self, name: str) -> None:
+        task = self.followers.pop(name, None)
+        if task:
+            task.cancel()
+        self.players.pop(name, None)
+
+    async def release(self, name: str) -> None:
+        """Close the wake listener of a server, if it has one."""
+        listener = self.listeners.pop(name, None)
+        if listener:
+            await listener.close()
+
+    async def suspend(self, name: str) -> None:
+        """Stop an idle server and hold its port with a wake listener."""
+        server = self.manager.get_server(name)
+        logger.info(f"Suspending idle server {name}")
+        self._stop_following(name)
+        self.empty_since.pop(name, None)
+        await server.stop()
+        await asyncio.to_thread(server.server.update_settings, suspended=True)
+        await self._listen(name)
+
+    async def _listen(self, name: str) -> None:
+        server = self.manager.get_server(name)
+        port = await server.port_number()
+        version = await asyncio.to_thread(lambda: server.server._installed_version)
+        listener = WakeListener(port, version, on_login=lambda: self._wake_soon(name))
+        try:
+            await listener.start()
+        except OSError as e:
+            logger.warning(f"Unable to hold port {port} for {name}: {e}")
+            return
+        self.listeners[name] = listener
+
+    def _wake_soon(self, name: str) -> None:
+        task = asyncio.create_task(self.wake(name))
+        self._waking.add(task)
+        task.add_done_callback(self._waking.discard)
+
+    async def wake(self, name: str) -> None:
+        """Start a suspended server."""
+        if name not in self.listeners:
+            return
+        logger.info(f"Waking server {name}")
+        await self.release(name)
+        # Give whoever woke the server time to join before it counts as idle again
+        self.empty_since[name] = time.time()
+        await self.manager.get_server(name).start()
+
+    async def check(self, name: str) -> None:
+        """Suspend a server if it has been empty for too long, or keep its port held while suspended."""
+        server = self.manager.get_server(name)
+        idle_minutes, suspended = await asyncio.to_thread(lambda: (server.server.idle_minutes, server.server.suspended))
+        status = await server.status()
+
+        if status == ServerStatus.RUNNING:
+            await self.release(name)
+            if not idle_minutes:
+                self._stop_following(name)
+                self.empty_since.pop(name, None)
+                return
+            if name not in self.followers or self.followers[name].done():
+                self.followers[name] = asyncio.create_task(self._follow_players(server))
+            if self.players.get(name):
+                self.empty_since.pop(name, None)
+                return
+            since = self.empty_since.setdefault(name, time.time())
+            if time.time() - since >= idle_minutes * 60:
+                await self.suspend(name)
+            return
+
+        self._stop_following(name)
+        if suspended and name not in self.listeners:
+            await self._listen(name)
+        elif not suspended:
+            # Started (or released) outside the daemon
+            await self.release(name)
+
+    async def watch_listeners(self, interval: float = 1) -> None:
+        """Close wake listeners as soon as their server is started from outside the daemon."""
+        while True:
+            for name in list(self.listeners):
+                server = self.manager.get_server(name).server
+                if not await asyncio.to_thread(lambda: server.suspended):
+                    await self.release(name)
+            await asyncio.sleep(interval)
+
+    async def run(self) -> None:
+        asyncio.create_task(self.watch_listeners())
+        while True:
+            names = await self.manager.servers()
+            for name in names:
+                try:
+                    await self.check(name)
+                except Exception:
+                    logger.exception(f"Idle check failed for server {name}")
+            for name in set(self.listeners) - set(names):
+                await self.release(name)
+            await asyncio.sleep(self.interval)
+
@@ -0,0 +1,141 @@
+"""Module for timing the manager's own operations.
+
+Timings are kept in process. Each operation gets a count, total and a latency
+histogram, and the operations run during each page render are recorded so the
+slowest parts of a render can be found on the Diagnostics page.
+"""
+from typing import Callable, Dict, List, Optional, Tuple
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+import functools
+import math
+import threading
+import time
+
+# Upper bounds of the latency histogram buckets in milliseconds.
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, math.inf)
+
+
+@dataclass
+class OperationStats:
+    """Timing statistics for an operation."""
+    name: str
+    count: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    buckets: List[int] = field(default_factory=lambda: [0] * len(BUCKETS_MS))
+
+    def record(self, elapsed_ms: float) -> None:
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        for index, bound in enumerate(BUCKETS_MS):
+            if elapsed_ms <= bound:
+                self.buckets[index] += 1
+                break
+
+    @property
+    def mean_ms(self) -> float:
+        return self.total_ms / self.count if self.count else 0.0
+
+    def percentile_ms(self, percentile: float) -> float:
+        """Approximate percentile, as the upper bound of the bucket it falls in."""
+        target = self.count * percentile / 100
+        seen = 0
+        for bound, count in zip(BUCKETS_MS, self.buckets):
+            seen += count
+            if count and seen >= target:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+
+@dataclass
+class Render:
+    """Operations timed during one run of a page script."""
+    page: str
+    started: float
+    spans: List[Tuple[str, float, int]] = field(default_factory=list)  # name, elapsed ms, nesting depth
+
+    @property
+    def total_ms(self) -> float:
+        """Time spent in timed operations during the render, not counting nested operations twice."""
+        return sum(elapsed_ms for _, elapsed_ms, depth in self.spans if depth == 0)
+
+    def slowest(self, count: int = 5) -> List[Tuple[str, float]]:
+        spans = sorted(self.spans, key=lambda s: s[1], reverse=True)[:count]
+        return [(name, elapsed_ms) for name, elapsed_ms, _ in spans]
+
+
+_lock = threading.Lock()
+_operations: Dict[str, OperationStats] = {}
+_renders: deque = deque(maxlen=50)
+_local = threading.local()
+
+
+def record(name: str, elapsed_ms: float, depth: int = 0) -> None:
+    """Record a timing for an operation."""
+    with _lock:
+        stats = _operations.get(name)
+        if stats is None:
+            stats = _operations[name] = OperationStats(name=name)
+        stats.record(elapsed_ms)
+    render = getattr(_local, "render", None)
+    if render is not None:
+        render.spans.append((name, elapsed_ms, depth))
+
+
+@contextmanager
+def span(name: str):
+    """Time the enclosed block as an operation."""
+    depth = getattr(_local, "depth", 0)
+    _local.depth = depth + 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _local.depth = depth
+        record(name, (time.perf_counter() - started) * 1000, depth)
+
+
+def timed(name: Optional[str] = None) -> Callable:
+    """Decorator that times each call of a function as an operation.
+
+    When used on a property, apply it below ``@property``.
+    """
+    def decorator(func: Callable) -> Callable:
+        operation = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(operation):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def start_render(page: str) -> None:
+    """Start recording the operations of a page render on the current thread."""
+    render = Render(page=page, started=time.time())
+    _local.render = render
+    with _lock:
+        _renders.append(render)
+
+
+def operations() -> List[OperationStats]:
+    """Statistics for all operations, slowest total first."""
+    with _lock:
+        return sorted(_operations.values(), key=lambda s: s.total_ms, reverse=True)
+
+
+def renders() -> List[Render]:
+    """Recent page renders, newest first."""
+    with _lock:
+        return list(reversed(_renders))
+
+
+def reset() -> None:
+    """Clear all recorded timings."""
+    with _lock:
+        _operations.clear()
+        _renders.clear()
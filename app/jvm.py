@@ -0,0 +1,107 @@
+"""Module for sizing the JVM of each Minecraft server."""
+from typing import Dict, List
+from dataclasses import dataclass
+import os
+
+# G1 settings recommended by Aikar for Minecraft servers:
+# https://docs.papermc.io/paper/aikars-flags
+AIKAR_FLAGS = [
+    "-XX:+UseG1GC",
+    "-XX:+ParallelRefProcEnabled",
+    "-XX:MaxGCPauseMillis=200",
+    "-XX:+UnlockExperimentalVMOptions",
+    "-XX:+DisableExplicitGC",
+    "-XX:+AlwaysPreTouch",
+    "-XX:G1MixedGCCountTarget=4",
+    "-XX:G1MixedGCLiveThresholdPercent=90",
+    "-XX:G1RSetUpdatingPauseTimePercent=5",
+    "-XX:SurvivorRatio=32",
+    "-XX:+PerfDisableSharedMem",
+    "-XX:MaxTenuringThreshold=1",
+]
+
+# Young generation settings for heaps below LARGE_HEAP_MB.
+SMALL_HEAP_FLAGS = [
+    "-XX:G1NewSizePercent=30",
+    "-XX:G1MaxNewSizePercent=40",
+    "-XX:G1HeapRegionSize=8M",
+    "-XX:G1ReservePercent=20",
+    "-XX:G1HeapWastePercent=5",
+    "-XX:InitiatingHeapOccupancyPercent=15",
+]
+
+# Young generation settings for heaps of LARGE_HEAP_MB and above.
+LARGE_HEAP_FLAGS = [
+    "-XX:G1NewSizePercent=40",
+    "-XX:G1MaxNewSizePercent=50",
+    "-XX:G1HeapRegionSize=16M",
+    "-XX:G1ReservePercent=15",
+    "-XX:G1HeapWastePercent=5",
+    "-XX:InitiatingHeapOccupancyPercent=20",
+]
+
+LARGE_HEAP_MB = 12 * 1024
+
+MIN_HEAP_MB = 1024
+MAX_HEAP_MB = 16 * 1024
+
+# Heap sizes are rounded down to a multiple of this.
+HEAP_STEP_MB = 256
+
+# Memory used by the JVM outside the heap (metaspace, thread stacks, buffers),
+# as a fraction of the heap.
+NON_HEAP_OVERHEAD = 0.2
+
+
+@dataclass
+class JvmProfile:
+    """Heap size and JVM flags for a server."""
+    heap_mb: int
+
+    @property
+    def heap_size(self) -> str:
+        """Heap size in the form used by -Xms/-Xmx."""
+        return f"{self.heap_mb}M"
+
+    @property
+    def flags(self) -> List[str]:
+        """JVM flags, excluding the heap size."""
+        return AIKAR_FLAGS + (LARGE_HEAP_FLAGS if self.heap_mb >= LARGE_HEAP_MB else SMALL_HEAP_FLAGS)
+
+
+def host_memory_mb() -> int:
+    """Physical memory of the host in Mb."""
+    return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // 1024 // 1024
+
+
+def default_reserved_mb(host_mb: int) -> int:
+    """Memory to leave for the operating system and the manager."""
+    return max(2048, host_mb // 8)
+
+
+def plan_profiles(
+    weights: Dict[str, float],
+    concurrent: int,
+    host_mb: int,
+    reserved_mb: int,
+    min_heap_mb: int = MIN_HEAP_MB,
+    max_heap_mb: int = MAX_HEAP_MB,
+) -> Dict[str, JvmProfile]:
+    """Share host memory between servers in proportion to their weights.
+
+    Memory is shared as if the ``concurrent`` heaviest servers were all running
+    at once, so any combination of that many servers fits in memory. Heaps are
+    clamped to between ``min_heap_mb`` and ``max_heap_mb``.
+    """
+    if not weights:
+        return {}
+
+    concurrent = min(max(concurrent, 1), len(weights))
+    busiest_weight = sum(sorted(weights.values(), reverse=True)[:concurrent]) or 1.0
+    available_mb = max(host_mb - reserved_mb, 0) / (1 + NON_HEAP_OVERHEAD)
+
+    def heap_for(weight: float) -> int:
+        heap_mb = int(available_mb * weight / busiest_weight) // HEAP_STEP_MB * HEAP_STEP_MB
+        return min(max(heap_mb, min_heap_mb), max_heap_mb)
+
+    return {name: JvmProfile(heap_mb=heap_for(weight)) for name, weight in weights.items()}
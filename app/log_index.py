@@ -0,0 +1,250 @@
+"""Module for searching server logs through an inverted index.
+
+Every word of every log line, and the player each line is about, is stored in
+an SQLite database as a posting: the term, the log file and the byte offset of
+the line. A search looks up the postings for its terms and reads only the
+matching lines, seeking straight to their offsets.
+
+The index is updated incrementally: rotated ``.log.gz`` files are indexed once,
+and only the new part of ``latest.log`` is read on each update. A file whose
+inode or first bytes have changed since it was indexed (such as a new latest.log
+after rotation) is indexed again from the start.
+"""
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from contextlib import closing
+from pathlib import Path
+import gzip
+import re
+import sqlite3
+
+import streamlit as st
+
+from instrumentation import timed
+
+logger = st.logger.get_logger(__name__)
+
+TOKEN_EXPRESSION = re.compile(r"[a-z0-9_]{2,}")
+
+# Messages that name a player: chat, joins and leaves. Deaths and advancements
+# start with the player name, and are matched against players seen joining.
+CHAT_EXPRESSION = re.compile(r"^<([^>]+)> ")
+JOIN_LEAVE_EXPRESSION = re.compile(r"^(\S+) (?:joined|left) the game$")
+
+PLAYER_PREFIX = "player:"
+
+# Bytes from the start of a plain log file kept to recognise it when it's replaced.
+HEAD_SIZE = 256
+
+# Indexes built with another schema version are dropped and built again.
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL,
+    sort_key TEXT NOT NULL,
+    inode INTEGER NOT NULL,
+    head BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    indexed_bytes INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS terms (
+    id INTEGER PRIMARY KEY,
+    term TEXT UNIQUE NOT NULL
+);
+CREATE TABLE IF NOT EXISTS postings (
+    term_id INTEGER NOT NULL,
+    file_id INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    PRIMARY KEY (term_id, file_id, offset)
+) WITHOUT ROWID;
+"""
+
+
+def tokenize(text: str) -> Set[str]:
+    """Lower case words of at least two characters."""
+    return set(TOKEN_EXPRESSION.findall(text.lower()))
+
+
+class LogIndex:
+    """Inverted index over the log files of a MinecraftLogReader."""
+
+    def __init__(self, reader, index_file: Path):
+        self.reader = reader
+        self.index_file = Path(index_file)
+        self._term_ids: Dict[str, int] = {}
+        self._players: Optional[Set[str]] = None
+
+    def connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.index_file, timeout=30)
+        if connection.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            connection.executescript(
+                "DROP TABLE IF EXISTS postings; DROP TABLE IF EXISTS terms; DROP TABLE IF EXISTS files;"
+                f"PRAGMA user_version = {SCHEMA_VERSION};"
+            )
+            self._term_ids, self._players = {}, None
+        connection.executescript(SCHEMA)
+        return connection
+
+    def _term_id(self, connection: sqlite3.Connection, term: str) -> int:
+        term_id = self._term_ids.get(term)
+        if term_id is None:
+            row = connection.execute("SELECT id FROM terms WHERE term = ?", (term,)).fetchone()
+            if row is None:
+                term_id = connection.execute("INSERT INTO terms (term) VALUES (?)", (term,)).lastrowid
+            else:
+                term_id = row[0]
+            self._term_ids[term] = term_id
+        return term_id
+
+    def _load_players(self, connection: sqlite3.Connection) -> Set[str]:
+        if self._players is None:
+            rows = connection.execute("SELECT term FROM terms WHERE term LIKE ?", (PLAYER_PREFIX + "%",))
+            self._players = {row[0][len(PLAYER_PREFIX):] for row in rows}
+        return self._players
+
+    def line_terms(self, message: str) -> Set[str]:
+        """Terms to index a log message under."""
+        terms = tokenize(message)
+        match = CHAT_EXPRESSION.match(message) or JOIN_LEAVE_EXPRESSION.match(message)
+        if match:
+            player = match.group(1).lower()
+            self._players.add(player)
+            terms.add(PLAYER_PREFIX + player)
+        else:
+            first = message.split(" ", 1)[0].lower()
+            if first in self._players:
+                terms.add(PLAYER_PREFIX + first)
+        return terms
+
+    @staticmethod
+    def _open(log_file: Path):
+        return gzip.open(log_file, "rb") if log_file.suffix == ".gz" else open(log_file, "rb")
+
+    def _head(self, log_file: Path) -> bytes:
+        with self._open(log_file) as f:
+            return f.read(HEAD_SIZE)
+
+    def _index_file(self, connection: sqlite3.Connection, log_file: Path, file_id: int, offset: int) -> int:
+        """Add postings for complete lines after offset, returning the offset after them."""
+        postings = []
+        with self._open(log_file) as f:
+            f.seek(offset)
+            for line in iter(f.readline, b""):
+                if not line.endswith(b"\n"):
+                    # Partially written line, index it on the next update
+                    break
+                match = self.reader.expression.match(line.decode(errors="replace").strip())
+                if match:
+                    for term in self.line_terms(match.group(4)):
+                        postings.append((self._term_id(connection, term), file_id, offset))
+                offset += len(line)
+        connection.executemany("INSERT OR IGNORE INTO postings (term_id, file_id, offset) VALUES (?, ?, ?)", postings)
+        return offset
+
+    @timed("log index update")
+    def update(self) -> None:
+        """Index new log files and new lines in latest.log, and drop deleted files."""
+        with closing(self.connect()) as connection, connection:
+            # Take the write lock before reading the files table, so updates from
+            # other threads and processes wait instead of indexing the same files
+            connection.execute("BEGIN IMMEDIATE")
+            self._load_players(connection)
+            known = {
+                name: (file_id, inode, head, size, indexed_bytes)
+                for file_id, name, inode, head, size, indexed_bytes in connection.execute(
+                    "SELECT id, name, inode, head, size, indexed_bytes FROM files"
+                )
+            }
+            log_files = {log_file.name: log_file for log_file in self.reader._find_log_files()}
+
+            for name in set(known) - set(log_files):
+                self._remove_file(connection, known[name][0])
+
+            for name, log_file in log_files.items():
+                stat = log_file.stat()
+                size = stat.st_size
+                # Rotated logs don't change once written, so only plain files need their start compared
+                head = self._head(log_file) if log_file.suffix != ".gz" else b""
+                if name in known:
+                    file_id, inode, known_head, known_size, indexed_bytes = known[name]
+                    if log_file.suffix == ".gz":
+                        same_file = stat.st_ino == inode and size == known_size
+                    else:
+                        # indexed_bytes counts uncompressed bytes, so it's only compared for plain files
+                        same_file = stat.st_ino == inode and head[:len(known_head)] == known_head and size >= indexed_bytes
+                    if same_file:
+                        if size != known_size:
+                            offset = self._index_file(connection, log_file, file_id, indexed_bytes)
+                            connection.execute(
+                                "UPDATE files SET head = ?, size = ?, indexed_bytes = ? WHERE id = ?",
+                                (head, size, offset, file_id),
+                            )
+                        continue
+                    # Replaced or rotated, index it again from the start
+                    self._remove_file(connection, file_id)
+
+                logger.info(f"Indexing log file {log_file}")
+                file_id = connection.execute(
+                    "INSERT INTO files (name, sort_key, inode, head, size, indexed_bytes) VALUES (?, ?, ?, ?, ?, 0)",
+                    (name, self.reader.sort_key(log_file), stat.st_ino, head, size),
+                ).lastrowid
+                offset = self._index_file(connection, log_file, file_id, 0)
+                connection.execute("UPDATE files SET indexed_bytes = ? WHERE id = ?", (offset, file_id))
+
+    @staticmethod
+    def _remove_file(connection: sqlite3.Connection, file_id: int) -> None:
+        connection.execute("DELETE FROM postings WHERE file_id = ?", (file_id,))
+        connection.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+    @property
+    def players(self) -> List[str]:
+        """Players seen in the logs."""
+        with closing(self.connect()) as connection:
+            return sorted(self._load_players(connection))
+
+    def _postings(self, terms: List[str], limit: int) -> List[Tuple[str, int]]:
+        """File name and offset of the newest lines having all terms."""
+        with closing(self.connect()) as connection:
+            term_ids = []
+            for term in terms:
+                row = connection.execute("SELECT id FROM terms WHERE term = ?", (term,)).fetchone()
+                if row is None:
+                    return []
+                term_ids.append(row[0])
+            matches = " INTERSECT ".join(["SELECT file_id, offset FROM postings WHERE term_id = ?"] * len(term_ids))
+            return connection.execute(
+                f"SELECT f.name, m.offset FROM ({matches}) m JOIN files f ON f.id = m.file_id "
+                f"ORDER BY f.sort_key DESC, m.offset DESC LIMIT ?",
+                (*term_ids, limit),
+            ).fetchall()
+
+    def _read_lines(self, postings: List[Tuple[str, int]]) -> Iterator[dict]:
+        """Log lines at the given offsets, parsed like MinecraftLogReader lines."""
+        by_file: Dict[str, List[int]] = {}
+        for name, offset in postings:
+            by_file.setdefault(name, []).append(offset)
+        for name, offsets in by_file.items():
+            log_file = self.reader.log_path / name
+            file_date = self.reader.get_file_date(log_file)
+            with self._open(log_file) as f:
+                # Seek forwards only, so gzip files are decompressed at most once
+                for offset in sorted(offsets):
+                    f.seek(offset)
+                    line = f.readline().decode(errors="replace")
+                    formatted = self.reader.format_log_line(line, log_file, file_date)
+                    if formatted:
+                        formatted["offset"] = offset
+                        yield formatted
+
+    @timed("log search")
+    def search(self, text: str = "", player: Optional[str] = None, limit: int = 100) -> List[dict]:
+        """Newest log lines containing every word in text, optionally about a player."""
+        self.update()
+        terms = sorted(tokenize(text))
+        if player:
+            terms.append(PLAYER_PREFIX + player.lower())
+        if not terms:
+            return []
+        lines = list(self._read_lines(self._postings(terms, limit)))
+        return sorted(lines, key=lambda line: (line["timestamp"], line["offset"]), reverse=True)
@@ -1,12 +1,22 @@
-from typing import List, Optional
+"""Module for reading Minecraft server logs.
+
+pandas is imported when first used, so creating a reader is cheap.
+"""
+from typing import TYPE_CHECKING, List, Optional
 from pathlib import Path
 import gzip
 from datetime import datetime
 import re
 
-import pandas as pd
 import streamlit as st
 
+from instrumentation import timed
+from log_index import LogIndex
+from log_window import LogWindow, get_window
+
+if TYPE_CHECKING:
+    import pandas as pd
+
 
 logger = st.logger.get_logger(__name__)
 
@@ -14,9 +24,26 @@ logger = st.logger.get_logger(__name__)
 class MinecraftLogReader:
     """Class for reading minecraft logs."""
 
+    expression = re.compile(r"\[([^]]*)\] \[(.*)/(.*)\]: (.*)")
+
     def __init__(self, log_path: str):
         self.log_path = Path(log_path).expanduser()
-        self.expression = re.compile(r"\[([^]]*)\] \[(.*)/(.*)\]: (.*)")
+
+    @property
+    def index(self) -> LogIndex:
+        """Full-text index of the log files, stored next to the logs directory."""
+        return LogIndex(self, self.log_path.parent / "log_index.sqlite")
+
+    @property
+    def players(self) -> List[str]:
+        """Players seen in the logs."""
+        index = self.index
+        index.update()
+        return index.players
+
+    def search(self, text: str = "", player: Optional[str] = None, limit: int = 100) -> List[dict]:
+        """Newest log lines containing every word in text, optionally about a player."""
+        return self.index.search(text, player=player, limit=limit)
 
     def _find_log_files(self) -> List[Path]:
         """Find all .log and .log.gz files."""
@@ -25,6 +52,22 @@ class MinecraftLogReader:
             yield from self.log_path.glob("*.log")
         return list(generator())
     
+    @property
+    def log_files(self) -> List[Path]:
+        """Log files, newest (latest.log) first."""
+        return sorted(self._find_log_files(), key=self.sort_key, reverse=True)
+
+    def sort_key(self, log_file: Path) -> str:
+        """Key ordering log files oldest first: by date, then by number within the day."""
+        if log_file.name == "latest.log":
+            return "9999-99-99-9999"
+        number = log_file.name.split(".")[0].split("-")[-1]
+        return f"{self.get_file_date(log_file)}-{int(number) if number.isdigit() else 0:04d}"
+
+    def window(self, name: str = "latest.log") -> LogWindow:
+        """Paged view of a log file."""
+        return get_window(self.log_path / name)
+
     def get_file_date(self, log_file: Path) -> str:
         """Get the date from a log file."""
         if log_file.name == "latest.log":
@@ -73,12 +116,15 @@ class MinecraftLogReader:
             else:
                 yield from self._read_log_file(log_file)
 
-    def to_pandas(self) -> pd.DataFrame:
+    @timed("log to_pandas")
+    def to_pandas(self) -> "pd.DataFrame":
         """Convert log files to pandas DataFrame."""
+        import pandas as pd
         return pd.DataFrame(self.read_log_files()).sort_values("timestamp")
 
     @property
-    def events_by_hour(self) -> pd.DataFrame:
+    @timed("log events_by_hour")
+    def events_by_hour(self) -> "pd.DataFrame":
         """Get events by hour over time."""
         df = self.to_pandas()
         # Create a column for the timestamp rounded to the hour
@@ -87,18 +133,22 @@ class MinecraftLogReader:
         # Group by the hour column and count the number of events
         return df.groupby("hour").count()["timestamp"].reset_index()
 
-    def get_events_by_time(self, interval: str = "1min") -> pd.DataFrame:
+    @timed("log get_events_by_time")
+    def get_events_by_time(self, interval: str = "1min") -> "pd.DataFrame":
         """Get events by minute over time."""
         df = self.to_pandas()
         df["event time"] = df["timestamp"].dt.round(interval)
         return df.groupby("event time").count()["timestamp"].reset_index().rename(columns={"timestamp": "event count"})
 
     @property
-    def player_sessions(self) -> pd.DataFrame:
+    @timed("log player_sessions")
+    def player_sessions(self) -> "pd.DataFrame":
         """Return a DataFrame with player sessions, including joined and left times.
         
         This might help: https://stackoverflow.com/questions/51253867/group-pandas-events-by-start-and-end-events
         """
+        import pandas as pd
+
         df = self.to_pandas()
         # Get only the lines that contain "joined the game" or "left the game"
         df = df[df["log_message"].str.contains("joined the game|left the game")]
@@ -130,6 +180,8 @@ class MinecraftLogReader:
 
 
 if __name__ == "__main__":
+    import pandas as pd
+
     reader = MinecraftLogReader("~/git/minecraft-server-manager/servers/test1/logs")
     #print(reader._find_log_files())
     #for line in reader.read_log_files():
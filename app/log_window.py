@@ -0,0 +1,202 @@
+"""Module for viewing a window of lines from a log file.
+
+A line-offset index (the byte offset of the start of every line) is built once
+per log file and extended as the file grows, so any page of lines can be read by
+seeking straight to it. Reading a page costs the same however big the log is.
+
+The timestamp of one line in every ``SAMPLE_LINES`` is kept while the offsets
+are built, so jumping to a time searches the samples in memory and then reads
+forwards from a single seek. Seeking backwards in a gzipped log would
+decompress it again from the start. Log lines only carry the time of day, so
+samples count the seconds since midnight of the day the log starts, adding a
+day each time the time goes backwards.
+"""
+from typing import List, Optional, Tuple
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from pathlib import Path
+import gzip
+import os
+import re
+import threading
+
+import streamlit as st
+
+from instrumentation import timed
+
+logger = st.logger.get_logger(__name__)
+
+TIMESTAMP_EXPRESSION = re.compile(rb"^\[(\d\d):(\d\d):(\d\d)\]")
+
+DAY_SECONDS = 24 * 60 * 60
+
+# Lines per timestamp sample.
+SAMPLE_LINES = 256
+
+# Log files whose line offsets are kept in memory, least recently used first out.
+MAX_WINDOWS = 16
+
+
+def _seconds(match: re.Match) -> int:
+    """Seconds since midnight of a timestamp match."""
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+
+
+def _next_time(previous: Optional[int], seconds: int) -> int:
+    """Time of day in seconds, counted from midnight of the day the log starts, for a line following previous."""
+    if previous is None:
+        return seconds
+    day = previous // DAY_SECONDS
+    if seconds < previous % DAY_SECONDS:
+        # Past midnight
+        day += 1
+    return day * DAY_SECONDS + seconds
+
+
+class LogWindow:
+    """Paged access to the lines of a log file (plain or gzipped)."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.offsets = array("Q")
+        self.end = 0
+        self.inode: Optional[int] = None
+        # Line number and time (see _next_time) of the first timestamped line in each block of SAMPLE_LINES lines
+        self.sample_lines = array("Q")
+        self.sample_times = array("Q")
+        self._lock = threading.Lock()
+
+    def _open(self):
+        return gzip.open(self.path, "rb") if self.path.suffix == ".gz" else open(self.path, "rb")
+
+    def _reset(self, inode: Optional[int]) -> None:
+        self.offsets, self.end, self.inode = array("Q"), 0, inode
+        self.sample_lines, self.sample_times = array("Q"), array("Q")
+
+    @timed("log window refresh")
+    def refresh(self) -> None:
+        """Index lines written since the last refresh, starting again if the file was replaced or truncated."""
+        with self._lock:
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                self._reset(None)
+                return
+            if stat.st_ino != self.inode or (self.path.suffix != ".gz" and stat.st_size < self.end):
+                self._reset(stat.st_ino)
+            elif self.path.suffix == ".gz" and self.end:
+                # Rotated logs don't change once written
+                return
+
+            offset = self.end
+            sampled_block = self.sample_lines[-1] // SAMPLE_LINES if self.sample_lines else -1
+            with self._open() as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        # Partially written line, index it on the next refresh
+                        break
+                    number = len(self.offsets)
+                    if number // SAMPLE_LINES != sampled_block:
+                        match = TIMESTAMP_EXPRESSION.match(line)
+                        if match:
+                            previous = self.sample_times[-1] if self.sample_times else None
+                            self.sample_lines.append(number)
+                            self.sample_times.append(_next_time(previous, _seconds(match)))
+                            sampled_block = number // SAMPLE_LINES
+                    self.offsets.append(offset)
+                    offset += len(line)
+            self.end = offset
+
+    @property
+    def line_count(self) -> int:
+        return len(self.offsets)
+
+    def page_count(self, page_size: int) -> int:
+        return max(1, -(-self.line_count // page_size))
+
+    def lines(self, start: int, count: int) -> List[Tuple[int, str]]:
+        """Up to count lines from line number start (0 based), with their line numbers."""
+        with self._lock:
+            return self._lines(start, count)
+
+    def _lines(self, start: int, count: int) -> List[Tuple[int, str]]:
+        start = max(0, min(start, self.line_count))
+        stop = min(start + count, self.line_count)
+        if start >= stop:
+            return []
+        with self._open() as f:
+            f.seek(self.offsets[start])
+            data = f.read((self.offsets[stop] if stop < self.line_count else self.end) - self.offsets[start])
+        text = data.decode(errors="replace").splitlines()
+        return list(zip(range(start, stop), text))
+
+    def page(self, number: int, page_size: int = 100) -> List[Tuple[int, str]]:
+        """Lines on a page, numbered from 0. Negative numbers count back from the last page."""
+        with self._lock:
+            if number < 0:
+                number += self.page_count(page_size)
+            return self._lines(number * page_size, page_size)
+
+    def line_at_offset(self, offset: int) -> int:
+        """Number of the line containing a byte offset."""
+        with self._lock:
+            return max(0, bisect_right(self.offsets, offset) - 1)
+
+    def around(self, line: int, count: int = 100) -> List[Tuple[int, str]]:
+        """count lines centred on a line number."""
+        return self.lines(max(0, line - count // 2), count)
+
+    def line_at_time(self, time: str) -> int:
+        """First line logged at or after a time of day (HH:MM:SS).
+
+        For logs running past midnight, this is the first time the log reaches
+        that time of day: times before the first line's are taken to be on the
+        next day. The timestamp samples are binary searched, then lines are
+        read forwards from the last sample before the time. Lines without a
+        timestamp (such as stack traces) take the time of the next timestamped
+        line.
+        """
+        hours, minutes, seconds = (int(part) for part in time.split(":"))
+        with self._lock:
+            if not self.sample_times:
+                return 0
+            target = _next_time(self.sample_times[0], hours * 3600 + minutes * 60 + seconds)
+            sample = bisect_left(self.sample_times, target)
+            if sample == 0:
+                return 0
+            previous = self.sample_times[sample - 1]
+            first = self.sample_lines[sample - 1] + 1
+            stop = self.sample_lines[sample] if sample < len(self.sample_lines) else self.line_count
+            if first >= stop:
+                return first
+            with self._open() as f:
+                f.seek(self.offsets[first])
+                for number in range(first, stop):
+                    match = TIMESTAMP_EXPRESSION.match(f.readline())
+                    if match:
+                        previous = _next_time(previous, _seconds(match))
+                        if previous >= target:
+                            break
+                        first = number + 1
+            return first
+
+
+_windows: "OrderedDict[str, LogWindow]" = OrderedDict()
+_windows_lock = threading.Lock()
+
+
+def get_window(path: Path) -> LogWindow:
+    """Refreshed window for a log file. Line indexes are shared by all sessions."""
+    with _windows_lock:
+        key = str(Path(path).resolve())
+        if key not in _windows:
+            _windows[key] = LogWindow(Path(path))
+            if len(_windows) > MAX_WINDOWS:
+                _windows.popitem(last=False)
+        _windows.move_to_end(key)
+        window = _windows[key]
+    window.refresh()
+    return window
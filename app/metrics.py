@@ -0,0 +1,320 @@
+"""Module for collecting server performance metrics."""
+from typing import Dict, Iterable, List, Optional
+from dataclasses import dataclass
+from pathlib import Path
+import fcntl
+import math
+import os
+import re
+import struct
+import threading
+import time
+
+import sh
+import streamlit as st
+
+from enums import ServerStatus
+
+logger = st.logger.get_logger(__name__)
+
+
+@dataclass
+class MetricsSample:
+    """A single metrics sample. Missing values are NaN (or -1 for players)."""
+    timestamp: float
+    rss_mb: float = math.nan
+    cpu_percent: float = math.nan
+    mspt: float = math.nan
+    players: int = -1
+
+    @property
+    def tps(self) -> float:
+        """Ticks per second, derived from milliseconds per tick."""
+        return min(20.0, 1000.0 / self.mspt) if self.mspt > 0 else math.nan
+
+
+class MetricsRing:
+    """Fixed-size ring buffer of metric samples stored in a file.
+
+    Once the buffer is full the oldest samples are overwritten, so the file never
+    grows beyond ``capacity`` records.
+    """
+
+    MAGIC = b"MCMR"
+    HEADER = struct.Struct("<4sIQ")  # magic, capacity, samples written
+    RECORD = struct.Struct("<dfffi")  # timestamp, rss_mb, cpu_percent, mspt, players
+
+    def __init__(self, path: Path, capacity: int = 60480):
+        self.path = Path(path)
+        self.capacity = capacity
+        if self.path.exists():
+            self.capacity, _ = self._read_header()
+
+    def _read_header(self):
+        with open(self.path, "rb") as f:
+            magic, capacity, written = self.HEADER.unpack(f.read(self.HEADER.size))
+        if magic != self.MAGIC:
+            raise ValueError(f"Not a metrics file: {self.path}")
+        return capacity, written
+
+    @property
+    def written(self) -> int:
+        """Number of samples written since the file was created."""
+        if not self.path.exists():
+            return 0
+        return self._read_header()[1]
+
+    def append(self, sample: MetricsSample) -> None:
+        """Write a sample, overwriting the oldest once the buffer is full."""
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        with open(fd, "r+b") as f:
+            # Writers in other threads or processes wait for the whole update
+            fcntl.flock(f, fcntl.LOCK_EX)
+            header = f.read(self.HEADER.size)
+            if not header:
+                header = self.HEADER.pack(self.MAGIC, self.capacity, 0)
+            _, capacity, written = self.HEADER.unpack(header)
+            f.seek(self.HEADER.size + (written % capacity) * self.RECORD.size)
+            f.write(self.RECORD.pack(sample.timestamp, sample.rss_mb, sample.cpu_percent, sample.mspt, sample.players))
+            f.seek(0)
+            f.write(self.HEADER.pack(self.MAGIC, capacity, written + 1))
+
+    def read_bytes(self, since: Optional[float] = None) -> bytes:
+        """Raw records in chronological order, optionally only those after since."""
+        if not self.path.exists():
+            return b""
+        with open(self.path, "rb") as f:
+            fcntl.flock(f, fcntl.LOCK_SH)
+            header = f.read(self.HEADER.size)
+            if not header:
+                return b""
+            _, capacity, written = self.HEADER.unpack(header)
+            data = f.read(min(written, capacity) * self.RECORD.size)
+        if written > capacity:
+            split = (written % capacity) * self.RECORD.size
+            data = data[split:] + data[:split]
+        if since is not None:
+            # Binary search the timestamps, the first field of each record
+            low, high = 0, len(data) // self.RECORD.size
+            while low < high:
+                middle = (low + high) // 2
+                if struct.unpack_from("<d", data, middle * self.RECORD.size)[0] < since:
+                    low = middle + 1
+                else:
+                    high = middle
+            data = data[low * self.RECORD.size:]
+        return data
+
+    def read(self, since: Optional[float] = None) -> List[MetricsSample]:
+        """Samples in chronological order, optionally only those after since."""
+        return [MetricsSample(*record) for record in self.RECORD.iter_unpack(self.read_bytes(since))]
+
+    def to_pandas(self, since: Optional[float] = None):
+        """Samples as a pandas DataFrame indexed by time."""
+        return self.frame(self.read_bytes(since))
+
+    @classmethod
+    def frame(cls, data: bytes):
+        """Raw records as a pandas DataFrame indexed by time."""
+        import numpy as np
+        import pandas as pd
+
+        dtype = np.dtype([
+            ("timestamp", "<f8"),
+            ("rss_mb", "<f4"),
+            ("cpu_percent", "<f4"),
+            ("mspt", "<f4"),
+            ("players", "<i4"),
+        ])
+        df = pd.DataFrame(np.frombuffer(data, dtype=dtype))
+        df["tps"] = (1000.0 / df["mspt"]).clip(upper=20.0)
+        df["players"] = df["players"].where(df["players"] >= 0)
+        df["time"] = pd.to_datetime(df["timestamp"], unit="s")
+        return df.set_index("time").drop(columns="timestamp")
+
+
+class MetricsCollector:
+    """Periodically sample a running server's JVM process and game metrics.
+
+    Process memory and CPU are read from /proc (or ``ps`` where /proc is not
+    available) every ``interval`` seconds. Tick times and player counts are
+    requested from the server with the ``tick query`` and ``list`` commands every
+    ``command_interval`` seconds, as they write to the server log.
+
+    Only one collector samples a server at a time, across processes: a collector
+    takes an exclusive lock on the server's ``metrics.lock`` file and waits while
+    another collector holds it, taking over if that collector goes away.
+    """
+
+    LIST_EXPRESSION = re.compile(r"There are (\d+) of a max of \d+ players online")
+    TICK_EXPRESSION = re.compile(r"Average time per tick: ([\d.]+)ms")
+    # Reply from servers without the command, such as tick on servers before 1.20.3
+    UNKNOWN_COMMAND = "Unknown or incomplete command"
+
+    def __init__(self, server, interval: float = 10, command_interval: float = 60):
+        self.server = server
+        self.interval = interval
+        self.command_interval = command_interval
+        self.ring = MetricsRing(server.metrics_file)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_cpu = None
+        self._last_command_sample = 0.0
+        self._last_mspt = math.nan
+        self._last_players = -1
+        self._tick_query_supported = True
+        self._lock_file = None
+
+    @property
+    def pid(self) -> Optional[int]:
+        """Process id of the server JVM."""
+        try:
+            return int(Path(self.server.pid_file).read_text().strip())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _proc_usage(self, pid: int):
+        """RSS in Mb and cumulative CPU seconds from /proc."""
+        with open(f"/proc/{pid}/status", "r") as f:
+            rss_kb = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+        with open(f"/proc/{pid}/stat", "r") as f:
+            # Fields after the command name, which may itself contain spaces
+            fields = f.read().rsplit(")", 1)[1].split()
+        cpu_seconds = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+        return rss_kb / 1024, cpu_seconds
+
+    def sample_process(self, pid: int):
+        """RSS in Mb and CPU usage percent of a process."""
+        if not Path("/proc").exists():
+            rss_kb, cpu_percent = sh.ps("-o", "rss=,%cpu=", "-p", str(pid)).split()
+            return int(rss_kb) / 1024, float(cpu_percent)
+
+        rss_mb, cpu_seconds = self._proc_usage(pid)
+        now = time.monotonic()
+        cpu_percent = math.nan
+        if self._last_cpu and self._last_cpu[0] == pid:
+            _, last_time, last_cpu_seconds = self._last_cpu
+            cpu_percent = (cpu_seconds - last_cpu_seconds) / (now - last_time) * 100
+        self._last_cpu = (pid, now, cpu_seconds)
+        return rss_mb, cpu_percent
+
+    def _query(self, command: str, text: str, expression: re.Pattern) -> Optional[str]:
+        """Run a server command and return the first group matched in its output."""
+        line = self.server.query(command, text, timeout=5)
+        match = expression.search(line)
+        return match.group(1) if match else None
+
+    def sample_game(self):
+        """Milliseconds per tick and player count from the server."""
+        try:
+            players = self._query("list", "players online", self.LIST_EXPRESSION)
+            self._last_players = int(players) if players is not None else -1
+        except TimeoutError:
+            self._last_players = -1
+
+        if self._tick_query_supported:
+            try:
+                line = self.server.query("tick query", ("Average time per tick", self.UNKNOWN_COMMAND), timeout=5)
+            except TimeoutError:
+                # The server is too busy to answer, try again next time
+                self._last_mspt = math.nan
+            else:
+                if self.UNKNOWN_COMMAND in line:
+                    logger.info("Server does not support tick query, tick times will not be collected")
+                    self._tick_query_supported = False
+                    self._last_mspt = math.nan
+                else:
+                    match = self.TICK_EXPRESSION.search(line)
+                    self._last_mspt = float(match.group(1)) if match else math.nan
+
+        return self._last_mspt, self._last_players
+
+    def sample(self) -> Optional[MetricsSample]:
+        """Take and store a sample, if the server is running."""
+        pid = self.pid
+        if pid is None or self.server.status != ServerStatus.RUNNING:
+            return None
+
+        sample = MetricsSample(timestamp=time.time())
+        try:
+            sample.rss_mb, sample.cpu_percent = self.sample_process(pid)
+        except (OSError, StopIteration, ValueError, sh.ErrorReturnCode) as e:
+            logger.warning(f"Unable to sample server process {pid}: {e}")
+
+        if time.monotonic() - self._last_command_sample >= self.command_interval:
+            self._last_command_sample = time.monotonic()
+            self.sample_game()
+        sample.mspt, sample.players = self._last_mspt, self._last_players
+
+        self.ring.append(sample)
+        return sample
+
+    @property
+    def lock_path(self) -> Path:
+        """Lock file held by the collector sampling the server."""
+        return Path(self.server.metrics_file).with_suffix(".lock")
+
+    def _acquire(self) -> bool:
+        """Take (or keep) the server's collector lock, without waiting for it."""
+        if self._lock_file is not None:
+            return True
+        try:
+            lock_file = open(self.lock_path, "a")
+        except OSError:
+            # The server directory is gone
+            return False
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        logger.info(f"Collecting metrics for server {self.server.name}")
+        self._lock_file = lock_file
+        return True
+
+    def _release(self) -> None:
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                if self._acquire():
+                    try:
+                        self.sample()
+                    except Exception:
+                        logger.exception(f"Metrics sample failed for server {self.server.name}")
+                self._stop.wait(self.interval)
+        finally:
+            self._release()
+
+    def start(self) -> None:
+        """Start sampling on a background thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        logger.info(f"Starting metrics collector for server {self.server.name}")
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"metrics-{self.server.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling."""
+        self._stop.set()
+
+
+_collectors: Dict[str, MetricsCollector] = {}
+_collectors_lock = threading.Lock()
+
+
+def start_collectors(servers: Iterable) -> None:
+    """Start a metrics collector for each server, once per process.
+
+    Collectors run for as long as the process does and sample a server whenever
+    it is running, so the history has no gaps while nobody is watching.
+    """
+    with _collectors_lock:
+        for server in servers:
+            if server.name not in _collectors:
+                _collectors[server.name] = MetricsCollector(server)
+            _collectors[server.name].start()
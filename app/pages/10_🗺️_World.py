@@ -0,0 +1,173 @@
+from datetime import datetime
+
+import streamlit as st
+import pandas as pd
+
+from instrumentation import start_render
+from client import get_local_server_manager
+from enums import ServerStatus
+
+logger = st.logger.get_logger(__name__)
+
+start_render("World")
+
+server_manager = get_local_server_manager()
+
+st.title("Minecraft Server Manager")
+
+logger.info(f"Available servers: {server_manager.servers}")
+
+server_list, pre_selected_index = server_manager.get_ui_server_list()
+
+server_selection = st.selectbox(
+    "Select a server",
+    options=server_list,
+    placeholder="Choose an option",
+    index=pre_selected_index,
+    )
+
+
+def format_time(timestamp: int):
+    return datetime.fromtimestamp(timestamp) if timestamp else None
+
+
+if server_selection != "Choose an option":
+
+    logger.info(f"Selected server: {server_selection}")
+    st.session_state.server = server_selection
+    server = server_manager.get_server(server_selection)
+
+    st.header("World")
+    stale_days = st.number_input("Stale after (days)", min_value=1, value=90, step=1)
+    analysis = server.analyze_world(stale_days=stale_days)
+
+    if not analysis.regions:
+        st.write(f"No region files found in {server.world_path}")
+    else:
+        st.caption(
+            f"{len(analysis.regions)} region files analysed in {analysis.seconds * 1000:.0f} ms. "
+            f"Chunks not saved in the last {stale_days} days are counted as stale."
+        )
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Size", f"{analysis.size_bytes / 1024 / 1024:,.1f} Mb")
+        col2.metric("Chunks", f"{analysis.chunks:,}")
+        col3.metric("Stale chunks", f"{analysis.stale_chunks:,}")
+
+        st.subheader("Dimensions")
+        df = pd.DataFrame(
+            [
+                (
+                    d.dimension,
+                    round(d.size_mb, 1),
+                    round(d.folder_bytes.get("region", 0) / 1024 / 1024, 1),
+                    round(d.folder_bytes.get("entities", 0) / 1024 / 1024, 1),
+                    round(d.folder_bytes.get("poi", 0) / 1024 / 1024, 1),
+                    d.regions,
+                    d.chunks,
+                    d.stale_chunks,
+                    round(d.wasted_bytes / 1024 / 1024, 1),
+                    format_time(d.oldest),
+                    format_time(d.newest),
+                )
+                for d in analysis.dimensions.values()
+            ],
+            columns=[
+                "Dimension", "Size (Mb)", "Terrain (Mb)", "Entities (Mb)", "POI (Mb)", "Regions",
+                "Chunks", "Stale chunks", "Unused (Mb)", "Oldest save", "Newest save",
+            ],
+        )
+        st.dataframe(df, use_container_width=True, hide_index=True)
+
+        st.subheader("Largest region files")
+        df = pd.DataFrame(
+            [
+                (
+                    r.dimension,
+                    str(r.path.relative_to(analysis.path)),
+                    round(r.size_mb, 2),
+                    r.chunks,
+                    r.stale_chunks,
+                    format_time(r.newest),
+                )
+                for r in analysis.largest_regions()
+            ],
+            columns=["Dimension", "File", "Size (Mb)", "Chunks", "Stale chunks", "Newest save"],
+        )
+        st.dataframe(df, use_container_width=True, hide_index=True)
+
+    with st.expander("Pre-generation"):
+        st.write(
+            "Generate chunks around spawn ahead of time, so players don't wait for them. "
+            "The job slows down while the server is busy and can be paused and resumed."
+        )
+        job = server.pregeneration
+        state = job.state
+        if state is not None:
+            st.progress(state.progress, text=f"{state.completed:,} of {state.total:,} tiles, radius {state.radius:,} blocks")
+            status = "running" if job.running else ("paused" if state.status == "running" else state.status)
+            mspt = f", {state.mspt:.1f} ms per tick" if state.mspt is not None else ""
+            st.caption(f"Status: {status}{mspt}. {state.message}")
+
+        if job.running:
+            if st.button("Pause"):
+                job.pause()
+                st.rerun()
+        elif server.status != ServerStatus.RUNNING:
+            st.warning("Start the server to pre-generate chunks.")
+        else:
+            if state is not None and state.status != "done" and st.button("Resume"):
+                job.resume()
+                st.rerun()
+            col1, col2 = st.columns(2)
+            pregen_radius = col1.number_input("Radius (blocks)", min_value=16, value=2000, step=100, key="pregen_radius")
+            max_mspt = col2.number_input("Slow down above (ms per tick)", min_value=10, max_value=50, value=40)
+            if st.button("Start pre-generation"):
+                job.start(radius=int(pregen_radius), max_mspt=float(max_mspt))
+                st.rerun()
+
+    with st.expander("Prune"):
+        st.write(
+            "Remove chunks players have barely visited, or that are far from spawn, to shrink the world "
+            "and its backups. Removed chunks are generated again if players go there. A backup is taken first."
+        )
+        if server.status == ServerStatus.RUNNING:
+            st.warning("Stop the server before pruning the world.")
+        else:
+            dimensions = st.multiselect(
+                "Dimensions",
+                options=list(analysis.dimensions),
+                default=[d for d in analysis.dimensions if d == "overworld"],
+                help="The radius and centre are in overworld blocks, and are divided by 8 for the nether. "
+                "Other dimensions are only pruned by time spent near chunks.",
+            )
+            min_inhabited_seconds = st.number_input(
+                "Remove chunks players have spent less than this many seconds near (0 to keep all)",
+                min_value=0, value=0, step=10,
+            )
+            use_radius = st.checkbox("Remove chunks outside a radius")
+            spawn_x, spawn_z = server.world_spawn
+            col1, col2, col3 = st.columns(3)
+            radius = col1.number_input("Radius (blocks)", min_value=16, value=5000, step=100, disabled=not use_radius)
+            center_x = col2.number_input("Centre X", value=spawn_x, step=1, disabled=not use_radius)
+            center_z = col3.number_input("Centre Z", value=spawn_z, step=1, disabled=not use_radius)
+
+            options = dict(
+                min_inhabited_ticks=int(min_inhabited_seconds) * 20,
+                radius=int(radius) if use_radius else None,
+                center=(int(center_x), int(center_z)),
+                dimensions=dimensions,
+            )
+            col1, col2 = st.columns(2)
+            if col1.button("Preview"):
+                result = server.prune_world(dry_run=True, **options)
+                st.info(
+                    f"Would remove {result.chunks_removed:,} chunks ({result.regions_deleted} whole regions), "
+                    f"saving {result.saved_bytes / 1024 / 1024:,.1f} Mb."
+                )
+            if col2.button("Prune", type="primary", disabled=not (use_radius or min_inhabited_seconds)):
+                with st.spinner("Backing up and pruning..."):
+                    result = server.prune_world(**options)
+                st.success(
+                    f"Removed {result.chunks_removed:,} chunks ({result.regions_deleted} whole regions), "
+                    f"saving {result.saved_bytes / 1024 / 1024:,.1f} Mb in {result.seconds:.1f}s."
+                )
@@ -2,12 +2,15 @@ import time
 
 import streamlit as st
 
-from server import ServerManager
+from instrumentation import start_render
+from client import get_server_manager
 from enums import ServerStatus, GameRule
 
 logger = st.logger.get_logger(__name__)
 
-server_manager = ServerManager()
+start_render("Game rules")
+
+server_manager = get_server_manager()
 
 st.title("Minecraft Server Manager")
 
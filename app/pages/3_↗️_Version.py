@@ -3,14 +3,17 @@ import time
 import streamlit as st
 import sh
 
-from server import ServerManager
+from instrumentation import start_render
+from client import get_local_server_manager
+from server import MinecraftServer
 from enums import ServerStatus, GameRule
-from download import MinecraftServerDownloader
 
 
 logger = st.logger.get_logger(__name__)
 
-server_manager = ServerManager()
+start_render("Version")
+
+server_manager = get_local_server_manager()
 
 st.title("Minecraft Server Manager")
 
@@ -25,7 +28,7 @@ server_selection = st.selectbox(
     index=pre_selected_index,
     )
 
-def set_server_version(server: ServerManager, version: str):
+def set_server_version(server: MinecraftServer, version: str):
     """Set the version of the server jar file."""
     if server.version == version:
         st.write(f"Version is already {version}")
@@ -33,10 +36,14 @@ def set_server_version(server: ServerManager, version: str):
     
     with st.status("Setting version...", expanded=True):
         st.write(f"Downloading server file for version {version}")
+        from download import MinecraftServerDownloader
         downloader = MinecraftServerDownloader(version=version)
         new_server_file = downloader.get_server_file()
         st.write(f"New server file: {new_server_file}")
 
+        st.write(f"Backing up server...")
+        server.online_backup()
+
         st.write(f"Stopping server...")
         if server.status == ServerStatus.RUNNING:
             server.stop()
@@ -44,16 +51,11 @@ def set_server_version(server: ServerManager, version: str):
         st.write(f"Sleeping for 5s...")
         time.sleep(5)
 
-        st.write(f"Backing up server...")
-        server.backup()
-
         st.write(f"Removing old server file: {server.server_filename}")
-        with sh.pushd(server.server_directory):
-            sh.rm(server.server_filename)
+        sh.rm(server.server_filename, _cwd=server.server_directory)
 
         st.write(f"Copying new server file: {new_server_file}")
-        with sh.pushd(server.server_directory):
-            sh.cp(new_server_file, server.server_filename)
+        sh.cp(new_server_file, server.server_filename, _cwd=server.server_directory)
 
         st.write(f"Starting server...")
         server.start()
@@ -1,10 +1,13 @@
 import streamlit as st
 
-from server import ServerManager
+from instrumentation import start_render
+from client import get_local_server_manager
 
 logger = st.logger.get_logger(__name__)
 
-server_manager = ServerManager()
+start_render("Properties")
+
+server_manager = get_local_server_manager()
 
 st.title("Minecraft Server Manager")
 
@@ -33,4 +36,29 @@ if server_selection != "Choose an option":
         if st.button("Restart"):
             server.restart()
 
-        st.snow()
\ No newline at end of file
+        st.snow()
+
+    with st.expander("Memory"):
+        profiles = server_manager.jvm_profiles
+        st.markdown(f"**Heap size:** {profiles[server.name].heap_size}")
+        st.caption("Host memory is shared between servers in proportion to their weights.")
+        weight = st.number_input("Memory weight", min_value=0.1, value=server.jvm_weight, step=0.5)
+        if st.button("Update memory for all servers"):
+            server.update_settings(jvm_weight=weight)
+            server_manager.write_jvm_profiles()
+            st.success("JVM settings written. Restart servers for the changes to take effect.")
+
+    with st.expander("Idle shutdown"):
+        st.caption(
+            "Stop the server when nobody has been online for a while, freeing its memory. "
+            "The server starts again when a player tries to join. Needs the fleet daemon to be running."
+        )
+        if server.suspended:
+            st.info("The server is suspended and will start when a player joins.")
+        idle_minutes = st.number_input(
+            "Minutes without players before stopping (0 to keep running)",
+            min_value=0, value=int(server.idle_minutes), step=5,
+        )
+        if st.button("Save idle setting"):
+            server.update_settings(idle_minutes=idle_minutes)
+            st.success("Idle setting saved.")
@@ -1,22 +1,88 @@
 import streamlit as st
 
-from server import ServerManager
+from instrumentation import start_render
+from client import get_local_server_manager
 
 logger = st.logger.get_logger(__name__)
 
-server_manager = ServerManager()
+start_render("Create server")
+
+server_manager = get_local_server_manager()
 
 st.title("Minecraft Server Manager")
 
-server_name = st.text_input("Server name", key="server_name")
-server_version = st.text_input("Version", key="server_version")
-st.markdown(
-    "You can find the latest Java Edition versions [here](https://feedback.minecraft.net/hc/en-us/sections/360001186971-Release-Changelogs)"
-)
+templates = server_manager.templates
+source = st.radio("Create from", options=["Version", "Template"], horizontal=True, disabled=not templates)
+
+if source == "Version":
+    server_name = st.text_input("Server name", key="server_name")
+    server_version = st.text_input("Version", key="server_version")
+    st.markdown(
+        "You can find the latest Java Edition versions [here](https://feedback.minecraft.net/hc/en-us/sections/360001186971-Release-Changelogs)"
+    )
+
+    server_port_number = st.text_input("Port number", key="server_port_number", value=str(server_manager.next_port_number))
+
+    pregenerate = st.checkbox("Pre-generate chunks around spawn", key="server_pregenerate")
+    pregenerate_radius = st.number_input(
+        "Pre-generation radius (blocks)", min_value=16, value=2000, step=100, disabled=not pregenerate
+    )
+
+    if st.button("Create"):
+        logger.info(f"Creating server: {server_name} {server_version}")
+        server_manager.create_server(
+            name=server_name,
+            version=server_version,
+            port=int(server_port_number),
+            pregenerate_radius=int(pregenerate_radius) if pregenerate else None,
+        )
+        st.success("Server created!")
+        if pregenerate:
+            st.info("Chunks are being generated in the background. Progress is shown on the World page.")
+
+else:
+    template_name = st.selectbox("Template", options=templates)
+    template = server_manager.get_template(template_name)
+    st.caption(
+        f"Version {template.version or 'unknown'}, "
+        f"{'with a world' if template.has_world else 'new world'}, "
+        f"created from {template.metadata.get('source', 'unknown')}"
+    )
+
+    count = st.number_input("Number of servers", min_value=1, max_value=100, value=1)
+    if count == 1:
+        names = [st.text_input("Server name", key="clone_name")]
+    else:
+        prefix = st.text_input("Server name prefix", key="clone_prefix", placeholder="e.g. class-")
+        names = [f"{prefix}{index + 1}" for index in range(count)]
+        st.caption(f"Servers: {', '.join(names[:5])}{', ...' if count > 5 else ''}")
+    first_port = st.number_input("First port number", min_value=1024, max_value=65535, value=server_manager.next_port_number)
+    start = st.checkbox("Start servers once created")
+
+    existing = set(server_manager.servers) & set(names)
+    if existing:
+        st.warning(f"Servers already exist: {', '.join(sorted(existing))}")
 
-server_port_number = st.text_input("Port number", key="server_port_number", value=str(server_manager.next_port_number))
+    if st.button("Create", disabled=not all(names) or bool(existing)):
+        with st.spinner(f"Creating {count} servers..."):
+            servers = server_manager.clone_servers(template_name, names, first_port=int(first_port), start=start)
+        st.success(f"Created {', '.join(f'{s.name} (port {s.port_number})' for s in servers)}")
 
-if st.button("Create"):
-    logger.info(f"Creating server: {server_name} {server_version}")
-    server_manager.create_server(name=server_name, version=server_version, port=int(server_port_number))
-    st.success("Server created!")
+with st.expander("Save a server as a template"):
+    server_list = server_manager.servers
+    if not server_list:
+        st.write("No servers available.")
+    else:
+        source_server = st.selectbox("Server", options=server_list)
+        new_template = st.text_input("Template name")
+        include_world = st.checkbox(
+            "Include the world", value=True,
+            help="New servers start with a copy of this world, such as a pre-generated or prepared map. "
+                 "The server must be stopped.",
+        )
+        if st.button("Save template", disabled=not new_template or new_template in templates):
+            try:
+                server_manager.create_template(new_template, source_server, include_world=include_world)
+                st.success(f"Template {new_template} saved.")
+            except RuntimeError as e:
+                st.error(str(e))
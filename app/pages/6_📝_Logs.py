@@ -1,10 +1,16 @@
+import re
+
 import streamlit as st
+import pandas as pd
 
-from server import ServerManager
+from instrumentation import start_render
+from client import get_server_manager
 
 logger = st.logger.get_logger(__name__)
 
-server_manager = ServerManager()
+start_render("Logs")
+
+server_manager = get_server_manager()
 
 st.title("Minecraft Server Manager")
 
@@ -25,9 +31,55 @@ if server_selection != "Choose an option":
     st.session_state.server = server_selection
     server = server_manager.get_server(server_selection)
 
-    st.code(server.log_contents, line_numbers=True)
-    st.button("Refresh logs")
+    with st.expander("Search logs", expanded=True):
+        col1, col2 = st.columns([3, 1])
+        search_text = col1.text_input("Words", placeholder="e.g. diamonds")
+        player = col2.selectbox("Player", options=["Anyone"] + server.log_reader.players)
+        if search_text or player != "Anyone":
+            results = server.log_reader.search(search_text, player=None if player == "Anyone" else player, limit=200)
+            st.caption(f"{len(results)} matching lines (newest first, up to 200)")
+            if results:
+                st.dataframe(
+                    pd.DataFrame(results)[["timestamp", "log_level", "log_message"]],
+                    use_container_width=True,
+                    hide_index=True,
+                )
+
+    st.subheader("Log")
+    log_files = [log_file.name for log_file in server.log_reader.log_files]
+    if not log_files:
+        st.write("No logs yet.")
+    else:
+        col1, col2, col3 = st.columns([2, 1, 1])
+        log_name = col1.selectbox("File", options=log_files)
+        page_size = col2.selectbox("Lines per page", options=[50, 100, 250, 500], index=1)
+        go_to_time = col3.text_input("Go to time", placeholder="HH:MM:SS")
+
+        window = server.log_reader.window(log_name)
+        page_count = window.page_count(page_size)
+        default_page = page_count
+        if re.fullmatch(r"\d\d:\d\d(:\d\d)?", go_to_time):
+            time_of_day = go_to_time if len(go_to_time) == 8 else f"{go_to_time}:00"
+            default_page = min(page_count, window.line_at_time(time_of_day) // page_size + 1)
+        elif go_to_time:
+            st.warning("Enter a time as HH:MM or HH:MM:SS.")
+
+        page = st.number_input(f"Page (of {page_count:,})", min_value=1, max_value=page_count, value=default_page)
+        st.caption(f"{window.line_count:,} lines")
 
-    with st.expander("Show tabular logs"):
-        log_data = server.log_reader.to_pandas()
-        st.dataframe(log_data)
+        rows = []
+        for line_number, text in window.page(int(page) - 1, page_size):
+            match = server.log_reader.expression.match(text)
+            if match:
+                timestamp, thread, level, message = match.groups()
+                rows.append((line_number + 1, timestamp, thread, level, message))
+            else:
+                # Continuation lines, such as stack traces
+                rows.append((line_number + 1, None, None, None, text))
+        st.dataframe(
+            pd.DataFrame(rows, columns=["Line", "Time", "Thread", "Level", "Message"]),
+            use_container_width=True,
+            hide_index=True,
+            height=min(35 * (len(rows) + 1) + 3, 800),
+        )
+        st.button("Refresh logs")
@@ -1,10 +1,16 @@
+import time
+
 import streamlit as st
 
-from server import ServerManager
+from instrumentation import start_render
+from client import get_server_manager
 
 logger = st.logger.get_logger(__name__)
 
-server_manager = ServerManager()
+start_render("Data")
+
+
+server_manager = get_server_manager()
 
 st.title("Minecraft Server Manager")
 
@@ -35,4 +41,21 @@ if server_selection != "Choose an option":
         data=server.log_reader.get_events_by_time(interval=interval),
         x="event time",
         y="event count",
-        color=None, width=0, height=0, use_container_width=True)    
\ No newline at end of file
+        color=None, width=0, height=0, use_container_width=True)
+
+    st.header("Performance")
+    window = st.selectbox("Show the last", options=["1 hour", "6 hours", "1 day", "7 days"], index=0)
+    hours = {"1 hour": 1, "6 hours": 6, "1 day": 24, "7 days": 168}[window]
+    metrics = server.metrics.to_pandas(since=time.time() - hours * 3600)
+
+    if metrics.empty:
+        st.write("No metrics collected yet. Metrics are collected while the server is running.")
+    else:
+        st.subheader("Milliseconds per tick")
+        st.line_chart(metrics["mspt"], use_container_width=True)
+        st.subheader("Players")
+        st.line_chart(metrics["players"], use_container_width=True)
+        st.subheader("Memory (Mb)")
+        st.line_chart(metrics["rss_mb"], use_container_width=True)
+        st.subheader("CPU (%)")
+        st.line_chart(metrics["cpu_percent"], use_container_width=True)
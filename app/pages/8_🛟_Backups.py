@@ -1,11 +1,19 @@
+from pathlib import Path
+
 import streamlit as st
 import pandas as pd
 
-from server import ServerManager, ServerStatus
+from instrumentation import start_render
+from client import get_local_server_manager
+from enums import ServerStatus
+from backup import available_codecs, DEFAULT_LEVELS, DIMENSION_PATTERNS, LEVEL_RANGES
+from catalogue import RetentionPolicy
 
 logger = st.logger.get_logger(__name__)
 
-server_manager = ServerManager()
+start_render("Backups")
+
+server_manager = get_local_server_manager()
 
 st.title("Minecraft Server Manager")
 
@@ -26,10 +34,93 @@ if server_selection != "Choose an option":
     st.session_state.server = server_selection
     server = server_manager.get_server(server_selection)
 
-    backup_files = server.backups
-    df = pd.DataFrame(backup_files, columns=["File name", "Size (Mb)"])
+    entries = server.backup_entries
+    df = pd.DataFrame(
+        [
+            (
+                e.name,
+                e.created_time,
+                e.version,
+                e.size_mb,
+                round(e.world_bytes / 1024 / 1024, 2) if e.world_bytes is not None else None,
+                e.codec,
+                round(e.ratio, 2) if e.ratio else None,
+                round(e.throughput, 1) if e.throughput else None,
+            )
+            for e in reversed(entries)
+        ],
+        columns=["File name", "Created", "Version", "Size (Mb)", "World size (Mb)", "Codec", "Ratio", "Throughput (Mb/s)"],
+    )
     st.dataframe(df, use_container_width=True, hide_index=True)
+    st.markdown(f"**{len(entries)} backups, {sum(e.archive_bytes for e in entries) / 1024 / 1024:.1f} Mb in total**")
+
+    st.button("Backup", on_click=server.online_backup)
+
+    with st.expander("Restore"):
+        if not entries:
+            st.write("No backups available.")
+        elif server.status == ServerStatus.RUNNING:
+            st.warning("Stop the server before restoring from a backup.")
+        else:
+            backup_name = st.selectbox("Backup", options=[e.name for e in reversed(entries)])
+            what = st.radio("Restore", options=["Dimensions", "Area", "Players"], horizontal=True)
+
+            if what == "Dimensions":
+                dimensions = st.multiselect(
+                    "Dimensions", options=list(DIMENSION_PATTERNS),
+                    help="Chunks generated since the backup are removed from the restored dimensions.",
+                )
+                if st.button("Restore dimensions", disabled=not dimensions):
+                    restored = server.restore_dimensions(backup_name, dimensions)
+                    st.success(f"Restored {len(restored)} files.")
+
+            elif what == "Area":
+                dimension = st.selectbox("Dimension", options=list(DIMENSION_PATTERNS))
+                col1, col2 = st.columns(2)
+                with col1:
+                    x1 = st.number_input("From X", value=0, step=1)
+                    z1 = st.number_input("From Z", value=0, step=1)
+                with col2:
+                    x2 = st.number_input("To X", value=0, step=1)
+                    z2 = st.number_input("To Z", value=0, step=1)
+                if st.button("Restore area"):
+                    restored = server.restore_area(backup_name, int(x1), int(z1), int(x2), int(z2), dimension)
+                    st.success(f"Restored {len(restored)} files.")
+
+            else:
+                players = sorted(
+                    Path(m).stem for m in server.backup_members(backup_name) if m.startswith("playerdata/") and m.endswith(".dat")
+                )
+                uuids = st.multiselect("Players", options=players)
+                if st.button("Restore players", disabled=not uuids):
+                    restored = server.restore_players(backup_name, uuids)
+                    st.success(f"Restored {len(restored)} files.")
+
+    with st.expander("Compression settings"):
+        codecs = available_codecs()
+        codec = st.selectbox(
+            "Codec",
+            options=codecs,
+            index=codecs.index(server.backup_codec) if server.backup_codec in codecs else 0,
+        )
+        min_level, max_level = LEVEL_RANGES[codec]
+        level = server.backup_level if codec == server.backup_codec and server.backup_level is not None else DEFAULT_LEVELS[codec]
+        level = st.slider("Level", min_value=min_level, max_value=max_level, value=level)
+        if st.button("Save settings"):
+            server.update_settings(backup_codec=codec, backup_level=level)
+            st.success("Backup settings saved.")
 
-    if server.status == ServerStatus.RUNNING:
 
-        st.button("Backup", on_click=server.backup)
+    with st.expander("Retention policy"):
+        policy = server.retention_policy
+        enabled = st.checkbox("Remove old backups automatically", value=policy is not None)
+        policy = policy or RetentionPolicy()
+        keep_last = st.number_input("Always keep the newest", min_value=1, value=policy.keep_last)
+        daily = st.number_input("Daily backups to keep", min_value=0, value=policy.daily)
+        weekly = st.number_input("Weekly backups to keep", min_value=0, value=policy.weekly)
+        monthly = st.number_input("Monthly backups to keep", min_value=0, value=policy.monthly)
+        if st.button("Save retention policy"):
+            retention = dict(keep_last=keep_last, daily=daily, weekly=weekly, monthly=monthly) if enabled else None
+            server.update_settings(retention=retention)
+            server.apply_retention_policy()
+            st.success("Retention policy saved.")
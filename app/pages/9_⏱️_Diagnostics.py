@@ -0,0 +1,47 @@
+from datetime import datetime
+
+import streamlit as st
+import pandas as pd
+
+import instrumentation
+
+logger = st.logger.get_logger(__name__)
+
+st.title("Minecraft Server Manager")
+
+st.header("Diagnostics")
+st.caption("Timings of the manager's own operations since the app was started.")
+
+operations = instrumentation.operations()
+if not operations:
+    st.write("No operations recorded yet. Visit other pages to record timings.")
+else:
+    df = pd.DataFrame(
+        [
+            (
+                op.name,
+                op.count,
+                round(op.total_ms, 1),
+                round(op.mean_ms, 1),
+                op.percentile_ms(50),
+                op.percentile_ms(95),
+                round(op.max_ms, 1),
+            )
+            for op in operations
+        ],
+        columns=["Operation", "Count", "Total (ms)", "Mean (ms)", "p50 (ms)", "p95 (ms)", "Max (ms)"],
+    )
+    st.dataframe(df, use_container_width=True, hide_index=True)
+
+st.subheader("Recent page renders")
+
+for render in instrumentation.renders():
+    started = datetime.fromtimestamp(render.started).strftime("%H:%M:%S")
+    with st.expander(f"{started} {render.page}: {render.total_ms:.0f} ms in {len(render.spans)} operations"):
+        st.dataframe(
+            pd.DataFrame(render.slowest(10), columns=["Operation", "Time (ms)"]),
+            use_container_width=True,
+            hide_index=True,
+        )
+
+st.button("Reset", on_click=instrumentation.reset)
@@ -0,0 +1,291 @@
+"""Module for pre-generating the chunks of a world.
+
+Chunks around a centre are force-loaded one square tile at a time, spiralling
+outwards, so the server generates them before any players arrive. After each
+tile the server's tick time is checked with ``tick query`` and the job waits
+while the server is overloaded. A tile only counts as done once the world has
+been saved and all of its chunks are fully generated in the region files. Progress is kept in ``pregen.json`` in the server
+directory, so a job can be paused and resumed, including after a restart of the
+manager.
+"""
+from typing import Dict, Iterator, Optional, Tuple
+from dataclasses import dataclass, asdict
+from pathlib import Path
+import json
+import math
+import os
+import threading
+import time
+
+import streamlit as st
+
+from enums import ServerStatus
+from metrics import MetricsCollector
+from world import ungenerated_chunks
+
+logger = st.logger.get_logger(__name__)
+
+OVERWORLD = "minecraft:overworld"
+
+# Seconds to wait after each tile on servers without the tick command (before 1.20.3)
+FIXED_DELAY = 5.0
+# Longest wait between tick queries the server was too busy to answer
+MAX_BACKOFF = 60.0
+
+
+@dataclass
+class PregenState:
+    """Progress of a pre-generation job. The centre is worked out once the server has started, if not given."""
+    radius: int
+    center_x: Optional[int] = None
+    center_z: Optional[int] = None
+    tile_chunks: int = 8
+    dimension: str = OVERWORLD
+    max_mspt: float = 40.0
+    settle: float = 1.0
+    completed: int = 0
+    status: str = "running"  # running, paused, done or failed
+    message: str = ""
+    mspt: Optional[float] = None
+    started: float = 0.0
+    updated: float = 0.0
+
+    @property
+    def rings(self) -> int:
+        """Rings of tiles around the centre tile needed to cover the radius."""
+        return math.ceil(self.radius / (self.tile_chunks * 16))
+
+    @property
+    def total(self) -> int:
+        return (2 * self.rings + 1) ** 2
+
+    @property
+    def progress(self) -> float:
+        return self.completed / self.total if self.total else 1.0
+
+    def tile_area(self, tile: Tuple[int, int]) -> Tuple[int, int, int, int]:
+        """Block coordinates (x1, z1, x2, z2) covered by a tile."""
+        size = self.tile_chunks * 16
+        x1 = (self.center_x >> 4 << 4) - size // 2 + tile[0] * size
+        z1 = (self.center_z >> 4 << 4) - size // 2 + tile[1] * size
+        return x1, z1, x1 + size - 1, z1 + size - 1
+
+
+def spiral(rings: int) -> Iterator[Tuple[int, int]]:
+    """Tile offsets from the centre, ring by ring outwards."""
+    yield 0, 0
+    for ring in range(1, rings + 1):
+        # Each ring starts at its top left corner and runs clockwise
+        for x in range(-ring, ring):
+            yield x, -ring
+        for z in range(-ring, ring):
+            yield ring, z
+        for x in range(ring, -ring, -1):
+            yield x, ring
+        for z in range(ring, -ring, -1):
+            yield -ring, z
+
+
+class PregenJob:
+    """Pre-generation job for a server, run on a background thread."""
+
+    def __init__(self, server):
+        self.server = server
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._tick_query_supported = True
+
+    @property
+    def state_file(self) -> Path:
+        return Path(self.server.server_directory) / "pregen.json"
+
+    @property
+    def state(self) -> Optional[PregenState]:
+        """Saved progress of the current (or last) job."""
+        try:
+            return PregenState(**json.loads(self.state_file.read_text()))
+        except FileNotFoundError:
+            return None
+
+    def _save(self, state: PregenState) -> None:
+        state.updated = time.time()
+        partial = self.state_file.with_suffix(".json.partial")
+        partial.write_text(json.dumps(asdict(state), indent=2))
+        os.replace(partial, self.state_file)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(
+        self,
+        radius: int,
+        center: Optional[Tuple[int, int]] = None,
+        tile_chunks: int = 8,
+        dimension: str = OVERWORLD,
+        max_mspt: float = 40.0,
+        settle: float = 1.0,
+        wait_for_startup: bool = False,
+    ) -> None:
+        """Start a new job generating chunks within radius blocks of center (default: spawn)."""
+        if self.running:
+            raise RuntimeError("Pre-generation is already running.")
+        # A new server has no level.dat until it has started, so spawn is looked up when the job runs
+        center_x, center_z = center if center is not None else (None, None)
+        self._save(PregenState(
+            center_x=center_x,
+            center_z=center_z,
+            radius=radius,
+            tile_chunks=tile_chunks,
+            dimension=dimension,
+            max_mspt=max_mspt,
+            settle=settle,
+            started=time.time(),
+        ))
+        self._start_thread(wait_for_startup)
+
+    def resume(self) -> None:
+        """Carry on with a paused job."""
+        state = self.state
+        if state is None or state.status == "done":
+            raise RuntimeError("There is no pre-generation job to resume.")
+        if self.running:
+            return
+        state.status, state.message = "running", ""
+        self._save(state)
+        self._start_thread(wait_for_startup=False)
+
+    def pause(self) -> None:
+        """Stop after the current tile. The job can be resumed later."""
+        self._stop.set()
+
+    def _start_thread(self, wait_for_startup: bool) -> None:
+        logger.info(f"Starting chunk pre-generation for server {self.server.name}")
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(wait_for_startup,), name=f"pregen-{self.server.name}", daemon=True
+        )
+        self._thread.start()
+
+    def tick_time(self) -> Optional[float]:
+        """Average milliseconds per tick, or None if the server can't report it.
+
+        Raises TimeoutError if the server doesn't answer in time.
+        """
+        if not self._tick_query_supported:
+            return None
+        line = self.server.query("tick query", ("Average time per tick", MetricsCollector.UNKNOWN_COMMAND))
+        if MetricsCollector.UNKNOWN_COMMAND in line:
+            logger.info(f"Server {self.server.name} does not support tick query, waiting {FIXED_DELAY}s per tile")
+            self._tick_query_supported = False
+            return None
+        match = MetricsCollector.TICK_EXPRESSION.search(line)
+        return float(match.group(1)) if match else None
+
+    def _forceload(self, state: PregenState, action: str, area: Tuple[int, int, int, int]) -> None:
+        command = f"forceload {action} {' '.join(str(c) for c in area)}"
+        if state.dimension != OVERWORLD:
+            command = f"execute in {state.dimension} run {command}"
+        self.server.run_command(command)
+
+    def _throttle(self, state: PregenState) -> None:
+        """Wait while the server is taking longer than max_mspt per tick, or is too busy to answer."""
+        backoff = state.settle
+        while not self._stop.is_set() and self.server.status == ServerStatus.RUNNING:
+            try:
+                state.mspt = self.tick_time()
+            except TimeoutError:
+                logger.debug(f"Server {self.server.name} did not answer tick query, waiting {backoff}s")
+                state.mspt = None
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, MAX_BACKOFF)
+                continue
+            if not self._tick_query_supported:
+                self._stop.wait(FIXED_DELAY)
+                return
+            if state.mspt is None or state.mspt <= state.max_mspt:
+                return
+            logger.debug(f"Server {self.server.name} at {state.mspt}ms per tick, waiting")
+            self._stop.wait(state.settle)
+
+    def _center(self) -> Tuple[int, int]:
+        """World spawn, saving the world first if level.dat hasn't been written yet."""
+        if not (Path(self.server.world_path) / "level.dat").exists():
+            self.server.query("save-all flush", "Saved the game", timeout=120)
+        return self.server.world_spawn
+
+    def _wait_for_tile(self, state: PregenState, area: Tuple[int, int, int, int]) -> bool:
+        """Save the world until every chunk of a tile is fully generated in the region files.
+
+        A full save writes every loaded chunk, so it is forced once per tile
+        once the server has caught up, and again only if chunks were still
+        generating, waiting twice as long before each retry.
+
+        Returns False if the job was paused or the server stopped first.
+        """
+        x1, z1, x2, z2 = area
+        chunks = [(x, z) for x in range(x1 >> 4, (x2 >> 4) + 1) for z in range(z1 >> 4, (z2 >> 4) + 1)]
+        backoff = state.settle
+        while not self._stop.is_set() and self.server.status == ServerStatus.RUNNING:
+            try:
+                self.server.query("save-all flush", "Saved the game", timeout=120)
+            except TimeoutError:
+                logger.debug(f"Server {self.server.name} did not finish saving, trying again")
+            else:
+                chunks = ungenerated_chunks(self.server.world_path, state.dimension, chunks)
+                if not chunks:
+                    return True
+                logger.debug(f"{len(chunks)} chunks of tile {area} not generated yet, waiting {backoff}s")
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, MAX_BACKOFF)
+        return False
+
+    def _run(self, wait_for_startup: bool) -> None:
+        state = self.state
+        try:
+            if wait_for_startup:
+                self.server.wait_for_log_line("Done (", timeout=600)
+            if state.center_x is None:
+                state.center_x, state.center_z = self._center()
+                logger.info(f"Pre-generating chunks around spawn ({state.center_x}, {state.center_z})")
+                self._save(state)
+            tiles = list(spiral(state.rings))
+            while state.completed < state.total:
+                if self._stop.is_set():
+                    state.status, state.message = "paused", ""
+                    break
+                if self.server.status != ServerStatus.RUNNING:
+                    state.status, state.message = "paused", "Server is not running."
+                    break
+                area = state.tile_area(tiles[state.completed])
+                self._forceload(state, "add", area)
+                try:
+                    self._stop.wait(state.settle)
+                    self._throttle(state)
+                    generated = self._wait_for_tile(state, area)
+                finally:
+                    self._forceload(state, "remove", area)
+                if not generated:
+                    # Paused (or the server stopped) before the tile was finished, generate it again on resume
+                    continue
+                state.completed += 1
+                self._save(state)
+            else:
+                state.status, state.message = "done", ""
+                logger.info(f"Chunk pre-generation finished for server {self.server.name}")
+        except Exception as e:
+            logger.exception(f"Chunk pre-generation failed for server {self.server.name}")
+            state.status, state.message = "failed", str(e)
+        self._save(state)
+
+
+_jobs: Dict[str, PregenJob] = {}
+_jobs_lock = threading.Lock()
+
+
+def get_job(server) -> PregenJob:
+    """The pre-generation job for a server, shared by all sessions."""
+    with _jobs_lock:
+        if server.name not in _jobs:
+            _jobs[server.name] = PregenJob(server)
+        return _jobs[server.name]
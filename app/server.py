@@ -1,30 +1,66 @@
-"""Minecraft Server module."""
-from typing import List, Tuple
+"""Minecraft Server module.
+
+pandas, jinja2 and the download module are imported when first used, so pages
+that only control servers don't pay for loading them.
+"""
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Set, Tuple, Union
 import os
 import logging
 from pathlib import Path
+from datetime import datetime
+import itertools
+import shutil
+import socket
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 import time
 import json
 
-import jinja2
 import sh
 from sh import mcwrapper
 import streamlit as st
-import pandas as pd
 
 from enums import ServerStatus
 from log_reader import MinecraftLogReader
-from download import MinecraftServerDownloader
+from backup import (
+    BackupReader, BackupWriter, DEFAULT_CODEC, DIMENSION_DIRECTORIES, DIMENSION_PATTERNS, area_patterns, snapshot_tree
+)
+from catalogue import BackupCatalogue, BackupEntry, RetentionPolicy
+from jvm import JvmProfile, default_reserved_mb, host_memory_mb, plan_profiles
+from metrics import MetricsRing, start_collectors
+from pregen import PregenJob, get_job
+from template import ServerTemplate, copy_server_files, create_template, list_templates
+from world import REGION_FOLDERS, PruneResult, WorldAnalysis, analyze_world, prune_world, world_spawn
+from instrumentation import span, timed
 import config
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 logger = st.logger.get_logger(__name__)
 
+# Listeners that need a port of their own when enabled: the property holding the port, and its default
+LISTENER_PORTS = {"enable-query": ("query.port", 25565), "enable-rcon": ("rcon.port", 25575)}
+
+
+def listener_ports(properties: Dict[str, str]) -> Dict[str, int]:
+    """Ports of the query and rcon listeners enabled in server properties, by property name."""
+    return {
+        key: int(properties.get(key) or default)
+        for enable, (key, default) in LISTENER_PORTS.items()
+        if properties.get(enable) == "true"
+    }
+
 
 class ServerBase:
     
     @property
     def servers_directory(self) -> str:
-        return str(Path(__file__).parent.parent / Path("servers").resolve())
+        return str(Path(config.DATA_DIRECTORY) / "servers")
+
+    @property
+    def templates_directory(self) -> str:
+        return str(Path(config.DATA_DIRECTORY) / "templates")
 
 
 class MinecraftServer(ServerBase):
@@ -35,10 +71,10 @@ class MinecraftServer(ServerBase):
         self.server_filename = "minecraft_server.jar"
 
     @property
+    @timed("unzip version.json")
     def _version_data(self) -> str:
         """Raw version data from the server jar file."""
-        with sh.pushd(self.server_directory):
-            return sh.unzip("-p", self.server_filename, "version.json")
+        return sh.unzip("-p", self.server_filename, "version.json", _cwd=self.server_directory)
 
     @property
     def version_data(self) -> dict:
@@ -50,23 +86,32 @@ class MinecraftServer(ServerBase):
         """Version of the server jar file."""
         return self.version_data["name"]
 
+    @property
+    def _installed_version(self) -> Optional[str]:
+        """Version of the server jar file, or None if it can't be read."""
+        try:
+            return self.version
+        except (sh.ErrorReturnCode, ValueError, KeyError):
+            return None
+
     @property
     def java_version(self) -> str:
         """Java version of the server jar file."""
         return self.version_data["java_version"]
 
+    @timed("install server jar")
     def install_server_jar(self, version: str):
         """Install the server jar file for a given version."""
         logger.info(f"Installing server jar for version {version}")
 
         logger.info(f"Downloading server file for version {version}")
+        from download import MinecraftServerDownloader
         downloader = MinecraftServerDownloader(version=version)
         new_server_file = downloader.get_server_file()
 
         # Copy the new server file
         logger.info(f"Copying new server file: {new_server_file}")
-        with sh.pushd(self.server_directory):
-            sh.cp(new_server_file, self.server_filename)
+        sh.cp(new_server_file, self.server_filename, _cwd=self.server_directory)
 
     def set_version(self, version: str, backup: bool = True, version_check: bool = True):
         """Set the version of the server jar file."""
@@ -76,17 +121,17 @@ class MinecraftServer(ServerBase):
             logger.warning(f"Version is already {version}")
             return
 
+        # Take the backup while the server is still running to keep downtime short
+        if backup:
+            self.online_backup()
+
         # Stop the server if it is running
         self.stop()
         time.sleep(5)
 
-        if backup:
-            self.backup()
-
         # Remove the old server file
         logger.info(f"Removing old server file: {self.server_filename}")
-        with sh.pushd(self.server_directory):
-            sh.rm(self.server_filename)
+        sh.rm(self.server_filename, _cwd=self.server_directory)
 
         self.install_server_jar(version=version)
 
@@ -104,15 +149,20 @@ class MinecraftServer(ServerBase):
         return str(self.server_path)
 
     def _mcwrapper(self, *args, **kwargs):
-        """Run mcwrapper for server."""
+        """Run mcwrapper for server.
+
+        The command runs in the server directory through ``_cwd`` rather than
+        ``sh.pushd``, which would change the working directory of every thread.
+        """
         logger.debug(f"Running mcwrapper command from directory: {self.server_directory}")
-        with sh.pushd(self.server_directory):
+        with span(f"mcwrapper {args[0]}"):
             logger.debug(f"Running mcwrapper command: {' '.join(args)} {kwargs}")
-            return mcwrapper(*args, **kwargs)
+            return mcwrapper(*args, _cwd=self.server_directory, **kwargs)
 
     def start(self):
         """Start the server."""
         logger.info("Starting server...")
+        self.release_port()
         command_input = Path(self.server_directory) / "command_input"
         if command_input.exists():
             logger.info("Removing command input...")
@@ -133,6 +183,220 @@ class MinecraftServer(ServerBase):
         """Backup the server."""
         logger.info("Backing up server...")
         self._mcwrapper("backup")
+        self.backup_catalogue.sync()
+        self.apply_retention_policy()
+
+    def save_off(self):
+        """Stop the server writing the world to disk."""
+        self.run_command("save-off")
+
+    def save_on(self):
+        """Allow the server to write the world to disk again."""
+        self.run_command("save-on")
+
+    @timed("online backup")
+    def online_backup(self, timeout: float = 60) -> Path:
+        """Backup the world without stopping the server.
+
+        World saving is paused and flushed, the world directory is snapshotted
+        and saving is switched back on. The snapshot is then compressed while
+        the server carries on as normal.
+        """
+        logger.info("Taking online backup...")
+        created, staging_path, snapshot_path = self._start_backup()
+
+        try:
+            if self.status == ServerStatus.RUNNING:
+                offset = self.log_size
+                self.save_off()
+                try:
+                    self.run_command("save-all flush")
+                    self.wait_for_log_line("Saved the game", offset=offset, timeout=timeout)
+                    self._snapshot_world(snapshot_path)
+                finally:
+                    self.save_on()
+            else:
+                self._snapshot_world(snapshot_path)
+        except Exception:
+            shutil.rmtree(staging_path, ignore_errors=True)
+            raise
+
+        return self._finish_backup(created, staging_path, snapshot_path)
+
+    def _start_backup(self) -> Tuple[datetime, Path, Path]:
+        """Create a staging directory for a backup.
+
+        Returns the backup time, the staging directory and the path to snapshot
+        the world to.
+        """
+        created = datetime.now()
+        staging_root = self.backup_path / ".staging"
+        staging_root.mkdir(parents=True, exist_ok=True)
+        # A unique directory, as backups can start within the same second
+        staging_path = Path(tempfile.mkdtemp(prefix=created.strftime("%Y%m%d-%H%M%S-"), dir=staging_root))
+        return created, staging_path, staging_path / self.level_name
+
+    def _reserve_archive(self, created: datetime) -> Path:
+        """Path for a new backup archive, claimed by creating the partial file it is written to.
+
+        A number is added to the name if a backup from the same second exists.
+        """
+        stem = f"backup-{created.strftime('%Y%m%d-%H%M%S')}"
+        for number in itertools.count():
+            archive = self.backup_path / (f"{stem}-{number}.zip" if number else f"{stem}.zip")
+            if archive.exists():
+                continue
+            try:
+                os.close(os.open(archive.with_suffix(".partial"), os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            except FileExistsError:
+                continue
+            return archive
+
+    def _snapshot_world(self, snapshot_path: Path):
+        """Snapshot the world directory."""
+        started = time.monotonic()
+        if snapshot_tree(self.world_path, snapshot_path):
+            logger.info(f"World snapshot took {time.monotonic() - started:.3f}s")
+        else:
+            logger.warning(f"World snapshot was a full copy, taking {time.monotonic() - started:.3f}s with saving off")
+
+    def _finish_backup(self, created: datetime, staging_path: Path, snapshot_path: Path) -> Path:
+        """Compress a world snapshot into a backup archive and catalogue it."""
+        archive = self._reserve_archive(created)
+        try:
+            stats = self.backup_writer.write(snapshot_path, archive)
+        except BaseException:
+            archive.with_suffix(".partial").unlink(missing_ok=True)
+            raise
+        finally:
+            shutil.rmtree(staging_path, ignore_errors=True)
+
+        self.backup_catalogue.add(BackupEntry(
+            name=archive.name,
+            created=created.isoformat(timespec="seconds"),
+            archive_bytes=stats.archive_bytes,
+            world_bytes=stats.raw_bytes,
+            version=self._installed_version,
+            codec=stats.codec,
+            level=stats.level,
+            files=stats.files,
+            seconds=stats.seconds,
+        ))
+        self.apply_retention_policy()
+        return archive
+
+    @property
+    def backup_codec(self) -> str:
+        """Codec used to compress backups."""
+        return self.settings.get("backup_codec", DEFAULT_CODEC)
+
+    @property
+    def backup_level(self) -> Optional[int]:
+        """Compression level used for backups, or None for the codec default."""
+        return self.settings.get("backup_level")
+
+    @property
+    def backup_writer(self) -> BackupWriter:
+        """Backup writer configured for the server."""
+        return BackupWriter(codec=self.backup_codec, level=self.backup_level)
+
+    @property
+    def backup_catalogue(self) -> BackupCatalogue:
+        """Catalogue of backups for the server."""
+        return BackupCatalogue(self.backup_path)
+
+    @property
+    def retention_policy(self) -> Optional[RetentionPolicy]:
+        """Backup retention policy, or None if backups are kept forever."""
+        retention = self.settings.get("retention")
+        return RetentionPolicy(**retention) if retention else None
+
+    def apply_retention_policy(self):
+        """Remove expired backups in the background."""
+        policy = self.retention_policy
+        if policy:
+            self.backup_catalogue.prune_in_background(policy)
+
+    def backup_members(self, name: str) -> List[str]:
+        """Files in a backup, relative to the world directory."""
+        return BackupReader(self.backup_path / name).members
+
+    def restore(self, name: str, patterns: List[str], clear: Optional[List[str]] = None) -> List[Path]:
+        """Restore world files matching patterns from a backup.
+
+        Patterns are matched against paths relative to the world directory, for
+        example ``region/r.0.0.mca``, ``DIM-1/*`` or ``playerdata/<uuid>.dat``.
+        Directories in clear are removed first. The server must be stopped.
+        """
+        if self.status == ServerStatus.RUNNING:
+            raise RuntimeError("Stop the server before restoring from a backup.")
+        logger.info(f"Restoring {patterns} from backup {name}")
+        return BackupReader(self.backup_path / name).extract(patterns, self.world_path, clear=clear or ())
+
+    def restore_dimensions(self, name: str, dimensions: List[str]) -> List[Path]:
+        """Restore whole dimensions (overworld, nether, end) from a backup.
+
+        The dimensions' region, entities and poi folders are cleared first, so
+        chunks generated since the backup don't mix with the restored ones.
+        """
+        patterns = [p for dimension in dimensions for p in DIMENSION_PATTERNS[dimension]]
+        clear = [f"{DIMENSION_DIRECTORIES[dimension]}{folder}" for dimension in dimensions for folder in REGION_FOLDERS]
+        return self.restore(name, patterns, clear=clear)
+
+    def restore_area(self, name: str, x1: int, z1: int, x2: int, z2: int, dimension: str = "overworld") -> List[Path]:
+        """Restore the region files covering an area, given in block coordinates."""
+        return self.restore(name, area_patterns(x1, z1, x2, z2, dimension))
+
+    def restore_players(self, name: str, uuids: List[str]) -> List[Path]:
+        """Restore player data for the given player UUIDs from a backup."""
+        patterns = [f"{folder}/{uuid}.*" for uuid in uuids for folder in ("playerdata", "advancements", "stats")]
+        return self.restore(name, patterns)
+
+    @timed("analyze world")
+    def analyze_world(self, stale_days: float = 90) -> WorldAnalysis:
+        """Size and chunk counts of each dimension, from the region file headers."""
+        return analyze_world(self.world_path, stale_days=stale_days)
+
+    @property
+    def pregeneration(self) -> PregenJob:
+        """Chunk pre-generation job for the server."""
+        return get_job(self)
+
+    @property
+    def world_spawn(self) -> Tuple[int, int]:
+        """World spawn block x and z."""
+        return world_spawn(self.world_path)
+
+    @timed("prune world")
+    def prune_world(
+        self,
+        min_inhabited_ticks: int = 0,
+        radius: Optional[int] = None,
+        center: Optional[Tuple[int, int]] = None,
+        dimensions: Optional[List[str]] = None,
+        dry_run: bool = False,
+    ) -> PruneResult:
+        """Remove chunks players have barely visited, or outside a radius of center (default: spawn).
+
+        radius and center are in overworld blocks and are scaled for the nether;
+        the End is only pruned by visits. A backup is taken first. The server
+        must be stopped.
+        """
+        if self.status == ServerStatus.RUNNING:
+            raise RuntimeError("Stop the server before pruning the world.")
+        if not dry_run:
+            archive = self.online_backup()
+            logger.info(f"Backup written before pruning: {archive.name}")
+        result = prune_world(
+            self.world_path,
+            min_inhabited_ticks=min_inhabited_ticks,
+            radius=radius,
+            center=center if center is not None else self.world_spawn,
+            dimensions=dimensions,
+            dry_run=dry_run,
+        )
+        logger.info(f"Pruned {result.chunks_removed} chunks, saving {result.saved_bytes} bytes")
+        return result
 
     @property
     def backup_directory(self) -> str:
@@ -147,7 +411,15 @@ class MinecraftServer(ServerBase):
     @property
     def backups(self) -> List[Tuple[str, float]]:
         """List of available backups, and the size in Mb."""
-        return [(p.name, round(p.stat()[6]/1024/1024, 2)) for p in self.backup_path.glob("*.zip")]
+        return [(entry.name, entry.size_mb) for entry in self.backup_entries]
+
+    @property
+    @timed("list backups")
+    def backup_entries(self) -> List[BackupEntry]:
+        """Catalogue entries for available backups, oldest first."""
+        catalogue = self.backup_catalogue
+        catalogue.sync()
+        return catalogue.entries
 
     def run_command(self, command: str):
         """Run a server command."""
@@ -170,19 +442,62 @@ class MinecraftServer(ServerBase):
         self.set_game_rule("doWeatherCycle", enable)
 
     @property
+    @timed("server status")
     def status(self) -> ServerStatus:
         status = self._mcwrapper("status", _err_to_out=True, _ok_code=[0,5])
+        return self.parse_status(status)
 
+    @staticmethod
+    def parse_status(output: str) -> ServerStatus:
+        """Server status from the output of mcwrapper status."""
         status_lookup = {
             "Server is NOT running.": ServerStatus.STOPPED,
             "Server is running.": ServerStatus.RUNNING,
         }
 
         try:
-            return status_lookup[status.split('\n')[0]]
+            return status_lookup[output.split('\n')[0]]
         except KeyError:
             return ServerStatus.UNKNOWN
 
+    @property
+    def pid_file(self) -> str:
+        """Path to the mcwrapper file holding the server process id."""
+        return str(Path(self.server_directory) / Path("mcwrapper.pid"))
+
+    @property
+    def metrics_file(self) -> str:
+        """Path to the performance metrics file."""
+        return str(Path(self.server_directory) / Path("metrics.bin"))
+
+    @property
+    def metrics(self) -> MetricsRing:
+        """Performance metrics collected for the server."""
+        return MetricsRing(self.metrics_file)
+
+    @property
+    def settings_file(self) -> str:
+        """Path to the manager settings file for the server."""
+        return str(Path(self.server_directory) / Path("manager.json"))
+
+    @property
+    @timed("read manager.json")
+    def settings(self) -> dict:
+        """Manager settings for the server."""
+        try:
+            with open(self.settings_file, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def update_settings(self, **kwargs):
+        """Update manager settings for the server."""
+        logger.info(f"Updating server settings: {kwargs}")
+        settings = self.settings
+        settings.update(kwargs)
+        with open(self.settings_file, "w") as f:
+            json.dump(settings, f, indent=2)
+
     @property
     def log_directory(self) -> str:
         """Path to log directory."""
@@ -194,17 +509,72 @@ class MinecraftServer(ServerBase):
         return str(Path(self.log_directory) / Path("latest.log"))
 
     @property
+    @timed("read latest.log")
     def log_contents(self) -> str:
         """Contents of the log file."""
         with open(self.log_file, "r") as f:
             return f.read()
 
+    @property
+    def log_size(self) -> int:
+        """Size of the log file in bytes."""
+        try:
+            return Path(self.log_file).stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def wait_for_log_line(
+        self, text: Union[str, Tuple[str, ...]], offset: int = 0, timeout: float = 30, interval: float = 0.05
+    ) -> str:
+        """Wait for a line containing text (or any of several texts) to be written to the log after offset."""
+        texts = (text,) if isinstance(text, str) else text
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                with open(self.log_file, "rb") as f:
+                    f.seek(offset)
+                    for line in iter(f.readline, b""):
+                        if not line.endswith(b"\n"):
+                            # Partially written line, read it again on the next pass
+                            break
+                        offset += len(line)
+                        decoded = line.decode(errors="replace")
+                        if any(t in decoded for t in texts):
+                            return decoded.rstrip("\n")
+            except FileNotFoundError:
+                pass
+
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Timed out waiting for log line: {text}")
+            time.sleep(interval)
+
+    def query(self, command: str, text: Union[str, Tuple[str, ...]], timeout: float = 5) -> str:
+        """Run a server command and return the first log line containing text written after it."""
+        offset = self.log_size
+        self.run_command(command)
+        return self.wait_for_log_line(text, offset=offset, timeout=timeout)
+
+    @timed("log tail")
     def log_tail(self, lines: int = 100, delay: float = 0.25) -> str:
         """Tail the log file."""
         time.sleep(delay)
-        log_lines = self.log_contents.splitlines()
-        tail_lines = log_lines[-lines:]
-        return '\n'.join(tail_lines)
+        return self.read_log_tail(lines)
+
+    def read_log_tail(self, lines: int = 100, block_size: int = 65536) -> str:
+        """Read the last lines of the log file, reading backwards from the end."""
+        try:
+            f = open(self.log_file, "rb")
+        except FileNotFoundError:
+            return ""
+        with f:
+            end = f.seek(0, os.SEEK_END)
+            data = b""
+            while end > 0 and data.count(b"\n") <= lines:
+                start = max(0, end - block_size)
+                f.seek(start)
+                data = f.read(end - start) + data
+                end = start
+        return '\n'.join(data.decode(errors="replace").splitlines()[-lines:])
 
     @property
     def server_properties_file(self) -> str:
@@ -218,6 +588,7 @@ class MinecraftServer(ServerBase):
             return f.read()
 
     @property
+    @timed("read server.properties")
     def server_properties_data(self) -> dict:
         """Data from the server properties file."""
         data = {}
@@ -230,11 +601,28 @@ class MinecraftServer(ServerBase):
         return data
 
     @property
-    def server_properties_pandas(self) -> pd.DataFrame:
+    def server_properties_pandas(self) -> "pd.DataFrame":
         """Data from the server properties file as a pandas DataFrame."""
+        import pandas as pd
         return pd.DataFrame.from_dict(self.server_properties_data, orient="index", columns=["value"])
 
-    def update_server_properties(self, data: pd.DataFrame) -> None:
+    def set_server_properties(self, values: Dict[str, str]) -> None:
+        """Set several server properties, adding any that aren't in the file yet."""
+        logger.info(f"Setting server properties {values}")
+        remaining = dict(values)
+        with open(self.server_properties_file, "r") as f:
+            lines = f.readlines()
+
+        with open(self.server_properties_file, "w") as f:
+            for line in lines:
+                key = line.split("=", 1)[0]
+                if key in remaining:
+                    line = f"{key}={remaining.pop(key)}\n"
+                f.write(line)
+            for key, value in remaining.items():
+                f.write(f"{key}={value}\n")
+
+    def update_server_properties(self, data: "pd.DataFrame") -> None:
         """Update the server properties file from a pandas DataFrame."""
         with open(self.server_properties_file, "w") as f:
             for key, value in data.to_dict()["value"].items():
@@ -246,21 +634,85 @@ class MinecraftServer(ServerBase):
         with open(self.server_directory / Path("eula.txt"), "w") as f:
             f.write("eula=true")
 
-    def write_mcwrapper_config(self):
-        """Write the mcwrapper config file."""
+    @property
+    def jvm_weight(self) -> float:
+        """Share of host memory given to the server relative to other servers."""
+        return float(self.settings.get("jvm_weight", 1.0))
+
+    @property
+    def idle_minutes(self) -> float:
+        """Minutes without players before the server is suspended, 0 to keep it running."""
+        return float(self.settings.get("idle_minutes", 0))
+
+    @property
+    def suspended(self) -> bool:
+        """Whether the server was stopped for being idle, and its port is held by a wake listener."""
+        return bool(self.settings.get("suspended", False))
+
+    def release_port(self, timeout: float = 10):
+        """Ask the wake listener of a suspended server to give up its port, and wait for it."""
+        if not self.suspended:
+            return
+        logger.info("Releasing port from wake listener...")
+        self.update_settings(suspended=False)
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+                s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                try:
+                    s.bind(("", self.port_number))
+                    return
+                except OSError:
+                    time.sleep(0.1)
+        logger.warning(f"Port {self.port_number} is still in use")
+
+    @property
+    def java_wrapper_file(self) -> str:
+        """Path to the script that runs java with the server's JVM flags."""
+        return str(Path(self.server_directory) / Path("jvm.sh"))
+
+    def write_java_wrapper(self, profile: JvmProfile):
+        """Write a script that runs java with the JVM flags from a profile.
+
+        mcwrapper only sets the heap size, so the other flags are passed by
+        pointing JAVA_BIN at this script.
+        """
+        logger.info("Writing java wrapper script...")
+        flags = " ".join(profile.flags)
+        wrapper = Path(self.java_wrapper_file)
+        wrapper.write_text(f"""\
+#!/bin/sh
+# Generated by the server manager from the server's JVM profile.
+exec '{config.JAVA_BIN}' {flags} "$@"
+""")
+        wrapper.chmod(0o755)
+
+    def write_mcwrapper_config(self, profile: Optional[JvmProfile] = None):
+        """Write the mcwrapper config file.
+
+        Without a JVM profile the suggested minecraft.net heap sizes are used.
+        """
         logger.info("Writing mcwrapper config file...")
 
+        if profile:
+            self.write_java_wrapper(profile)
+            java_bin = self.java_wrapper_file
+            mx_size = ms_size = profile.heap_size
+        else:
+            java_bin = config.JAVA_BIN
+            mx_size, ms_size = "2048M", "1024M"
+
         with open(self.server_directory / Path("mcwrapper.conf"), "w") as f:
             f.write(f"""\
 # JAVA_BIN -- the java binary.
 # default: 'java' binary in your path.
 # change this if you'd like to use a different java binary.
-JAVA_BIN='{config.JAVA_BIN}'
+JAVA_BIN='{java_bin}'
 
 # Java VM settings (increasing these never hurts)
 # these are suggested settings from minecraft.net
-MX_SIZE="2048M"
-MS_SIZE="1024M"
+MX_SIZE="{mx_size}"
+MS_SIZE="{ms_size}"
 
 # PID_FILE -- where mcwrapper stores the Minecraft server pid.
 # default: mcwrapper.pid
@@ -290,6 +742,7 @@ COMPRESS_BACKUP='zip'
         template_path = Path(__file__).parent / Path(template)
 
         # Render the template
+        import jinja2
         template = jinja2.Template(template_path.read_text())
         rendered_template = template.render(**kwargs)
 
@@ -308,6 +761,16 @@ COMPRESS_BACKUP='zip'
                     line = f"{key}={value}\n"
                 f.write(line)
 
+    @property
+    def level_name(self) -> str:
+        """Name of the world directory."""
+        return self.server_properties_data.get("level-name", "world")
+
+    @property
+    def world_path(self) -> Path:
+        """Path to world directory."""
+        return self.server_path / Path(self.level_name)
+
     @property
     def port_number(self) -> int:
         """Port number of the server."""
@@ -318,6 +781,12 @@ COMPRESS_BACKUP='zip'
         """Set the port number of the server."""
         self.set_server_property("server-port", str(value))
 
+    @property
+    def used_port_numbers(self) -> Set[int]:
+        """Ports the server listens on: the game port, and the query and rcon ports if enabled."""
+        data = self.server_properties_data
+        return {int(data["server-port"]), *listener_ports(data).values()}
+
 
 def main():
     s = MinecraftServer(directory="test1")
@@ -331,12 +800,17 @@ class ServerManager(ServerBase):
         logger.info("Created server manager instance.")
 
     @property
+    @timed("list servers")
     def servers(self) -> List[str]:
         """List of available servers."""
 
         for root, dirs, files in os.walk(self.servers_directory):
             return dirs
 
+    def collect_metrics(self) -> None:
+        """Collect performance metrics for every server in the background."""
+        start_collectors(self.server_managers)
+
     @property
     def server_managers(self) -> List[MinecraftServer]:
         """List of MinecraftServer instances."""
@@ -354,6 +828,29 @@ class ServerManager(ServerBase):
         return list(generator())
 
     @property
+    def used_port_numbers(self) -> Set[int]:
+        """Ports used by any server, including query and rcon ports."""
+        ports = set()
+        for server in self.server_managers:
+            try:
+                ports |= server.used_port_numbers
+            except FileNotFoundError:
+                continue
+        return ports
+
+    def free_port_numbers(self, count: int, start: int, used: Iterable[int]) -> List[int]:
+        """The first count ports from start that aren't in used."""
+        used = set(used)
+        ports = []
+        port = start
+        while len(ports) < count:
+            if port not in used:
+                ports.append(port)
+            port += 1
+        return ports
+
+    @property
+    @timed("next port number")
     def next_port_number(self) -> int:
         """Next available port number."""
         if self.servers:
@@ -361,22 +858,157 @@ class ServerManager(ServerBase):
         else:
             return 25565
 
+    @property
+    def jvm_profiles(self) -> Dict[str, JvmProfile]:
+        """JVM profiles for all servers, sized from host memory and server weights."""
+        host_mb = host_memory_mb()
+        return plan_profiles(
+            weights={server.name: server.jvm_weight for server in self.server_managers},
+            concurrent=config.MAX_CONCURRENT_SERVERS or len(self.servers),
+            host_mb=host_mb,
+            reserved_mb=config.RESERVED_MEMORY_MB or default_reserved_mb(host_mb),
+        )
+
+    def write_jvm_profiles(self, names: Optional[Iterable[str]] = None):
+        """Regenerate the mcwrapper config of every server (or the named ones) from its JVM profile.
+
+        Profiles are planned for the whole fleet either way, but only the named
+        servers' files are written, so creating a server doesn't change the
+        settings of the others. Servers pick up the new settings the next time
+        they are started.
+        """
+        profiles = self.jvm_profiles
+        names = list(profiles) if names is None else list(names)
+        logger.info(f"Writing JVM profiles for {', '.join(names)}...")
+        for name in names:
+            self.get_server(name).write_mcwrapper_config(profiles[name])
+
     def get_server(self, name: str) -> MinecraftServer:
         """Get a MinecraftServer instance by name."""
         return MinecraftServer(name=name)
 
-    def create_server(self, name: str, version: str, port: int) -> MinecraftServer:
-        """Create a new minecraft server."""
+    def create_server(self, name: str, version: str, port: int, pregenerate_radius: Optional[int] = None) -> MinecraftServer:
+        """Create a new minecraft server.
+
+        If pregenerate_radius is given, chunks within that many blocks of spawn
+        are generated in the background once the server has started.
+        """
         logger.info(f"Creating server: {name} {version}")
-        server = MinecraftServer(name=name)
+        server = self.get_server(name)
         server.server_path.mkdir(parents=True, exist_ok=False)
         server.install_server_jar(version=version)
         server.write_eula()
-        server.write_mcwrapper_config()
         server.create_server_properties(server_port=port)
+        self.write_jvm_profiles([name])
         server.start()
+        if pregenerate_radius:
+            server.pregeneration.start(radius=pregenerate_radius, wait_for_startup=True)
         return server
 
+    @property
+    def templates(self) -> List[str]:
+        """List of available server templates."""
+        return list_templates(Path(self.templates_directory))
+
+    def get_template(self, name: str) -> ServerTemplate:
+        """Get a ServerTemplate instance by name."""
+        return ServerTemplate(Path(self.templates_directory) / name)
+
+    @timed("create template")
+    def create_template(self, name: str, server_name: str, include_world: bool = True) -> ServerTemplate:
+        """Create a template from an existing server.
+
+        The server must be stopped if its world is included, so the world is
+        copied in a consistent state.
+        """
+        server = self.get_server(server_name)
+        if include_world and server.status == ServerStatus.RUNNING:
+            raise RuntimeError("Stop the server before creating a template that includes its world.")
+        return create_template(
+            Path(self.templates_directory) / name,
+            server.server_path,
+            server.level_name,
+            version=server._installed_version,
+            include_world=include_world,
+        )
+
+    @timed("clone server")
+    def clone_server(
+        self,
+        template: str,
+        name: str,
+        port: int,
+        properties: Optional[Dict[str, str]] = None,
+        start: bool = False,
+    ) -> MinecraftServer:
+        """Create a new server from a template, with its own port and properties.
+
+        If the template enables the query or rcon listeners, they are given free
+        ports unless properties sets them. Only the new server's JVM profile is
+        written.
+        """
+        logger.info(f"Cloning server {name} from template {template}")
+        source = self.get_template(template)
+        properties = properties or {}
+        missing = [key for key in listener_ports({**source.properties, **properties}) if key not in properties]
+        if missing:
+            used = self.used_port_numbers | {port}
+            properties = {**properties, **dict(zip(missing, map(str, self.free_port_numbers(len(missing), port + 1, used))))}
+        server = self.get_server(name)
+        server.server_path.mkdir(parents=True, exist_ok=False)
+        try:
+            copy_server_files(source.path, server.server_path, source.level_name)
+            if not Path(server.server_properties_file).exists():
+                server.create_server_properties(server_port=port)
+            server.set_server_properties({"server-port": str(port), "motd": name, **properties})
+            if not (server.server_path / "eula.txt").exists():
+                server.write_eula()
+        except BaseException:
+            shutil.rmtree(server.server_path, ignore_errors=True)
+            raise
+        self.write_jvm_profiles([name])
+        if start:
+            server.start()
+        return server
+
+    def clone_servers(
+        self,
+        template: str,
+        names: List[str],
+        first_port: Optional[int] = None,
+        properties: Optional[Dict[str, str]] = None,
+        start: bool = False,
+        workers: int = 8,
+    ) -> List[MinecraftServer]:
+        """Create several servers from a template in parallel, on consecutive free ports.
+
+        Query and rcon ports, if the template enables them, are given out after
+        the game ports, so no two servers share any port.
+        """
+        if not names:
+            return []
+        first_port = first_port or self.next_port_number
+        properties = properties or {}
+        used_ports = self.used_port_numbers
+        ports = self.free_port_numbers(len(names), first_port, used_ports)
+
+        # Hand out every port before cloning, as the clones run in parallel
+        keys = [key for key in listener_ports({**self.get_template(template).properties, **properties}) if key not in properties]
+        extra = iter(self.free_port_numbers(len(names) * len(keys), max(ports) + 1, used_ports | set(ports)))
+        clone_properties = [{**properties, **{key: str(next(extra)) for key in keys}} for _ in names]
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            servers = list(executor.map(
+                lambda args: self.clone_server(template, *args),
+                zip(names, ports, clone_properties),
+            ))
+        # Heap sizes depend on the number of servers, so plan the batch again once it's complete
+        self.write_jvm_profiles(names)
+        if start:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(lambda server: server.start(), servers))
+        return servers
+
     def get_ui_server_list(self):
         """Get a list of servers for the UI, including pre-selected index."""
         server_list = ["Choose an option"] + self.servers
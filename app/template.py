@@ -0,0 +1,149 @@
+"""Server template module.
+
+A template is a prepared server directory: the server jar, eula.txt,
+server.properties and other config files, and optionally a (pre-generated)
+world. New servers are cloned from a template instead of being built from
+scratch: the jar is hard linked, the world is copied with a copy-on-write clone
+where the filesystem supports it, and the remaining small files are copied.
+"""
+from typing import Dict, List, Optional
+from datetime import datetime
+from pathlib import Path
+import json
+import os
+import shutil
+
+import streamlit as st
+
+from backup import snapshot_tree
+
+logger = st.logger.get_logger(__name__)
+
+SERVER_FILENAME = "minecraft_server.jar"
+
+# Files and directories that belong to one server and are never copied into or out of a template.
+SERVER_STATE = {
+    "logs",
+    "backups",
+    "manager.json",
+    "metrics.bin",
+    "pregen.json",
+    "log_index.sqlite",
+    "mcwrapper.pid",
+    "mcwrapper.conf",
+    "jvm.sh",
+    "command_input",
+    "template.json",
+}
+
+
+class ServerTemplate:
+    """A prepared server directory that new servers are cloned from."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.name = self.path.name
+
+    @property
+    def metadata_file(self) -> Path:
+        return self.path / "template.json"
+
+    @property
+    def metadata(self) -> dict:
+        """Version, source server and creation time of the template."""
+        try:
+            return json.loads(self.metadata_file.read_text())
+        except FileNotFoundError:
+            return {}
+
+    @property
+    def version(self) -> Optional[str]:
+        return self.metadata.get("version")
+
+    @property
+    def properties(self) -> Dict[str, str]:
+        """Values from the template's server.properties, empty if it has none."""
+        data = {}
+        try:
+            for line in (self.path / "server.properties").read_text().splitlines():
+                if line and not line.startswith("#") and "=" in line:
+                    key, value = line.split("=", 1)
+                    data[key] = value.strip()
+        except FileNotFoundError:
+            pass
+        return data
+
+    @property
+    def level_name(self) -> str:
+        """Name of the world directory, from the template's server.properties."""
+        return self.properties.get("level-name") or "world"
+
+    @property
+    def has_world(self) -> bool:
+        return (self.path / self.level_name).is_dir()
+
+    @property
+    def size_bytes(self) -> int:
+        return sum(f.stat().st_size for f in self.path.rglob("*") if f.is_file())
+
+
+def link_or_copy(source: Path, destination: Path) -> None:
+    """Hard link a file, or copy it if linking isn't possible (such as across filesystems)."""
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+def copy_server_files(source: Path, destination: Path, level_name: str, include_world: bool = True) -> None:
+    """Copy a server directory's files, leaving out per-server state.
+
+    The server jar is hard linked (it is replaced, never modified, when a
+    server's version changes) and the world directory is cloned.
+    """
+    destination.mkdir(parents=True, exist_ok=True)
+    for entry in os.scandir(source):
+        if entry.name in SERVER_STATE:
+            continue
+        target = destination / entry.name
+        if entry.name == level_name and entry.is_dir():
+            if include_world:
+                snapshot_tree(Path(entry.path), target)
+        elif entry.is_dir():
+            shutil.copytree(entry.path, target)
+        elif entry.name == SERVER_FILENAME:
+            link_or_copy(Path(entry.path), target)
+        else:
+            shutil.copy2(entry.path, target)
+
+
+def create_template(
+    path: Path,
+    source: Path,
+    level_name: str,
+    version: Optional[str] = None,
+    include_world: bool = True,
+) -> ServerTemplate:
+    """Create a template from a server directory."""
+    logger.info(f"Creating template {path.name} from {source}")
+    path.mkdir(parents=True, exist_ok=False)
+    try:
+        copy_server_files(source, path, level_name, include_world=include_world)
+        (path / "template.json").write_text(json.dumps({
+            "version": version,
+            "source": source.name,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "world": include_world,
+        }, indent=2))
+    except BaseException:
+        shutil.rmtree(path, ignore_errors=True)
+        raise
+    return ServerTemplate(path)
+
+
+def list_templates(templates_directory: Path) -> List[str]:
+    """Names of the templates in a directory."""
+    try:
+        return sorted(entry.name for entry in os.scandir(templates_directory) if entry.is_dir())
+    except FileNotFoundError:
+        return []
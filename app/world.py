@@ -0,0 +1,510 @@
+"""Module for analysing and pruning Minecraft world region files.
+
+Region files (``r.<x>.<z>.mca``) hold up to 32x32 chunks. The first 8 KiB of
+each file are two tables: where each chunk is stored (sector offset and count)
+and when it was last saved. Analysis reads only these tables, through a memory
+map, so the chunk data itself is never read or decompressed.
+
+Pruning removes chunks from a stopped server's world and rewrites region files
+with the remaining chunks stored contiguously. Chunks are copied as stored,
+without recompressing them.
+"""
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+import gzip
+import mmap
+import os
+import re
+import struct
+import time
+import zlib
+
+SECTOR_SIZE = 4096
+CHUNKS_PER_REGION = 1024
+HEADER_SIZE = 2 * SECTOR_SIZE
+TABLE = struct.Struct(f">{CHUNKS_PER_REGION}I")
+
+# Folders of region files in each dimension: terrain, entities and points of interest.
+REGION_FOLDERS = ("region", "entities", "poi")
+
+REGION_FILE_EXPRESSION = re.compile(r"^r\.(-?\d+)\.(-?\d+)\.mca$")
+
+# Chunk compression types. Chunks too large for a region file are stored in a
+# separate c.<x>.<z>.mcc file, flagged by the high bit.
+COMPRESSION_GZIP = 1
+COMPRESSION_ZLIB = 2
+COMPRESSION_NONE = 3
+EXTERNAL_FLAG = 0x80
+
+# NBT long tag named InhabitedTime: ticks players have spent near the chunk.
+INHABITED_TIME_TAG = b"\x04\x00\x0dInhabitedTime"
+# NBT string tag named Status: how far the chunk has been generated.
+STATUS_TAG = b"\x08\x00\x06Status"
+
+# Dimension ids used in commands, and the names dimension_directories gives them.
+DIMENSION_NAMES = {"minecraft:overworld": "overworld", "minecraft:the_nether": "nether", "minecraft:the_end": "end"}
+
+
+@dataclass
+class ChunkLocation:
+    """Where a chunk is stored in its region file."""
+    index: int
+    sector: int
+    sectors: int
+    timestamp: int
+
+    @property
+    def local_x(self) -> int:
+        return self.index % 32
+
+    @property
+    def local_z(self) -> int:
+        return self.index // 32
+
+
+class RegionFile:
+    """An Anvil region file, read through a memory map."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        match = REGION_FILE_EXPRESSION.match(self.path.name)
+        if not match:
+            raise ValueError(f"Not a region file: {self.path}")
+        self.x, self.z = int(match.group(1)), int(match.group(2))
+
+    def read_header(self) -> Tuple[Tuple[int, ...], Tuple[int, ...]]:
+        """Location and timestamp tables. Empty (or truncated) files have no chunks."""
+        with open(self.path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < HEADER_SIZE:
+                return (0,) * CHUNKS_PER_REGION, (0,) * CHUNKS_PER_REGION
+            with mmap.mmap(f.fileno(), HEADER_SIZE, access=mmap.ACCESS_READ) as header:
+                return TABLE.unpack_from(header, 0), TABLE.unpack_from(header, SECTOR_SIZE)
+
+    def chunks(self) -> Iterator[ChunkLocation]:
+        """Locations of the chunks present in the file."""
+        locations, timestamps = self.read_header()
+        for index, (location, timestamp) in enumerate(zip(locations, timestamps)):
+            if location:
+                yield ChunkLocation(index, location >> 8, location & 0xFF, timestamp)
+
+    def chunk_position(self, chunk: ChunkLocation) -> Tuple[int, int]:
+        """World chunk coordinates of a chunk in this region."""
+        return self.x * 32 + chunk.local_x, self.z * 32 + chunk.local_z
+
+    def external_file(self, chunk: ChunkLocation) -> Path:
+        """File holding a chunk too large for the region file."""
+        x, z = self.chunk_position(chunk)
+        return self.path.parent / f"c.{x}.{z}.mcc"
+
+    def read_records(self, indices: Optional[Set[int]] = None) -> Iterator[Tuple[ChunkLocation, bytes]]:
+        """Chunks present in the file, with their stored records (length, compression and data).
+
+        If indices is given, only those chunks are read.
+        """
+        chunks = [chunk for chunk in self.chunks() if indices is None or chunk.index in indices]
+        if not chunks:
+            return
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for chunk in chunks:
+                start = chunk.sector * SECTOR_SIZE
+                if start + 5 > len(data):
+                    continue
+                length, = struct.unpack_from(">I", data, start)
+                yield chunk, data[start:start + 4 + length]
+
+    def rewrite(self, remove: Set[int], dry_run: bool = False) -> Tuple[int, int]:
+        """Remove chunks by index and store the rest contiguously.
+
+        The file is deleted if no chunks are left. Returns the number of chunks
+        removed and the size of the file afterwards.
+        """
+        locations = [0] * CHUNKS_PER_REGION
+        timestamps = [0] * CHUNKS_PER_REGION
+        body = bytearray()
+        removed = 0
+        for chunk, record in self.read_records():
+            if chunk.index in remove:
+                removed += 1
+                if not dry_run and record[4] & EXTERNAL_FLAG:
+                    self.external_file(chunk).unlink(missing_ok=True)
+                continue
+            sectors = -(-len(record) // SECTOR_SIZE)
+            locations[chunk.index] = ((2 + len(body) // SECTOR_SIZE) << 8) | sectors
+            timestamps[chunk.index] = chunk.timestamp
+            body += record + b"\x00" * (sectors * SECTOR_SIZE - len(record))
+
+        size = HEADER_SIZE + len(body) if any(locations) else 0
+        if dry_run or not removed:
+            return removed, size if removed else self.path.stat().st_size
+        if not size:
+            self.path.unlink()
+            return removed, 0
+        partial = self.path.with_name(self.path.name + ".partial")
+        with open(partial, "wb") as f:
+            f.write(TABLE.pack(*locations))
+            f.write(TABLE.pack(*timestamps))
+            f.write(body)
+        os.replace(partial, self.path)
+        return removed, size
+
+
+@dataclass
+class RegionSummary:
+    """Chunk counts and sizes for one region file."""
+    path: Path
+    dimension: str
+    folder: str
+    size_bytes: int
+    chunks: int = 0
+    used_bytes: int = 0
+    stale_chunks: int = 0
+    oldest: int = 0
+    newest: int = 0
+
+    @property
+    def size_mb(self) -> float:
+        return self.size_bytes / 1024 / 1024
+
+    @property
+    def wasted_bytes(self) -> int:
+        """Bytes in the file not used by any chunk (including the header)."""
+        return max(0, self.size_bytes - self.used_bytes - HEADER_SIZE)
+
+
+@dataclass
+class DimensionSummary:
+    """Totals for one dimension of a world."""
+    dimension: str
+    regions: int = 0
+    size_bytes: int = 0
+    chunks: int = 0
+    stale_chunks: int = 0
+    wasted_bytes: int = 0
+    oldest: int = 0
+    newest: int = 0
+    folder_bytes: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def size_mb(self) -> float:
+        return self.size_bytes / 1024 / 1024
+
+    def add(self, region: RegionSummary) -> None:
+        self.size_bytes += region.size_bytes
+        self.wasted_bytes += region.wasted_bytes
+        self.folder_bytes[region.folder] = self.folder_bytes.get(region.folder, 0) + region.size_bytes
+        if region.folder != "region":
+            return
+        # Chunk counts are for terrain; entities and poi files mirror the same chunks
+        self.regions += 1
+        self.chunks += region.chunks
+        self.stale_chunks += region.stale_chunks
+        if region.chunks:
+            self.oldest = min(self.oldest, region.oldest) if self.oldest else region.oldest
+            self.newest = max(self.newest, region.newest)
+
+
+@dataclass
+class WorldAnalysis:
+    """Result of analysing a world directory."""
+    path: Path
+    stale_before: int
+    seconds: float
+    dimensions: Dict[str, DimensionSummary]
+    regions: List[RegionSummary]
+
+    @property
+    def size_bytes(self) -> int:
+        return sum(d.size_bytes for d in self.dimensions.values())
+
+    @property
+    def chunks(self) -> int:
+        return sum(d.chunks for d in self.dimensions.values())
+
+    @property
+    def stale_chunks(self) -> int:
+        return sum(d.stale_chunks for d in self.dimensions.values())
+
+    def largest_regions(self, count: int = 20) -> List[RegionSummary]:
+        return sorted(self.regions, key=lambda r: r.size_bytes, reverse=True)[:count]
+
+
+def dimension_directories(world_path: Path) -> Dict[str, Path]:
+    """Directory holding the region folders of each dimension in a world.
+
+    Vanilla dimensions are named overworld, nether and end. Custom (datapack)
+    dimensions under ``dimensions/<namespace>/<name>`` are named
+    ``<namespace>:<name>``.
+    """
+    world_path = Path(world_path)
+    directories = {"overworld": world_path, "nether": world_path / "DIM-1", "end": world_path / "DIM1"}
+    custom = world_path / "dimensions"
+    if custom.is_dir():
+        for namespace in sorted(p for p in custom.iterdir() if p.is_dir()):
+            for dimension in sorted(p for p in namespace.iterdir() if p.is_dir()):
+                directories[f"{namespace.name}:{dimension.name}"] = dimension
+    return {name: path for name, path in directories.items() if path.is_dir()}
+
+
+def region_files(world_path: Path) -> Iterator[Tuple[str, str, Path]]:
+    """Dimension, folder and path of every region file in a world."""
+    for dimension, directory in dimension_directories(world_path).items():
+        for folder in REGION_FOLDERS:
+            try:
+                entries = list(os.scandir(directory / folder))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                if entry.is_file() and REGION_FILE_EXPRESSION.match(entry.name):
+                    yield dimension, folder, Path(entry.path)
+
+
+def summarise_region(dimension: str, folder: str, path: Path, stale_before: int) -> RegionSummary:
+    """Summarise the chunks of a region file from its header."""
+    summary = RegionSummary(path=path, dimension=dimension, folder=folder, size_bytes=path.stat().st_size)
+    timestamps = []
+    for chunk in RegionFile(path).chunks():
+        summary.chunks += 1
+        summary.used_bytes += chunk.sectors * SECTOR_SIZE
+        timestamps.append(chunk.timestamp)
+        if chunk.timestamp < stale_before:
+            summary.stale_chunks += 1
+    if timestamps:
+        summary.oldest, summary.newest = min(timestamps), max(timestamps)
+    return summary
+
+
+def analyze_world(world_path: Path, stale_days: float = 90, workers: Optional[int] = None) -> WorldAnalysis:
+    """Analyse the region files of a world.
+
+    Chunks not saved in the last ``stale_days`` days are counted as stale.
+    Region files are read in parallel on ``workers`` threads.
+    """
+    started = time.perf_counter()
+    stale_before = int(time.time() - stale_days * 86400)
+    with ThreadPoolExecutor(max_workers=workers or min(32, (os.cpu_count() or 1) * 4)) as executor:
+        futures = [
+            executor.submit(summarise_region, dimension, folder, path, stale_before)
+            for dimension, folder, path in region_files(world_path)
+        ]
+        regions = []
+        for future in futures:
+            try:
+                regions.append(future.result())
+            except (OSError, ValueError):
+                # Region files can disappear or be rewritten while the server is running
+                continue
+
+    dimensions: Dict[str, DimensionSummary] = {}
+    for region in regions:
+        dimensions.setdefault(region.dimension, DimensionSummary(dimension=region.dimension)).add(region)
+
+    return WorldAnalysis(
+        path=Path(world_path),
+        stale_before=stale_before,
+        seconds=time.perf_counter() - started,
+        dimensions=dimensions,
+        regions=regions,
+    )
+
+
+def decompress_chunk(record: bytes) -> Optional[bytes]:
+    """NBT data of a chunk record, or None if it can't be read.
+
+    Chunks stored in external files or with other compression (such as LZ4) are
+    not read.
+    """
+    compression, payload = record[4], record[5:]
+    try:
+        if compression == COMPRESSION_ZLIB:
+            return zlib.decompress(payload)
+        if compression == COMPRESSION_GZIP:
+            return gzip.decompress(payload)
+        if compression == COMPRESSION_NONE:
+            return payload
+    except (OSError, EOFError, zlib.error):
+        pass
+    return None
+
+
+def chunk_inhabited_time(record: bytes) -> Optional[int]:
+    """InhabitedTime of a chunk, in ticks, or None if it can't be read.
+
+    The tag is found by searching the decompressed chunk for its name rather than
+    parsing the NBT.
+    """
+    data = decompress_chunk(record)
+    position = data.find(INHABITED_TIME_TAG) if data is not None else -1
+    if position < 0:
+        return None
+    return struct.unpack_from(">q", data, position + len(INHABITED_TIME_TAG))[0]
+
+
+def chunk_status(record: bytes) -> Optional[str]:
+    """Generation status of a chunk (such as "full" or "features"), or None if it can't be read."""
+    data = decompress_chunk(record)
+    position = data.find(STATUS_TAG) if data is not None else -1
+    if position < 0:
+        return None
+    start = position + len(STATUS_TAG) + 2
+    length, = struct.unpack_from(">H", data, start - 2)
+    return data[start:start + length].decode(errors="replace").removeprefix("minecraft:")
+
+
+def ungenerated_chunks(world_path: Path, dimension: str, chunks: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Chunks (x, z) not yet saved to a dimension's region files, or saved before being fully generated.
+
+    dimension is a dimension id (such as minecraft:the_nether) or a name from
+    dimension_directories. Chunks whose status can't be read count as generated.
+    """
+    directory = dimension_directories(world_path).get(DIMENSION_NAMES.get(dimension, dimension))
+    if directory is None:
+        return list(chunks)
+    by_region: Dict[Tuple[int, int], List[Tuple[int, int]]] = {}
+    for x, z in chunks:
+        by_region.setdefault((x >> 5, z >> 5), []).append((x, z))
+
+    missing = []
+    for (region_x, region_z), positions in by_region.items():
+        path = directory / "region" / f"r.{region_x}.{region_z}.mca"
+        indices = {(x & 31) + (z & 31) * 32 for x, z in positions}
+        try:
+            records = {chunk.index: record for chunk, record in RegionFile(path).read_records(indices)}
+        except FileNotFoundError:
+            records = {}
+        for x, z in positions:
+            record = records.get((x & 31) + (z & 31) * 32)
+            if record is None:
+                missing.append((x, z))
+            elif not record[4] & EXTERNAL_FLAG and chunk_status(record) not in (None, "full"):
+                missing.append((x, z))
+    return missing
+
+
+def world_spawn(world_path: Path) -> Tuple[int, int]:
+    """World spawn block x and z from level.dat, or (0, 0) if it can't be read."""
+    try:
+        with gzip.open(Path(world_path) / "level.dat", "rb") as f:
+            data = f.read()
+    except (OSError, EOFError):
+        return 0, 0
+
+    def read_int(name: str) -> int:
+        tag = b"\x03" + struct.pack(">H", len(name)) + name.encode()
+        position = data.find(tag)
+        return struct.unpack_from(">i", data, position + len(tag))[0] if position >= 0 else 0
+
+    return read_int("SpawnX"), read_int("SpawnZ")
+
+
+@dataclass
+class PruneResult:
+    """Result of pruning a world."""
+    regions: int = 0
+    regions_deleted: int = 0
+    chunks_removed: int = 0
+    bytes_before: int = 0
+    bytes_after: int = 0
+    seconds: float = 0.0
+    dry_run: bool = False
+
+    @property
+    def saved_bytes(self) -> int:
+        return self.bytes_before - self.bytes_after
+
+
+# Scale from overworld block coordinates to each dimension's: nether coordinates are
+# an eighth of the overworld's. Dimensions not listed have no such relation, so a
+# radius given for the overworld doesn't prune them.
+RADIUS_SCALES = {"overworld": 1, "nether": 1 / 8}
+
+
+def chunk_filter(
+    min_inhabited_ticks: int = 0,
+    radius: Optional[int] = None,
+    center: Tuple[int, int] = (0, 0),
+) -> Callable[[RegionFile, ChunkLocation, bytes], bool]:
+    """Function deciding whether a chunk should be removed.
+
+    Chunks are removed if their centre is more than radius blocks from center,
+    or if players have spent less than min_inhabited_ticks near them. Chunks whose
+    InhabitedTime can't be read are kept.
+    """
+    def remove(region: RegionFile, chunk: ChunkLocation, record: bytes) -> bool:
+        if radius is not None:
+            x, z = region.chunk_position(chunk)
+            if (x * 16 + 8 - center[0]) ** 2 + (z * 16 + 8 - center[1]) ** 2 > radius ** 2:
+                return True
+        if min_inhabited_ticks > 0:
+            inhabited_time = chunk_inhabited_time(record)
+            return inhabited_time is not None and inhabited_time < min_inhabited_ticks
+        return False
+    return remove
+
+
+def prune_region(
+    directory: Path,
+    name: str,
+    remove: Callable[[RegionFile, ChunkLocation, bytes], bool],
+    dry_run: bool = False,
+) -> PruneResult:
+    """Prune a terrain region file, and the entities and poi files for the same region."""
+    terrain = RegionFile(directory / "region" / name)
+    indices = {chunk.index for chunk, record in terrain.read_records() if remove(terrain, chunk, record)}
+
+    result = PruneResult(regions=1, dry_run=dry_run)
+    for folder in REGION_FOLDERS:
+        path = directory / folder / name
+        if not path.exists():
+            continue
+        result.bytes_before += path.stat().st_size
+        removed, size = RegionFile(path).rewrite(indices, dry_run=dry_run)
+        result.bytes_after += size
+        if folder == "region":
+            result.chunks_removed = removed
+            result.regions_deleted = int(removed > 0 and size == 0)
+    return result
+
+
+def prune_world(
+    world_path: Path,
+    min_inhabited_ticks: int = 0,
+    radius: Optional[int] = None,
+    center: Tuple[int, int] = (0, 0),
+    dimensions: Optional[List[str]] = None,
+    dry_run: bool = False,
+    workers: Optional[int] = None,
+) -> PruneResult:
+    """Remove chunks from a world, see chunk_filter. The server must be stopped.
+
+    radius and center are in overworld blocks, and are scaled for the nether
+    (see RADIUS_SCALES). Other dimensions are only pruned by min_inhabited_ticks.
+    With dry_run, nothing is changed and the result shows what would be removed.
+    """
+    started = time.perf_counter()
+    jobs = []
+    for dimension, directory in dimension_directories(world_path).items():
+        if dimensions is not None and dimension not in dimensions:
+            continue
+        try:
+            entries = list(os.scandir(directory / "region"))
+        except FileNotFoundError:
+            continue
+        scale = RADIUS_SCALES.get(dimension)
+        if radius is not None and scale is not None:
+            remove = chunk_filter(min_inhabited_ticks, round(radius * scale), (round(center[0] * scale), round(center[1] * scale)))
+        else:
+            remove = chunk_filter(min_inhabited_ticks)
+        jobs += [(directory, e.name, remove) for e in entries if e.is_file() and REGION_FILE_EXPRESSION.match(e.name)]
+
+    result = PruneResult(dry_run=dry_run)
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        for region in executor.map(lambda job: prune_region(*job, dry_run=dry_run), jobs):
+            result.regions += region.regions
+            result.regions_deleted += region.regions_deleted
+            result.chunks_removed += region.chunks_removed
+            result.bytes_before += region.bytes_before
+            result.bytes_after += region.bytes_after
+    result.seconds = time.perf_counter() - started
+    return result
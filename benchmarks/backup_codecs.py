@@ -0,0 +1,39 @@
+"""Compare backup codecs on a synthetic world directory.
+
+Run with:
+
+    python benchmarks/backup_codecs.py --regions 16
+"""
+from pathlib import Path
+import argparse
+import sys
+import tempfile
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "app"))
+
+from backup import BackupWriter, LEVEL_RANGES, available_codecs  # noqa: E402
+from synthetic import create_world  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--regions", type=int, default=8, help="Number of region files to generate.")
+    parser.add_argument("--chunks", type=int, default=512, help="Chunks per region file.")
+    parser.add_argument("--workers", type=int, default=None, help="Compression threads (default: all cores).")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        world = create_world(Path(directory) / "world", regions=args.regions, chunks=args.chunks)
+
+        print(f"{'codec':<12} {'level':>5} {'seconds':>8} {'Mb/s':>8} {'ratio':>6}")
+        for codec in available_codecs():
+            min_level, max_level = LEVEL_RANGES[codec]
+            for level in sorted({min_level, BackupWriter(codec).level, max_level // 2}):
+                archive = Path(directory) / f"{codec}-{level}.zip"
+                stats = BackupWriter(codec=codec, level=level, workers=args.workers).write(world, archive)
+                print(f"{codec:<12} {level:>5} {stats.seconds:>8.2f} {stats.throughput:>8.1f} {stats.ratio:>6.2f}")
+                archive.unlink()
+
+
+if __name__ == "__main__":
+    main()
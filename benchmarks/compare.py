@@ -0,0 +1,45 @@
+"""Compare two benchmark result files.
+
+Run with:
+
+    python benchmarks/compare.py [BASELINE] [CURRENT]
+
+Without arguments the two most recent results are compared.
+"""
+from pathlib import Path
+import argparse
+import json
+
+from run import RESULTS_DIRECTORY
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("baseline", type=Path, nargs="?", help="Baseline results file.")
+    parser.add_argument("current", type=Path, nargs="?", help="Results file to compare with the baseline.")
+    args = parser.parse_args()
+
+    if not (args.baseline and args.current):
+        latest = sorted(RESULTS_DIRECTORY.glob("*.json"))[-2:]
+        if len(latest) < 2:
+            parser.error(f"Need two results files in {RESULTS_DIRECTORY}")
+        args.baseline, args.current = latest
+
+    baseline = json.loads(args.baseline.read_text())
+    current = json.loads(args.current.read_text())
+    print(f"Baseline: {baseline['commit']} ({baseline['created']})")
+    print(f"Current:  {current['commit']} ({current['created']})")
+    print()
+    print(f"{'case':<28} {'baseline ms':>12} {'current ms':>12} {'change':>8}")
+    for name, result in current["results"].items():
+        if name not in baseline["results"]:
+            print(f"{name:<28} {'-':>12} {result['min'] * 1000:>12.1f}")
+            continue
+        before = baseline["results"][name]["min"]
+        after = result["min"]
+        change = (after - before) / before * 100 if before else 0.0
+        print(f"{name:<28} {before * 1000:>12.1f} {after * 1000:>12.1f} {change:>+7.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Measure cold start and per-rerun overhead of the Streamlit pages.
+
+Cold start is the time to import each app module in a fresh interpreter (after
+streamlit itself has been imported), along with which heavy packages the import
+pulled in. Per-rerun overhead is the time to run a page script again in an
+interpreter where everything is already imported, which is what Streamlit does
+on every click.
+
+Run with:
+
+    python benchmarks/import_time.py
+"""
+from pathlib import Path
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+APP_DIRECTORY = Path(__file__).parent.parent / "app"
+
+MODULES = ["enums", "server", "client", "log_reader", "download", "backup", "metrics"]
+
+PAGES = ["Home.py", *sorted(p.relative_to(APP_DIRECTORY).as_posix() for p in (APP_DIRECTORY / "pages").glob("*.py"))]
+
+HEAVY_PACKAGES = ["pandas", "numpy", "pyarrow", "jinja2", "requests", "requests_cache", "bs4"]
+
+COLD_START = """
+import json, sys, time
+sys.path.insert(0, {app!r})
+import streamlit
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "heavy": [p for p in {heavy!r} if p in sys.modules]}}))
+"""
+
+
+def cold_start(module: str, repeat: int) -> dict:
+    """Import time of a module in fresh interpreters."""
+    timings = []
+    for _ in range(repeat):
+        code = COLD_START.format(app=str(APP_DIRECTORY), module=module, heavy=HEAVY_PACKAGES)
+        output = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True
+        ).stdout.strip().splitlines()[-1]
+        result = json.loads(output)
+        timings.append(result["seconds"])
+    return {"seconds": statistics.median(timings), "heavy": result["heavy"]}
+
+
+def rerun_overhead(page: str, repeat: int) -> float:
+    """Median time to run a page script again once its imports are loaded."""
+    code = compile((APP_DIRECTORY / page).read_text(), page, "exec")
+    exec(code, {"__name__": "__main__"})  # Warm up imports
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        exec(code, {"__name__": "__main__"})
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="Runs of each measurement.")
+    args = parser.parse_args()
+
+    print("Cold start (import after streamlit)")
+    for module in MODULES:
+        result = cold_start(module, args.repeat)
+        print(f"  {module:<12} {result['seconds'] * 1000:>8.1f} ms   loads: {', '.join(result['heavy']) or '-'}")
+
+    print()
+    print("Per-rerun overhead (no server selected)")
+    sys.path.insert(0, str(APP_DIRECTORY))
+    with tempfile.TemporaryDirectory() as directory:
+        # Point the manager at an empty data directory, start with no servers
+        (Path(directory) / "servers").mkdir()
+        os.environ["DATA_DIRECTORY"] = directory
+        for page in PAGES:
+            try:
+                print(f"  {page:<32} {rerun_overhead(page, args.repeat) * 1000:>8.1f} ms")
+            except Exception as e:
+                print(f"  {page:<32}   failed: {type(e).__name__}: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Benchmark the manager against synthetic servers and logs.
+
+Run with:
+
+    python benchmarks/run.py --servers 20 --log-days 60 --lines-per-day 50000
+
+Results are written to benchmarks/results/ and can be compared between commits
+with benchmarks/compare.py.
+"""
+from typing import Callable, Dict
+from datetime import datetime
+from pathlib import Path
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "app"))
+
+from synthetic import create_server  # noqa: E402
+
+RESULTS_DIRECTORY = Path(__file__).parent / "results"
+
+
+def git_commit() -> str:
+    """Short hash of the current commit, marked if the tree has local changes."""
+    def git(*args):
+        return subprocess.run(["git", *args], capture_output=True, text=True, cwd=Path(__file__).parent).stdout.strip()
+    commit = git("rev-parse", "--short", "HEAD") or "unknown"
+    return f"{commit}-dirty" if git("status", "--porcelain", "--untracked-files=no") else commit
+
+
+def prepare_data(root: Path, args) -> None:
+    """Create synthetic servers under root/servers, unless they already exist."""
+    servers = root / "servers"
+    if servers.exists() and any(servers.iterdir()):
+        print(f"Using existing data in {root}")
+        return
+    print(f"Creating {args.servers} synthetic servers in {root}...")
+    for index in range(args.servers):
+        create_server(
+            servers,
+            name=f"bench{index:03d}",
+            port=25565 + index,
+            log_days=args.log_days,
+            lines_per_day=args.lines_per_day,
+            regions=args.regions,
+            seed=index,
+        )
+
+
+def cases() -> Dict[str, Callable[[], object]]:
+    """Benchmark cases, run from the directory holding the synthetic servers."""
+    from server import ServerManager
+
+    manager = ServerManager()
+    server = manager.get_server(manager.servers[0])
+    reader = server.log_reader
+
+    return {
+        "log parse": lambda: sum(1 for _ in reader.read_log_files()),
+        "log to_pandas": reader.to_pandas,
+        "log player_sessions": lambda: reader.player_sessions,
+        "log get_events_by_time": lambda: reader.get_events_by_time(interval="10min"),
+        "log search": lambda: reader.search("diamonds", player="alice"),
+        "log window page": lambda: reader.window().page(-1, 100),
+        "manager servers": lambda: manager.servers,
+        "manager next_port_number": lambda: manager.next_port_number,
+        "server log_tail": lambda: server.log_tail(lines=100, delay=0),
+        "server backups": lambda: server.backups,
+        "world analyze": lambda: server.analyze_world(),
+    }
+
+
+def run_case(func: Callable[[], object], repeat: int) -> Dict[str, float]:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return {"min": min(timings), "median": statistics.median(timings), "runs": repeat}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--servers", type=int, default=10, help="Number of synthetic servers.")
+    parser.add_argument("--log-days", type=int, default=30, help="Days of rotated logs per server.")
+    parser.add_argument("--lines-per-day", type=int, default=10000, help="Log lines per day.")
+    parser.add_argument("--regions", type=int, default=4, help="Region files per world.")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs of each case.")
+    parser.add_argument("--data", type=Path, default=None, help="Directory to create (or reuse) synthetic data in.")
+    parser.add_argument("--filter", default="", help="Only run cases containing this text.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        root = (args.data or Path(directory)).resolve()
+        root.mkdir(parents=True, exist_ok=True)
+        prepare_data(root, args)
+
+        # Point the manager at the synthetic servers (read when config is imported)
+        os.environ["DATA_DIRECTORY"] = str(root)
+
+        results = {}
+        for name, func in cases().items():
+            if args.filter not in name:
+                continue
+            results[name] = run_case(func, args.repeat)
+            print(f"{name:<28} min {results[name]['min'] * 1000:>10.1f} ms   median {results[name]['median'] * 1000:>10.1f} ms")
+
+    commit = git_commit()
+    output = RESULTS_DIRECTORY / f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{commit}.json"
+    output.parent.mkdir(exist_ok=True)
+    output.write_text(json.dumps({
+        "commit": commit,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "parameters": {k: str(v) for k, v in vars(args).items()},
+        "results": results,
+    }, indent=2))
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Generate synthetic Minecraft server data for benchmarks."""
+from datetime import date, timedelta
+from pathlib import Path
+import gzip
+import random
+import struct
+import zipfile
+import zlib
+
+SECTOR_SIZE = 4096
+
+# Maps random bytes onto a small block palette so chunk data compresses like real chunks.
+PALETTE_TABLE = bytes(i % 8 for i in range(256))
+
+
+def chunk_payload(rng: random.Random, size: int = 16 * 1024, inhabited_time: int = 0) -> bytes:
+    """Uncompressed chunk data with an InhabitedTime tag."""
+    tag = b"\x04\x00\x0dInhabitedTime" + struct.pack(">q", inhabited_time)
+    return tag + rng.randbytes(size).translate(PALETTE_TABLE)
+
+
+def write_region_file(path: Path, rng: random.Random, chunks: int = 1024, timestamp: int = 0) -> None:
+    """Write an Anvil region file containing the first chunks chunk slots."""
+    offsets = bytearray(SECTOR_SIZE)
+    timestamps = bytearray(SECTOR_SIZE)
+    body = bytearray()
+    for index in range(chunks):
+        data = zlib.compress(chunk_payload(rng, inhabited_time=rng.choice([0, 0, 100, 20000])))
+        record = struct.pack(">IB", len(data) + 1, 2) + data
+        record += b"\x00" * (-len(record) % SECTOR_SIZE)
+        sector = 2 + len(body) // SECTOR_SIZE
+        struct.pack_into(">I", offsets, index * 4, (sector << 8) | (len(record) // SECTOR_SIZE))
+        struct.pack_into(">I", timestamps, index * 4, timestamp or 1700000000 + index)
+        body += record
+    path.write_bytes(bytes(offsets) + bytes(timestamps) + bytes(body))
+
+
+def create_world(path: Path, regions: int = 4, chunks: int = 256, players: int = 8, seed: int = 0) -> Path:
+    """Create a synthetic world directory with region files for each dimension."""
+    rng = random.Random(seed)
+    dimensions = [path, path / "DIM-1", path / "DIM1"]
+    for index in range(regions):
+        dimension = dimensions[index % len(dimensions)]
+        x, z = index // 2, index % 2
+        for folder in ("region", "entities", "poi"):
+            region_directory = dimension / folder
+            region_directory.mkdir(parents=True, exist_ok=True)
+            region_chunks = chunks if folder == "region" else max(1, chunks // 8)
+            write_region_file(region_directory / f"r.{x}.{z}.mca", rng, chunks=region_chunks)
+
+    playerdata = path / "playerdata"
+    playerdata.mkdir(parents=True, exist_ok=True)
+    for index in range(players):
+        with gzip.open(playerdata / f"00000000-0000-0000-0000-{index:012d}.dat", "wb") as f:
+            f.write(chunk_payload(rng, size=2048))
+
+    with gzip.open(path / "level.dat", "wb") as f:
+        f.write(chunk_payload(rng, size=1024))
+
+    return path
+
+
+PLAYERS = ["alice", "bob", "charlie", "dana", "eli", "fran", "gus", "hana"]
+
+CHAT = ["hello", "anyone want to go mining?", "found diamonds!", "where is the village", "brb", "gg"]
+
+OTHER_MESSAGES = [
+    "Can't keep up! Is the server overloaded? Running 2034ms or 40 ticks behind",
+    "Saving the game (this may take a moment!)",
+    "Saved the game",
+    "Preparing spawn area: 83%",
+]
+
+
+def log_lines(rng: random.Random, count: int):
+    """Lines for one day of a server log, in time order."""
+    online = set()
+    for index in range(count):
+        seconds = index * 86400 // count
+        timestamp = f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+        roll = rng.random()
+        player = rng.choice(PLAYERS)
+        if roll < 0.05 and player not in online:
+            online.add(player)
+            message = f"{player} joined the game"
+        elif roll < 0.10 and player in online:
+            online.remove(player)
+            message = f"{player} left the game"
+        elif roll < 0.50 and online:
+            message = f"<{rng.choice(sorted(online))}> {rng.choice(CHAT)}"
+        elif roll < 0.55:
+            message = f"{player} was slain by Zombie"
+        else:
+            message = rng.choice(OTHER_MESSAGES)
+        level = "WARN" if message.startswith("Can't") else "INFO"
+        yield f"[{timestamp}] [Server thread/{level}]: {message}\n"
+
+
+def create_log_history(path: Path, days: int = 30, lines_per_day: int = 10000, seed: int = 0) -> Path:
+    """Create rotated .log.gz files and a latest.log in a logs directory."""
+    rng = random.Random(seed)
+    path.mkdir(parents=True, exist_ok=True)
+    start = date(2024, 1, 1)
+    for day in range(days):
+        filename = f"{(start + timedelta(days=day)).isoformat()}-1.log.gz"
+        with gzip.open(path / filename, "wt", compresslevel=1) as f:
+            f.writelines(log_lines(rng, lines_per_day))
+    with open(path / "latest.log", "w") as f:
+        f.writelines(log_lines(rng, lines_per_day))
+    return path
+
+
+def create_server(
+    servers_path: Path,
+    name: str,
+    port: int,
+    log_days: int = 30,
+    lines_per_day: int = 10000,
+    regions: int = 4,
+    chunks: int = 256,
+    backups: int = 3,
+    seed: int = 0,
+) -> Path:
+    """Create a synthetic server directory with properties, logs, a world and backups."""
+    server_path = servers_path / name
+    server_path.mkdir(parents=True, exist_ok=True)
+    (server_path / "server.properties").write_text(
+        f"#Minecraft server properties\nlevel-name=world\nmotd={name}\nserver-port={port}\n"
+    )
+    create_log_history(server_path / "logs", days=log_days, lines_per_day=lines_per_day, seed=seed)
+    world = create_world(server_path / "world", regions=regions, chunks=chunks, seed=seed)
+
+    backup_path = server_path / "backups"
+    backup_path.mkdir(exist_ok=True)
+    for index in range(backups):
+        with zipfile.ZipFile(backup_path / f"backup-2024010{index + 1}-000000.zip", "w") as zf:
+            for file in world.rglob("*"):
+                zf.write(file, arcname=str(Path("world") / file.relative_to(world)))
+    return server_path
@@ -1,4 +1,5 @@
 from pathlib import Path
+import shlex
 
 from invoke import task
 from decouple import config
@@ -43,6 +44,13 @@ def run(c):
     c.run(f"{streamlit} run app/Home.py")
 
 
+@task
+def test(c):
+    """Run the test suite."""
+    python = Path(__file__).parent / Path("venv/bin/python")
+    c.run(f"{python} -m pytest tests")
+
+
 @task
 def deploy(c, username = None, ip_address = None):
     """Deploy app to Mac Mini."""
@@ -61,3 +69,49 @@ def deploy(c, username = None, ip_address = None):
     print("Running rsync command:")
     print(f"  {command}")
     c.run(command)
+
+
+@task
+def benchmark_backups(c, regions=8, chunks=512):
+    """Compare backup codecs on a synthetic world."""
+    python = Path(__file__).parent / Path("venv/bin/python")
+    c.run(f"{python} benchmarks/backup_codecs.py --regions {regions} --chunks {chunks}")
+
+
+@task
+def benchmark(c, servers=10, log_days=30, lines_per_day=10000, data=None):
+    """Benchmark the manager against synthetic servers and logs."""
+    python = Path(__file__).parent / Path("venv/bin/python")
+    command = f"{python} benchmarks/run.py --servers {servers} --log-days {log_days} --lines-per-day {lines_per_day}"
+    if data:
+        command += f" --data {data}"
+    c.run(command)
+
+
+@task
+def benchmark_compare(c, baseline=None, current=None):
+    """Compare benchmark results (the two most recent by default)."""
+    python = Path(__file__).parent / Path("venv/bin/python")
+    c.run(f"{python} benchmarks/compare.py {baseline or ''} {current or ''}")
+
+
+@task
+def benchmark_imports(c, repeat=5):
+    """Measure page cold start and per-rerun overhead."""
+    python = Path(__file__).parent / Path("venv/bin/python")
+    c.run(f"{python} benchmarks/import_time.py --repeat {repeat}")
+
+
+@task
+def daemon(c):
+    """Run the fleet daemon."""
+    python = Path(__file__).parent / Path("venv/bin/python")
+    c.run(f"{python} app/daemon.py")
+
+
+@task
+def server(c, action, name=None, command=None):
+    """Control servers through the fleet daemon (list, start, stop, restart, backup, tail, command)."""
+    python = Path(__file__).parent / Path("venv/bin/python")
+    args = [arg for arg in (action, name, command) if arg]
+    c.run(f"{python} app/client.py {' '.join(shlex.quote(arg) for arg in args)}")
@@ -0,0 +1,5 @@
+"""The app modules import each other by name, as Streamlit runs them from app/."""
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "app"))
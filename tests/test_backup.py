@@ -0,0 +1,84 @@
+import zipfile
+
+import pytest
+
+from backup import BackupReader, BackupWriter, available_codecs, read_backup_stats
+
+
+def make_world(path, files):
+    for name, data in files.items():
+        (path / name).parent.mkdir(parents=True, exist_ok=True)
+        (path / name).write_bytes(data)
+
+
+@pytest.mark.parametrize("codec", available_codecs())
+def test_codec_round_trip(tmp_path, codec):
+    files = {
+        "level.dat": b"level" * 100,
+        "region/r.0.0.mca": bytes(range(256)) * 64,
+        "DIM-1/region/r.-1.0.mca": b"\x00" * 10000,
+    }
+    make_world(tmp_path / "world", files)
+    archive = tmp_path / "backup.zip"
+
+    stats = BackupWriter(codec=codec).write(tmp_path / "world", archive)
+
+    assert stats.files == len(files)
+    assert stats.raw_bytes == sum(len(data) for data in files.values())
+    assert read_backup_stats(archive).codec == codec
+    reader = BackupReader(archive)
+    assert sorted(reader.members) == sorted(files)
+    restored = tmp_path / "restored"
+    reader.extract(["*"], restored)
+    for name, data in files.items():
+        assert (restored / name).read_bytes() == data
+
+
+def test_extract_clears_directories(tmp_path):
+    make_world(tmp_path / "backup" / "world", {"region/r.0.0.mca": b"old", "poi/r.0.0.mca": b"old"})
+    BackupWriter().write(tmp_path / "backup" / "world", tmp_path / "backup.zip")
+    world = tmp_path / "world"
+    make_world(world, {"region/r.0.0.mca": b"new", "region/r.5.5.mca": b"new", "level.dat": b"keep"})
+
+    BackupReader(tmp_path / "backup.zip").extract(["region/*", "poi/*"], world, clear=["region", "poi"])
+
+    assert sorted(p.name for p in (world / "region").iterdir()) == ["r.0.0.mca"]
+    assert (world / "region/r.0.0.mca").read_bytes() == b"old"
+    assert (world / "poi/r.0.0.mca").read_bytes() == b"old"
+    assert (world / "level.dat").read_bytes() == b"keep"
+    # Nothing is left behind next to the world
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["backup", "backup.zip", "world"]
+
+
+def test_extract_refuses_paths_outside_world(tmp_path):
+    archive = tmp_path / "evil.zip"
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("world/region/r.1.1.mca", "x")
+        zf.writestr("world/region/../../../escape.txt", "x")
+    world = tmp_path / "world"
+    make_world(world, {"region/r.0.0.mca": b"new"})
+
+    with pytest.raises(ValueError):
+        BackupReader(archive).extract(["region/*"], world, clear=["region"])
+
+    assert not (tmp_path.parent / "escape.txt").exists()
+    assert (world / "region/r.0.0.mca").read_bytes() == b"new"
+
+
+def test_failed_extract_leaves_world_unchanged(tmp_path, monkeypatch):
+    archive = tmp_path / "backup.zip"
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("world/region/r.0.0.mca", "old")
+        zf.writestr("world/region/r.1.0.mca", "old")
+    world = tmp_path / "world"
+    make_world(world, {"region/r.5.5.mca": b"new"})
+
+    def fail(source, destination):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr("shutil.copyfileobj", fail)
+    with pytest.raises(OSError):
+        BackupReader(archive).extract(["region/*"], world, clear=["region"])
+
+    assert sorted(p.name for p in (world / "region").iterdir()) == ["r.5.5.mca"]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["backup.zip", "world"]
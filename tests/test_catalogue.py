@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+
+from catalogue import BackupEntry, RetentionPolicy
+
+
+def entries_every(hours: int, count: int, newest: datetime):
+    return [
+        BackupEntry(name=f"backup-{i}.zip", created=(newest - timedelta(hours=hours * i)).isoformat(), archive_bytes=1)
+        for i in range(count)
+    ]
+
+
+def test_keeps_everything_within_keep_last():
+    entries = entries_every(1, 3, datetime(2024, 6, 15, 12))
+    assert RetentionPolicy(keep_last=3, daily=0, weekly=0, monthly=0).expired(entries) == []
+
+
+def test_keeps_newest_backup_per_day():
+    entries = entries_every(6, 4 * 10, datetime(2024, 6, 15, 18))  # Four a day for ten days
+    policy = RetentionPolicy(keep_last=1, daily=7, weekly=0, monthly=0)
+
+    expired = {e.name for e in policy.expired(entries)}
+    kept = [e for e in entries if e.name not in expired]
+
+    assert [e.created_time.date() for e in kept] == [datetime(2024, 6, 15 - day).date() for day in range(7)]
+    assert all(e.created_time.hour == 18 for e in kept)
+
+
+def test_weekly_and_monthly_periods():
+    entries = entries_every(24, 120, datetime(2024, 6, 15))
+    policy = RetentionPolicy(keep_last=0, daily=0, weekly=4, monthly=3)
+
+    kept = [e for e in entries if e not in policy.expired(entries)]
+
+    weeks = {e.created_time.strftime("%G-W%V") for e in kept}
+    months = {e.created_time.strftime("%Y-%m") for e in kept}
+    assert len(weeks) >= 4
+    assert {"2024-06", "2024-05", "2024-04"} <= months
+    assert len(kept) <= 4 + 3
+
+
+def test_expired_is_newest_first():
+    entries = entries_every(1, 10, datetime(2024, 6, 15, 12))
+    expired = RetentionPolicy(keep_last=2, daily=0, weekly=0, monthly=0).expired(entries)
+    assert [e.name for e in expired] == [f"backup-{i}.zip" for i in range(2, 10)]
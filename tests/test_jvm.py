@@ -0,0 +1,38 @@
+from jvm import (
+    HEAP_STEP_MB, LARGE_HEAP_FLAGS, MAX_HEAP_MB, MIN_HEAP_MB, NON_HEAP_OVERHEAD, SMALL_HEAP_FLAGS, JvmProfile, plan_profiles
+)
+
+
+def test_no_servers():
+    assert plan_profiles({}, concurrent=0, host_mb=16384, reserved_mb=2048) == {}
+
+
+def test_heap_shared_by_weight():
+    profiles = plan_profiles({"a": 1, "b": 3}, concurrent=2, host_mb=16384, reserved_mb=2048)
+
+    available = (16384 - 2048) / (1 + NON_HEAP_OVERHEAD)
+    assert profiles["a"].heap_mb == int(available / 4) // HEAP_STEP_MB * HEAP_STEP_MB
+    assert profiles["b"].heap_mb == int(available * 3 / 4) // HEAP_STEP_MB * HEAP_STEP_MB
+    assert all(p.heap_mb % HEAP_STEP_MB == 0 for p in profiles.values())
+
+
+def test_concurrent_servers_fit_in_memory():
+    weights = {f"s{i}": 1 + i % 3 for i in range(10)}
+    profiles = plan_profiles(weights, concurrent=3, host_mb=65536, reserved_mb=4096)
+
+    heaviest = sorted((p.heap_mb for p in profiles.values()), reverse=True)[:3]
+    assert sum(heaviest) * (1 + NON_HEAP_OVERHEAD) <= 65536 - 4096
+
+
+def test_heap_is_clamped():
+    small = plan_profiles({f"s{i}": 1 for i in range(50)}, concurrent=50, host_mb=8192, reserved_mb=2048)
+    large = plan_profiles({"a": 1}, concurrent=1, host_mb=1024 * 1024, reserved_mb=2048)
+
+    assert all(p.heap_mb == MIN_HEAP_MB for p in small.values())
+    assert large["a"].heap_mb == MAX_HEAP_MB
+
+
+def test_profile_flags():
+    assert JvmProfile(heap_mb=4096).heap_size == "4096M"
+    assert JvmProfile(heap_mb=MAX_HEAP_MB).flags[-len(LARGE_HEAP_FLAGS):] == LARGE_HEAP_FLAGS
+    assert JvmProfile(heap_mb=MIN_HEAP_MB).flags[-len(SMALL_HEAP_FLAGS):] == SMALL_HEAP_FLAGS
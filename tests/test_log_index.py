@@ -0,0 +1,69 @@
+import gzip
+import os
+
+import pytest
+
+from log_reader import MinecraftLogReader
+
+
+def line(time: str, message: str) -> str:
+    return f"[{time}] [Server thread/INFO]: {message}\n"
+
+
+@pytest.fixture
+def reader(tmp_path):
+    logs = tmp_path / "logs"
+    logs.mkdir()
+    (logs / "latest.log").write_text(
+        line("10:00:00", "alice joined the game")
+        + line("10:00:05", "<alice> found diamonds")
+        + line("10:01:00", "<bob> no diamonds here")
+    )
+    return MinecraftLogReader(str(logs))
+
+
+def rotate(logs, name: str, lines: str) -> None:
+    """Compress latest.log into a dated log, as the server does, and start a new one."""
+    with open(logs / "latest.log", "rb") as source, gzip.open(logs / name, "wb") as f:
+        f.write(source.read())
+    os.remove(logs / "latest.log")
+    (logs / "latest.log").write_text(lines)
+
+
+def test_search(reader):
+    results = reader.search("diamonds")
+    assert [r["log_message"] for r in results] == ["<bob> no diamonds here", "<alice> found diamonds"]
+    assert [r["log_message"] for r in reader.search("diamonds", player="alice")] == ["<alice> found diamonds"]
+    assert reader.search("emeralds") == []
+    assert reader.players == ["alice", "bob"]
+
+
+def test_search_new_lines(reader):
+    reader.search("diamonds")
+    with open(reader.log_path / "latest.log", "a") as f:
+        f.write(line("10:02:00", "<alice> more diamonds"))
+
+    assert reader.search("diamonds", limit=1)[0]["log_message"] == "<alice> more diamonds"
+
+
+def test_search_after_rotation(reader):
+    assert len(reader.search("diamonds")) == 2
+    rotate(reader.log_path, "2024-06-14-1.log.gz", line("09:00:00", "<carol> diamonds at last"))
+
+    results = reader.search("diamonds")
+
+    assert [r["log_message"] for r in results] == [
+        "<carol> diamonds at last", "<bob> no diamonds here", "<alice> found diamonds",
+    ]
+    assert results[1]["filename"].name == "2024-06-14-1.log.gz"
+    assert results[1]["timestamp"].isoformat() == "2024-06-14T10:01:00"
+    # Lines of the replaced latest.log are no longer found there
+    assert [r["filename"].name for r in results].count("latest.log") == 1
+
+
+def test_deleted_logs_are_dropped(reader):
+    rotate(reader.log_path, "2024-06-14-1.log.gz", line("09:00:00", "server started"))
+    assert len(reader.search("diamonds")) == 2
+    (reader.log_path / "2024-06-14-1.log.gz").unlink()
+
+    assert reader.search("diamonds") == []
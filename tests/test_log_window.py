@@ -0,0 +1,111 @@
+import gzip
+
+import pytest
+
+from log_window import SAMPLE_LINES, LogWindow
+
+
+def log_lines(count: int, start_seconds: int = 0, step: int = 3):
+    """Log lines with a stack trace line after every tenth, the time wrapping at midnight."""
+    lines = []
+    for number in range(count):
+        seconds = (start_seconds + number // 2 * step) % (24 * 3600)
+        if number % 10 == 9:
+            lines.append("\tat net.minecraft.Server.run(Server.java:1)\n")
+        else:
+            lines.append(f"[{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}] [Server thread/INFO]: line {number}\n")
+    return lines
+
+
+def expected_line_at(lines, time: str) -> int:
+    """First line at or after a time, the slow way. Times before the first line are on the next day."""
+    def seconds(text):
+        hours, minutes, secs = map(int, text.split(":"))
+        return hours * 3600 + minutes * 60 + secs
+
+    times, day, previous = [], 0, None
+    for text in lines:
+        if text.startswith("["):
+            current = seconds(text[1:9])
+            if previous is not None and current < previous:
+                day += 1
+            previous = current
+            times.append(day * 24 * 3600 + current)
+        else:
+            times.append(None)
+    first = next(t for t in times if t is not None)
+    target = seconds(time)
+    if target < first % (24 * 3600):
+        target += 24 * 3600
+    # Lines without a timestamp take the time of the next timestamped line
+    following = None
+    for number in range(len(lines) - 1, -1, -1):
+        following = times[number] if times[number] is not None else following
+        times[number] = following
+    return next((number for number, t in enumerate(times) if t is None or t >= target), len(lines))
+
+
+@pytest.fixture(params=["latest.log", "2024-06-14-1.log.gz"])
+def log_file(request, tmp_path):
+    def write(lines):
+        path = tmp_path / request.param
+        if path.suffix == ".gz":
+            with gzip.open(path, "wt") as f:
+                f.writelines(lines)
+        else:
+            path.write_text("".join(lines))
+        return path
+    return write
+
+
+def test_paging(log_file):
+    lines = log_lines(1050)
+    window = LogWindow(log_file(lines))
+    window.refresh()
+
+    assert window.line_count == 1050
+    assert window.page_count(100) == 11
+    assert window.page(0, 100) == [(n, lines[n].rstrip("\n")) for n in range(100)]
+    assert window.page(3, 100)[0] == (300, lines[300].rstrip("\n"))
+    assert window.page(-1, 100) == [(n, lines[n].rstrip("\n")) for n in range(1000, 1050)]
+    assert window.page(20, 100) == []
+    assert window.around(500, 10)[0][0] == 495
+    assert window.line_at_offset(len(lines[0]) + 1) == 1
+
+
+def test_growing_and_replaced_file(tmp_path):
+    lines = log_lines(600)
+    path = tmp_path / "latest.log"
+    path.write_text("".join(lines[:300]) + lines[300][:10])
+    window = LogWindow(path)
+    window.refresh()
+    assert window.line_count == 300  # The partly written line waits for the next refresh
+
+    path.write_text("".join(lines))
+    window.refresh()
+    assert window.line_count == 600
+    assert window.page(-1, 10)[-1] == (599, lines[599].rstrip("\n"))
+
+    path.unlink()
+    path.write_text("".join(lines[:5]))
+    window.refresh()
+    assert window.line_count == 5
+
+
+def test_line_at_time(log_file):
+    lines = log_lines(SAMPLE_LINES * 20, start_seconds=10 * 3600)
+    window = LogWindow(log_file(lines))
+    window.refresh()
+
+    for time in ["00:00:00", "09:59:59", "10:00:00", "10:00:01", "10:15:00", "10:47:31", "11:00:00", "23:59:59"]:
+        assert window.line_at_time(time) == expected_line_at(lines, time), time
+
+
+def test_line_at_time_past_midnight(log_file):
+    lines = log_lines(SAMPLE_LINES * 20, start_seconds=23 * 3600 + 30 * 60)
+    window = LogWindow(log_file(lines))
+    window.refresh()
+
+    for time in ["23:30:00", "23:45:00", "23:59:59", "00:00:00", "00:05:00", "00:20:00", "12:00:00", "23:00:00"]:
+        assert window.line_at_time(time) == expected_line_at(lines, time), time
+    assert 0 < window.line_at_time("00:00:00") < window.line_count
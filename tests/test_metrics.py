@@ -0,0 +1,43 @@
+import math
+
+from metrics import MetricsRing, MetricsSample
+
+
+def test_empty(tmp_path):
+    ring = MetricsRing(tmp_path / "metrics.bin")
+    assert ring.written == 0
+    assert ring.read() == []
+
+
+def test_append_and_read(tmp_path):
+    ring = MetricsRing(tmp_path / "metrics.bin", capacity=10)
+    ring.append(MetricsSample(timestamp=1.0, rss_mb=512.0, cpu_percent=50.0, mspt=25.0, players=2))
+    ring.append(MetricsSample(timestamp=2.0))
+
+    first, second = ring.read()
+    assert (first.timestamp, first.rss_mb, first.mspt, first.players) == (1.0, 512.0, 25.0, 2)
+    assert first.tps == 20.0
+    assert math.isnan(second.mspt) and math.isnan(second.tps)
+    assert second.players == -1
+
+
+def test_wraps_around(tmp_path):
+    ring = MetricsRing(tmp_path / "metrics.bin", capacity=5)
+    for timestamp in range(12):
+        ring.append(MetricsSample(timestamp=float(timestamp)))
+
+    assert ring.written == 12
+    assert [s.timestamp for s in ring.read()] == [7.0, 8.0, 9.0, 10.0, 11.0]
+    assert (tmp_path / "metrics.bin").stat().st_size == MetricsRing.HEADER.size + 5 * MetricsRing.RECORD.size
+    # The capacity is read back from the file
+    assert MetricsRing(tmp_path / "metrics.bin").capacity == 5
+
+
+def test_read_since(tmp_path):
+    ring = MetricsRing(tmp_path / "metrics.bin", capacity=5)
+    for timestamp in range(12):
+        ring.append(MetricsSample(timestamp=float(timestamp)))
+
+    assert [s.timestamp for s in ring.read(since=9.0)] == [9.0, 10.0, 11.0]
+    assert [s.timestamp for s in ring.read(since=0.0)] == [7.0, 8.0, 9.0, 10.0, 11.0]
+    assert ring.read(since=12.0) == []
@@ -0,0 +1,43 @@
+from pregen import PregenState, spiral
+
+
+def test_spiral_starts_at_centre_and_covers_each_tile_once():
+    tiles = list(spiral(3))
+
+    assert tiles[0] == (0, 0)
+    assert len(tiles) == len(set(tiles)) == 7 * 7
+    assert set(tiles) == {(x, z) for x in range(-3, 4) for z in range(-3, 4)}
+
+
+def test_spiral_goes_ring_by_ring():
+    rings = [max(abs(x), abs(z)) for x, z in spiral(4)]
+    assert rings == sorted(rings)
+
+
+def test_spiral_ring_runs_clockwise_from_top_left():
+    assert list(spiral(1)) == [
+        (0, 0),
+        (-1, -1), (0, -1),
+        (1, -1), (1, 0),
+        (1, 1), (0, 1),
+        (-1, 1), (-1, 0),
+    ]
+
+
+def test_spiral_steps_to_neighbouring_tiles():
+    tiles = list(spiral(5))
+    for ring in range(1, 6):
+        ring_tiles = [tile for tile in tiles if max(abs(tile[0]), abs(tile[1])) == ring]
+        assert all(abs(a[0] - b[0]) + abs(a[1] - b[1]) == 1 for a, b in zip(ring_tiles, ring_tiles[1:]))
+
+
+def test_state_tiles_cover_radius():
+    state = PregenState(radius=300, center_x=1000, center_z=-500)
+
+    assert state.rings == 3
+    assert state.total == 49
+    x1, z1, x2, z2 = state.tile_area((0, 0))
+    assert (x2 - x1 + 1, z2 - z1 + 1) == (128, 128)
+    assert x1 <= 1000 <= x2 and z1 <= -500 <= z2
+    corner = state.tile_area((-state.rings, -state.rings))
+    assert corner[0] <= 1000 - 300 and corner[1] <= -500 - 300
@@ -0,0 +1,122 @@
+import random
+import struct
+import zlib
+
+from world import (
+    COMPRESSION_ZLIB, HEADER_SIZE, INHABITED_TIME_TAG, SECTOR_SIZE, STATUS_TAG, TABLE,
+    RegionFile, chunk_filter, chunk_inhabited_time, chunk_status, prune_world, ungenerated_chunks,
+)
+
+
+def chunk_record(inhabited_time: int, status: str = "minecraft:full", padding: int = 0) -> bytes:
+    nbt = (
+        b"\x0a\x00\x00"
+        + INHABITED_TIME_TAG + struct.pack(">q", inhabited_time)
+        + STATUS_TAG + struct.pack(">H", len(status)) + status.encode()
+        + b"\x07\x00\x04Data" + struct.pack(">i", padding) + random.Random(padding).randbytes(padding)
+        + b"\x00"
+    )
+    data = zlib.compress(nbt)
+    return struct.pack(">IB", len(data) + 1, COMPRESSION_ZLIB) + data
+
+
+def write_region(path, records):
+    """Write a region file from {chunk index: record}, with sectors in reverse order to leave them unsorted."""
+    locations = [0] * 1024
+    timestamps = [0] * 1024
+    body = bytearray()
+    for index, record in sorted(records.items(), reverse=True):
+        sectors = -(-len(record) // SECTOR_SIZE)
+        locations[index] = ((2 + len(body) // SECTOR_SIZE) << 8) | sectors
+        timestamps[index] = 1000 + index
+        body += record + bytes(sectors * SECTOR_SIZE - len(record))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(TABLE.pack(*locations) + TABLE.pack(*timestamps) + bytes(body))
+
+
+def test_read_records(tmp_path):
+    path = tmp_path / "region" / "r.1.-1.mca"
+    write_region(path, {0: chunk_record(10), 33: chunk_record(20, padding=5000)})
+    region = RegionFile(path)
+
+    chunks = {chunk.index: chunk for chunk in region.chunks()}
+    assert sorted(chunks) == [0, 33]
+    assert chunks[33].sectors == 2 and chunks[33].timestamp == 1033
+    assert region.chunk_position(chunks[0]) == (32, -32)
+    assert region.chunk_position(chunks[33]) == (33, -31)
+    records = dict((chunk.index, record) for chunk, record in region.read_records())
+    assert chunk_inhabited_time(records[0]) == 10
+    assert chunk_inhabited_time(records[33]) == 20
+    assert chunk_status(records[0]) == "full"
+    assert [chunk.index for chunk, _ in region.read_records({33})] == [33]
+
+
+def test_rewrite_removes_chunks_and_compacts(tmp_path):
+    path = tmp_path / "region" / "r.0.0.mca"
+    records = {index: chunk_record(index, padding=3000 * (index % 3)) for index in range(0, 40, 4)}
+    write_region(path, records)
+
+    removed, size = RegionFile(path).rewrite({0, 8, 16})
+
+    assert removed == 3
+    assert size == path.stat().st_size
+    region = RegionFile(path)
+    kept = dict((chunk.index, record) for chunk, record in region.read_records())
+    assert sorted(kept) == sorted(set(records) - {0, 8, 16})
+    assert all(kept[index] == records[index] for index in kept)
+    # Kept chunks are stored back to back after the header, with their timestamps
+    sectors = sorted((chunk.sector, chunk.sectors) for chunk in region.chunks())
+    assert sectors[0][0] == HEADER_SIZE // SECTOR_SIZE
+    assert all(a[0] + a[1] == b[0] for a, b in zip(sectors, sectors[1:]))
+    assert all(chunk.timestamp == 1000 + chunk.index for chunk in region.chunks())
+
+
+def test_rewrite_dry_run_and_delete(tmp_path):
+    path = tmp_path / "region" / "r.0.0.mca"
+    write_region(path, {0: chunk_record(1), 1: chunk_record(2)})
+    before = path.read_bytes()
+
+    assert RegionFile(path).rewrite({0}, dry_run=True)[0] == 1
+    assert path.read_bytes() == before
+    assert RegionFile(path).rewrite({0, 1}) == (2, 0)
+    assert not path.exists()
+
+
+def test_chunk_filter(tmp_path):
+    path = tmp_path / "region" / "r.0.0.mca"
+    write_region(path, {0: chunk_record(100), 1: chunk_record(5000), 31: chunk_record(5000)})
+    region = RegionFile(path)
+    records = {chunk.index: (chunk, record) for chunk, record in region.read_records()}
+
+    def removed(remove):
+        return sorted(index for index, (chunk, record) in records.items() if remove(region, chunk, record))
+
+    assert removed(chunk_filter()) == []
+    assert removed(chunk_filter(min_inhabited_ticks=1000)) == [0]
+    # Chunk 31 is centred on block (504, 8), chunks 0 and 1 within 100 blocks of the origin
+    assert removed(chunk_filter(radius=100)) == [31]
+    assert removed(chunk_filter(radius=100, center=(504, 8))) == [0, 1]
+    assert removed(chunk_filter(min_inhabited_ticks=1000, radius=100)) == [0, 31]
+
+
+def test_prune_world_scales_radius_per_dimension(tmp_path):
+    world = tmp_path / "world"
+    # Chunk 31 of region r.0.0 is centred on block (504, 8)
+    for directory in (world, world / "DIM-1", world / "DIM1"):
+        write_region(directory / "region" / "r.0.0.mca", {0: chunk_record(0), 31: chunk_record(0)})
+
+    # 1000 overworld blocks are 125 nether blocks, and the End isn't pruned by radius
+    assert prune_world(world, radius=1000, dimensions=["overworld"], dry_run=True).chunks_removed == 0
+    assert prune_world(world, radius=1000, dimensions=["nether"], dry_run=True).chunks_removed == 1
+    assert prune_world(world, radius=1000, dimensions=["end"], dry_run=True).chunks_removed == 0
+    assert prune_world(world, radius=1000, dry_run=True).chunks_removed == 1
+    assert prune_world(world, radius=100, dimensions=["overworld"]).chunks_removed == 1
+    assert [chunk.index for chunk in RegionFile(world / "region" / "r.0.0.mca").chunks()] == [0]
+
+
+def test_ungenerated_chunks(tmp_path):
+    world = tmp_path / "world"
+    write_region(world / "region" / "r.0.0.mca", {0: chunk_record(0), 1: chunk_record(0, status="minecraft:features")})
+
+    assert ungenerated_chunks(world, "minecraft:overworld", [(0, 0), (1, 0), (2, 0), (40, 0)]) == [(1, 0), (2, 0), (40, 0)]
+    assert ungenerated_chunks(world, "minecraft:the_nether", [(0, 0)]) == [(0, 0)]